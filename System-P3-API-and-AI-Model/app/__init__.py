@@ -1,4 +1,4 @@
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request, Response
 from flask_cors import CORS
 from .config import Config, db, migrate, mail
 from .routes.user_bp import user_bp
@@ -7,6 +7,8 @@ from .routes.athlete_bp import athlete_bp
 from .routes.session_bp import session_bp
 from .routes.sensor_data_bp import sensor_data_bp
 from .routes.runners_model_bp import runners_model_bp
+from .utils.model_registry import model_registry
+from .utils.metrics import metrics
 
 API_V1_BASE_URL = '/api/v1.0'
 
@@ -36,16 +38,53 @@ def create_app(config_class=Config):
     app.register_blueprint(sensor_data_bp, url_prefix=f'{API_V1_BASE_URL}/sensor_data')
     app.register_blueprint(runners_model_bp, url_prefix=f'{API_V1_BASE_URL}/runners_model')
 
+    # Load the model off the import path: in a warm-up thread now, or on the first prediction
+    if app.config.get('MODEL_LOADING_MODE') == 'background':
+        model_registry.start_background_load()
+
+    # Pick up new model versions without restarting the worker
+    model_registry.start_watcher(app.config.get('MODEL_WATCH_INTERVAL_SECONDS', 0))
+    model_registry.install_signal_handler()
+
     # --- Root Route ---
     @app.route('/')
     def index():
         return "Runners Injury Prediction System (RIPS) Backend Running! Connect your client to /api/v1.0/..."
 
-    # --- Health Check Route ---
+    # --- Health Check Routes ---
+    # Liveness: the process is up and serving requests
     @app.route('/health')
+    @app.route('/health/live')
     def health():
         return jsonify({'status': 'health'}), 200
 
+    # Readiness: the model is loaded and warmed up, so the worker can take prediction traffic
+    @app.route('/health/ready')
+    def ready():
+        bundle = model_registry.current()
+
+        if bundle is None:
+            return jsonify({
+                'status': 'not ready',
+                'model_status': model_registry.status,
+                'details': model_registry.error
+            }), 503
+
+        return jsonify({'status': 'ready', 'model_version': bundle.version}), 200
+
+    # --- Metrics ---
+    # Prometheus text exposition of this worker's counters and latency histograms
+    @app.route('/metrics')
+    def prometheus_metrics():
+        if not metrics.enabled:
+            return jsonify({'error': 'Resource not found'}), 404
+
+        token = app.config.get('METRICS_TOKEN')
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return jsonify({'message': 'Metrics token is missing or invalid!'}), 401
+
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
     # --- Global Error Handler ---
     @app.errorhandler(404)
     def not_found(error):
@@ -60,6 +99,9 @@ def create_app(config_class=Config):
         from .models.session import Session
         from .models.sensor_data import SensorData
         from .models.revoked_token import RevokedToken
+        from .models.prediction import Prediction
+        from .models.drift_sketch import DriftSketch
+        from .models.scoring_job import ScoringJob
 
         db.create_all()
 
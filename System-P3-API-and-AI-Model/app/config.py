@@ -24,17 +24,199 @@ class Config:
     # Model settings
     MODEL_PATH = os.path.join(os.path.dirname(__file__), 'ai_classification_models', 'runners_injury_prediction_model.pkl')
 
+    # joblib mmap_mode for the model's NumPy arrays ('r' shares them between workers, empty to load in memory)
+    MODEL_MMAP_MODE = os.environ.get('MODEL_MMAP_MODE', 'r') or None
+
+    # Model file format: 'auto' loads the compact .rmodel export next to the pickle when present, 'pickle' always unpickles
+    MODEL_ARTIFACT_FORMAT = os.environ.get('MODEL_ARTIFACT_FORMAT', 'auto').lower()
+
+    # Score supported estimators with the compiled NumPy evaluator instead of scikit-learn
+    COMPILE_RUNNERS_MODEL = os.environ.get('COMPILE_RUNNERS_MODEL', 'true').lower() == 'true'
+
+    # Exact KD-tree index for KNN models with at least KNN_INDEX_MIN_ROWS reference rows, persisted next to the model
+    KNN_INDEX_ENABLED = os.environ.get('KNN_INDEX_ENABLED', 'true').lower() == 'true'
+    KNN_INDEX_MIN_ROWS = int(os.environ.get('KNN_INDEX_MIN_ROWS', '50000'))
+    # Rows per index leaf (0 picks about the cube root of the reference rows, at least 32)
+    KNN_INDEX_LEAF_SIZE = int(os.environ.get('KNN_INDEX_LEAF_SIZE', '0'))
+
+    # When to load the model: 'background' (warm-up thread at app start) or 'lazy' (first prediction)
+    MODEL_LOADING_MODE = os.environ.get('MODEL_LOADING_MODE', 'background').lower()
+
+    # Number of dummy rows scored to warm up a freshly loaded model before it serves traffic
+    MODEL_WARMUP_ROWS = int(os.environ.get('MODEL_WARMUP_ROWS', '8'))
+
+    # Seconds between checks of the active model pointer/artifact for changes (0 disables the watcher)
+    MODEL_WATCH_INTERVAL_SECONDS = float(os.environ.get('MODEL_WATCH_INTERVAL_SECONDS', '5'))
+
+    # Users allowed to reload/activate model versions (comma separated); coaches when empty
+    MODEL_ADMIN_EMAILS = [e.strip() for e in os.environ.get('MODEL_ADMIN_EMAILS', '').split(',') if e.strip()]
+
+    # Maximum number of rows accepted by /predict/batch in a single request
+    PREDICT_BATCH_MAX_ROWS = int(os.environ.get('PREDICT_BATCH_MAX_ROWS', '1000'))
+
+    # /predict/stream: NDJSON records scored per chunk of this many rows, and the longest accepted line
+    PREDICT_STREAM_CHUNK_ROWS = int(os.environ.get('PREDICT_STREAM_CHUNK_ROWS', '256'))
+    PREDICT_STREAM_MAX_LINE_BYTES = int(os.environ.get('PREDICT_STREAM_MAX_LINE_BYTES', '65536'))
+
+    # Opt-in coalescing of concurrent /predict calls into one vectorized model call
+    PREDICT_MICRO_BATCHING = os.environ.get('PREDICT_MICRO_BATCHING', 'false').lower() == 'true'
+    PREDICT_MICRO_BATCH_WINDOW_MS = float(os.environ.get('PREDICT_MICRO_BATCH_WINDOW_MS', '5'))
+    PREDICT_MICRO_BATCH_MAX_SIZE = int(os.environ.get('PREDICT_MICRO_BATCH_MAX_SIZE', '32'))
+
+    # Optional pool of long-lived inference processes (0 scores inline on the request thread)
+    INFERENCE_POOL_SIZE = int(os.environ.get('INFERENCE_POOL_SIZE', '0'))
+    INFERENCE_POOL_MAX_ROWS = int(os.environ.get('INFERENCE_POOL_MAX_ROWS', '1024'))
+    INFERENCE_POOL_TIMEOUT_SECONDS = float(os.environ.get('INFERENCE_POOL_TIMEOUT_SECONDS', '30'))
+    INFERENCE_POOL_HEALTH_INTERVAL_SECONDS = float(os.environ.get('INFERENCE_POOL_HEALTH_INTERVAL_SECONDS', '10'))
+    # How long an idle worker has to answer a health-check ping before it is restarted
+    INFERENCE_POOL_PING_TIMEOUT_SECONDS = float(os.environ.get('INFERENCE_POOL_PING_TIMEOUT_SECONDS', '1'))
+
+    # LRU cache of /predict model outputs keyed on model version + quantized features
+    PREDICTION_CACHE_ENABLED = os.environ.get('PREDICTION_CACHE_ENABLED', 'true').lower() == 'true'
+    PREDICTION_CACHE_MAX_ENTRIES = int(os.environ.get('PREDICTION_CACHE_MAX_ENTRIES', '10000'))
+    PREDICTION_CACHE_TTL_SECONDS = float(os.environ.get('PREDICTION_CACHE_TTL_SECONDS', '300'))
+
+    # Shadow scoring: model version labels scored alongside the active model on a sample of /predict
+    # inputs, by a background thread, to compare them before promotion (off when empty)
+    SHADOW_MODEL_LABELS = [l.strip() for l in os.environ.get('SHADOW_MODEL_LABELS', '').split(',') if l.strip()]
+    SHADOW_SAMPLE_RATE = float(os.environ.get('SHADOW_SAMPLE_RATE', '0.1'))
+    # Rows waiting for the shadow worker; sampled rows are dropped while it is full
+    SHADOW_QUEUE_SIZE = int(os.environ.get('SHADOW_QUEUE_SIZE', '1000'))
+    SHADOW_BATCH_SIZE = int(os.environ.get('SHADOW_BATCH_SIZE', '64'))
+
+    # ?explain=true on the prediction endpoints: per-feature contributions of tree models (decision tree,
+    # random forest), from tables built when the model loads and capped at EXPLAIN_MAX_TABLE_MB
+    EXPLAIN_ENABLED = os.environ.get('EXPLAIN_ENABLED', 'true').lower() == 'true'
+    EXPLAIN_TOP_FEATURES = int(os.environ.get('EXPLAIN_TOP_FEATURES', '3'))
+    EXPLAIN_MAX_TABLE_MB = float(os.environ.get('EXPLAIN_MAX_TABLE_MB', '256'))
+
+    # Feature drift: per-worker histograms (DRIFT_BINS equal bins over FEATURE_RANGES, plus under/overflow)
+    # of every prediction input and ingested reading, per DRIFT_WINDOW_SECONDS window, written to the
+    # drift_sketch table every DRIFT_FLUSH_SECONDS and compared with the model's reference profile
+    DRIFT_MONITOR_ENABLED = os.environ.get('DRIFT_MONITOR_ENABLED', 'true').lower() == 'true'
+    DRIFT_BINS = int(os.environ.get('DRIFT_BINS', '20'))
+    DRIFT_WINDOW_SECONDS = int(os.environ.get('DRIFT_WINDOW_SECONDS', '3600'))
+    DRIFT_FLUSH_SECONDS = float(os.environ.get('DRIFT_FLUSH_SECONDS', '10'))
+    DRIFT_RETENTION_HOURS = float(os.environ.get('DRIFT_RETENTION_HOURS', '168'))
+    # PSI at which a feature is reported as 'warning' / 'drift', and live rows needed before judging it
+    DRIFT_PSI_WARN = float(os.environ.get('DRIFT_PSI_WARN', '0.1'))
+    DRIFT_PSI_ALERT = float(os.environ.get('DRIFT_PSI_ALERT', '0.25'))
+    DRIFT_MIN_ROWS = int(os.environ.get('DRIFT_MIN_ROWS', '100'))
+
+    # "flask runners_model score": rows per chunk, and scoring processes (0 for one per CPU)
+    BULK_SCORING_CHUNK_ROWS = int(os.environ.get('BULK_SCORING_CHUNK_ROWS', '10000'))
+    BULK_SCORING_WORKERS = int(os.environ.get('BULK_SCORING_WORKERS', '0'))
+
+    # "flask runners_model retrain": cross-validation folds, parallel fits (0 for one per CPU),
+    # rows per streamed partition and the fewest labeled readings worth training on
+    RETRAIN_FOLDS = int(os.environ.get('RETRAIN_FOLDS', '5'))
+    RETRAIN_JOBS = int(os.environ.get('RETRAIN_JOBS', '0'))
+    RETRAIN_CHUNK_ROWS = int(os.environ.get('RETRAIN_CHUNK_ROWS', '10000'))
+    RETRAIN_MIN_ROWS = int(os.environ.get('RETRAIN_MIN_ROWS', '100'))
+
+    # Scoring jobs (POST /runners_model/jobs, run by "flask runners_model jobs-worker"):
+    # inputs and results directory (empty for <instance folder>/scoring_jobs) and largest upload
+    SCORING_JOBS_DIR = os.environ.get('SCORING_JOBS_DIR', '')
+    SCORING_JOB_MAX_UPLOAD_MB = int(os.environ.get('SCORING_JOB_MAX_UPLOAD_MB', '512'))
+    # Scoring processes per job (0 for one per CPU) and seconds between queue polls of an idle worker
+    SCORING_JOB_PROCESSES = int(os.environ.get('SCORING_JOB_PROCESSES', '0'))
+    SCORING_JOB_POLL_SECONDS = float(os.environ.get('SCORING_JOB_POLL_SECONDS', '2'))
+    # A running job whose worker has not heartbeated for SCORING_JOB_STALE_SECONDS is requeued,
+    # at most SCORING_JOB_MAX_ATTEMPTS times
+    SCORING_JOB_HEARTBEAT_SECONDS = float(os.environ.get('SCORING_JOB_HEARTBEAT_SECONDS', '10'))
+    SCORING_JOB_STALE_SECONDS = float(os.environ.get('SCORING_JOB_STALE_SECONDS', '120'))
+    SCORING_JOB_MAX_ATTEMPTS = int(os.environ.get('SCORING_JOB_MAX_ATTEMPTS', '3'))
+    # Finished jobs and their results are removed after this many hours (0 keeps them)
+    SCORING_JOB_RETENTION_HOURS = float(os.environ.get('SCORING_JOB_RETENTION_HOURS', '72'))
+
+    # Sensor precision (decimal places) used to quantize features for the prediction cache
+    FEATURE_PRECISION = {
+        'heart_rate': 0,
+        'body_temperature': 1,
+        'joint_angles': 1,
+        'gait_speed': 2,
+        'cadence': 0,
+        'step_count': 0,
+        'jump_height': 2,
+        'ground_reaction_force': 0,
+        'range_of_motion': 1,
+        'ambient_temperature': 1
+    }
+
+    # Persist session sample predictions per model version and serve repeated views from the table
+    PREDICTION_STORE_ENABLED = os.environ.get('PREDICTION_STORE_ENABLED', 'true').lower() == 'true'
+    # Rows per multi-row INSERT when storing predictions
+    PREDICTION_STORE_BATCH_SIZE = int(os.environ.get('PREDICTION_STORE_BATCH_SIZE', '500'))
+
+    # Server-Sent Events feed of new sensor readings (and their predictions) per session and coach
+    LIVE_FEED_ENABLED = os.environ.get('LIVE_FEED_ENABLED', 'true').lower() == 'true'
+    # Score each reading as it is ingested, publish the prediction and store it with the session predictions
+    LIVE_FEED_SCORE_ON_INGEST = os.environ.get('LIVE_FEED_SCORE_ON_INGEST', 'true').lower() == 'true'
+    # Events kept per session/coach for Last-Event-ID resume, and topics kept in memory
+    LIVE_FEED_REPLAY_EVENTS = int(os.environ.get('LIVE_FEED_REPLAY_EVENTS', '256'))
+    LIVE_FEED_MAX_TOPICS = int(os.environ.get('LIVE_FEED_MAX_TOPICS', '1024'))
+    LIVE_FEED_HEARTBEAT_SECONDS = float(os.environ.get('LIVE_FEED_HEARTBEAT_SECONDS', '10'))
+    # Streams end after this long and clients reconnect with Last-Event-ID (0 for no limit). Each open stream
+    # holds a worker thread, so the server needs threaded or async workers (gunicorn.conf.py uses gthread)
+    LIVE_FEED_MAX_STREAM_SECONDS = float(os.environ.get('LIVE_FEED_MAX_STREAM_SECONDS', '25'))
+
+    # Rolling per-session statistics of these readings, updated on every ingest. Each worker keeps its own;
+    # before use they are checked against the session's newest reading, so readings ingested, edited or
+    # deleted through other workers are picked up
+    ROLLING_FEATURES_ENABLED = os.environ.get('ROLLING_FEATURES_ENABLED', 'true').lower() == 'true'
+    ROLLING_FEATURES = [f.strip() for f in os.environ.get('ROLLING_FEATURES', 'heart_rate,cadence').split(',') if f.strip()]
+    # Time windows (seconds) and sample-count windows the statistics are kept over
+    ROLLING_WINDOW_SECONDS = [float(s) for s in os.environ.get('ROLLING_WINDOW_SECONDS', '30,300').split(',') if s.strip()]
+    ROLLING_WINDOW_SAMPLES = [int(s) for s in os.environ.get('ROLLING_WINDOW_SAMPLES', '10').split(',') if s.strip()]
+    ROLLING_EWMA_ALPHA = float(os.environ.get('ROLLING_EWMA_ALPHA', '0.2'))
+    # Readings kept per session for the windows, and sessions kept in memory
+    ROLLING_MAX_BUFFER_SAMPLES = int(os.environ.get('ROLLING_MAX_BUFFER_SAMPLES', '10000'))
+    ROLLING_MAX_SESSIONS = int(os.environ.get('ROLLING_MAX_SESSIONS', '1024'))
+
+    # Seconds per sample assumed for session summaries when sensor rows have no recorded_at
+    SENSOR_SAMPLE_INTERVAL_SECONDS = float(os.environ.get('SENSOR_SAMPLE_INTERVAL_SECONDS', '1'))
+
     # Alert settings
+    # Named confidence levels that alert rules can compare 'confidence' against
     ALERT_THRESHOLDS = {
         'high_confidence': 0.78,
         'medium_confidence': 0.50,
         'low_confidence': 0.45
     }
 
+    # Alert rules, evaluated in order: every rule whose conditions all hold adds its alert or recommendation.
+    # Conditions are {operand: value} or {operand: (operator, value)} over 'risk_level', 'confidence'
+    # and the model features; operators: > >= < <= == != in not_in between outside.
+    ALERT_RULES = [
+        {'when': {'risk_level': 2}, 'alert': "HIGH RISK: Potential injury detected!"},
+        {'when': {'risk_level': 2, 'heart_rate': ('>', 160)},
+         'recommendation': "Elevated heart rate detected - consider reducing intensity"},
+        {'when': {'risk_level': 2, 'body_temperature': ('>', 38)},
+         'recommendation': "High body temperature - hydrate and cool down"},
+        {'when': {'risk_level': 2, 'joint_angles': ('outside', 60, 175)},
+         'recommendation': "Abnormal joint angles detected - check form"},
+        {'when': {'risk_level': 1}, 'alert': "CAUTION: Elevated injury risk indicators"},
+        {'when': {'risk_level': 1}, 'recommendation': "Monitor your form and consider moderate intensity"},
+        {'when': {'risk_level': ('not_in', [1, 2])}, 'alert': "OPTIMAL: All parameters within safe ranges"},
+        {'when': {'risk_level': ('not_in', [1, 2])}, 'recommendation': "Maintain current performance level"}
+    ]
+
+    # Optional JSON file replacing ALERT_RULES (a list of rules, or {"thresholds": {...}, "rules": [...]}),
+    # re-read when it changes, checked at most every ALERT_RULES_CHECK_SECONDS
+    ALERT_RULES_PATH = os.environ.get('ALERT_RULES_PATH', '')
+    ALERT_RULES_CHECK_SECONDS = float(os.environ.get('ALERT_RULES_CHECK_SECONDS', '2'))
+
+    # Prometheus-text /metrics endpoint and the per-stage prediction timers behind it
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    # Bearer token required to scrape /metrics (open when empty)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
     # Logging
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
 
     # Data validation
+    # Values outside FEATURE_RANGES are 'reject'ed, accepted with a warning ('warn') or not checked ('ignore')
+    FEATURE_RANGE_POLICY = os.environ.get('FEATURE_RANGE_POLICY', 'warn').lower()
     FEATURE_RANGES = {
         'heart_rate': (40, 180),
         'body_temperature': (35.8, 39.2),
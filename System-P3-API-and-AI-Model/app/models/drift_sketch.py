@@ -0,0 +1,29 @@
+from ..config import db
+from .audit_base import AuditBase
+
+
+class DriftSketch(AuditBase):
+    __tablename__ = 'drift_sketch'
+    __table_args__ = (
+        # Each worker owns one row per window and source, overwritten on every flush
+        db.UniqueConstraint('window_start', 'worker', 'source', name='uq_drift_sketch_window_worker_source'),
+        # Drift reports read every worker's rows of the last windows
+        db.Index('ix_drift_sketch_window_start', 'window_start'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Start of the window (naive UTC), the process that filled it and what was observed ('predict' or 'ingest')
+    window_start = db.Column(db.DateTime, nullable=False)
+    worker = db.Column(db.String(128), nullable=False)
+    source = db.Column(db.String(16), nullable=False)
+
+    # Histogram layout the counts were taken with; rows with another layout are not merged
+    layout = db.Column(db.String(16), nullable=False)
+    rows = db.Column(db.Integer, nullable=False)
+    # {feature: {"counts": [...], "n": int, "sum": float, "sum_sq": float}}
+    sketch = db.Column(db.JSON, nullable=False)
+    flushed_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<DriftSketch {self.id} - {self.source} {self.window_start} {self.worker}>"
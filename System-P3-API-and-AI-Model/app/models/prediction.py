@@ -0,0 +1,27 @@
+from ..config import db
+from .audit_base import AuditBase
+
+
+class Prediction(AuditBase):
+    __tablename__ = 'prediction'
+    __table_args__ = (
+        # One stored result per sample and model version (also the index for per-sample lookups)
+        db.UniqueConstraint('sensor_data_id', 'model_version', name='uq_prediction_sensor_data_model_version'),
+        # Session views and history charts read every prediction of a session for a model version
+        db.Index('ix_prediction_session_model_version', 'session_id', 'model_version'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Foreign Keys
+    sensor_data_id = db.Column(db.Integer, db.ForeignKey('sensor_data.id'), nullable=False)
+    session_id = db.Column(db.Integer, db.ForeignKey('session.id'), nullable=False)
+
+    # Model output and provenance (version is "label:sha256 prefix" of the artifact that scored the sample)
+    model_version = db.Column(db.String(128), nullable=False)
+    risk_level = db.Column(db.Integer, nullable=False)
+    probabilities = db.Column(db.JSON, nullable=True)
+    predicted_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<Prediction {self.id} - SensorData: {self.sensor_data_id}>"
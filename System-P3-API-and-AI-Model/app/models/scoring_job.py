@@ -0,0 +1,51 @@
+from ..config import db
+from .audit_base import AuditBase
+
+
+class ScoringJob(AuditBase):
+    __tablename__ = 'scoring_job'
+    __table_args__ = (
+        # Job workers claim the oldest queued job
+        db.Index('ix_scoring_job_status_id', 'status', 'id'),
+        # Users list their own jobs, newest first
+        db.Index('ix_scoring_job_owner_id', 'owner_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    owner_id = db.Column(db.Integer, db.ForeignKey('person.id'), nullable=False)
+
+    # 'queued', 'running', 'succeeded', 'failed' or 'cancelled'
+    status = db.Column(db.String(16), nullable=False, default='queued')
+
+    # What to score: the readings of session_ids ('sessions'), or an uploaded CSV file ('csv')
+    source = db.Column(db.String(16), nullable=False)
+    session_ids = db.Column(db.JSON, nullable=True)
+    input_name = db.Column(db.String(255), nullable=True)
+    id_column = db.Column(db.String(128), nullable=True)
+
+    # Model version label picked at submission, the exact artifact version that scored, and 'ndjson' or 'csv'
+    model_label = db.Column(db.String(64), nullable=False)
+    model_version = db.Column(db.String(128), nullable=True)
+    output_format = db.Column(db.String(8), nullable=False)
+
+    # Progress, updated by the worker after every chunk
+    chunks_total = db.Column(db.Integer, nullable=True)
+    chunks_done = db.Column(db.Integer, nullable=False, default=0)
+    rows_done = db.Column(db.Integer, nullable=False, default=0)
+    rows_failed = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+
+    # Set by a cancel request while running; the worker stops at the next chunk
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+
+    # Worker that holds the job and its last sign of life; a stale heartbeat puts the job back in the queue
+    worker = db.Column(db.String(128), nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+
+    submitted_at = db.Column(db.DateTime, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<ScoringJob {self.id} - {self.status}>"
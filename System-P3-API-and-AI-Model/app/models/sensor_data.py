@@ -3,6 +3,10 @@ from .audit_base import AuditBase
 
 class SensorData(AuditBase):
     __tablename__ = 'sensor_data'
+    __table_args__ = (
+        # A session's readings in ingest order, and its newest reading for the rolling statistics check
+        db.Index('ix_sensor_data_session_id_id', 'session_id', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.Integer, db.ForeignKey('session.id'), nullable=False)
@@ -19,6 +23,13 @@ class SensorData(AuditBase):
     ground_reaction_force = db.Column(db.Float, nullable=False)
     range_of_motion = db.Column(db.Float, nullable=False)
 
+    # When the device took the sample (optional; used for time-based session summaries)
+    recorded_at = db.Column(db.DateTime, nullable=True)
+
+    # Observed outcome of the reading (0 Healthy, 1 Low Risk, 2 Injured), set once known;
+    # labeled readings are the training data of "flask runners_model retrain"
+    risk_label = db.Column(db.Integer, nullable=True)
+
     # Relationship using string reference to avoid circular import
     session = db.relationship(
         "Session",
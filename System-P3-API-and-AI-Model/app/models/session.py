@@ -11,6 +11,9 @@ class Session(AuditBase):
     athlete_id = db.Column(db.Integer, db.ForeignKey('athlete.id'), nullable=False)
     coach_id = db.Column(db.Integer, db.ForeignKey('coach.id'), nullable=False)
 
+    # Bumped whenever a stored reading is edited or deleted, so every worker rebuilds its rolling statistics
+    readings_revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
     # Relationships using string references
     athlete = db.relationship(
         "Athlete",
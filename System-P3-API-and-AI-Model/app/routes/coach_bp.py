@@ -1,7 +1,8 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from ..config import db
 from ..models.coach import Coach
-from ..utils.auth import token_required
+from ..utils.auth import token_required, stream_token_required
+from ..utils.live_feed import live_feed, coach_topic, sse_response
 from datetime import date
 from werkzeug.security import generate_password_hash
 
@@ -111,4 +112,17 @@ def delete_coach(current_user, id):
         return jsonify({'message': 'Coach deleted successfully and athletes unassigned'}), 200
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': str(e)}), 400
\ No newline at end of file
+        return jsonify({'error': str(e)}), 400
+
+
+# LIVE FEED
+@coach_bp.route('/<int:id>/live', methods=['GET'])
+@stream_token_required
+def coach_live_feed(current_user, id):
+    """Server-Sent Events stream of new sensor readings and predictions across the coach's sessions."""
+    Coach.query.filter_by(id=id, deleted_on=None).first_or_404()
+
+    if not current_app.config.get('LIVE_FEED_ENABLED', True):
+        return jsonify({'error': 'Live feed is disabled.'}), 404
+
+    return sse_response(live_feed, coach_topic(id))
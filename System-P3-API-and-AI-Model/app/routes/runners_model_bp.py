@@ -1,122 +1,1131 @@
+import csv
+import itertools
+import json
+import os
+import shutil
+import signal
+import threading
+import click
 import numpy as np
-from flask import Blueprint, request, jsonify
-from ..utils.load_runners_model import load_runners_model, model_state
-from ..utils.generate_alert import generate_alert
+from flask import Blueprint, Response, request, jsonify, current_app, send_file, stream_with_context, url_for
+from ..config import db
+from ..models.scoring_job import ScoringJob
+from ..models.sensor_data import SensorData
+from ..models.session import Session
+from ..utils.model_registry import VERSION_LABEL_PATTERN, model_registry
+from ..utils.generate_alert import generate_alerts_batch, alert_rules
+from ..utils.predict_runners_model import (
+    get_required_features,
+    score_feature_matrix,
+    build_prediction_response
+)
+from ..utils.feature_schema import get_feature_schema
+from ..utils.micro_batcher import MicroBatcher
+from ..utils.ndjson_stream import iter_ndjson_chunks
+from ..utils.prediction_cache import PredictionCache
+from ..utils.inference_pool import InferencePool
+from ..utils.load_runners_model import load_runners_model
+from ..utils.shadow_scorer import ShadowScorer
+from ..utils.explain_runners_model import get_explainer, warm_explainer, build_explanation
+from ..utils.drift_monitor import (
+    SOURCES as DRIFT_SOURCES,
+    drift_monitor,
+    drift_report,
+    profile_path_for,
+    load_reference_profile,
+    build_reference_profile,
+    save_reference_profile,
+    reference_rows_from_model
+)
+from ..utils.model_artifact import compact_path_for, export_compact_artifact
+from ..utils.bulk_scoring import OUTPUT_FORMATS, CsvInput, SensorDataInput, run_bulk_scoring, checkpoint_path_for
+from ..utils.retrain_runners_model import SEARCH_SPACES, retrain_runners_model
+from ..utils.scoring_jobs import (
+    JOB_STATUSES,
+    RESULT_MIMETYPES,
+    ScoringJobWorker,
+    cancel_scoring_job,
+    job_paths,
+    job_to_dict,
+    jobs_dir,
+    submit_scoring_job
+)
 from ..utils.auth import token_required
+from ..utils.metrics import metrics, stage, instrumented, record_batch, record_error, record_row_errors
+from datetime import datetime, timezone
 
-runners_model_bp = Blueprint('runners_model_bp', __name__)
+runners_model_bp = Blueprint('runners_model_bp', __name__, cli_group='runners_model')
 
-# Attempt to load immediately
-load_runners_model()
+# Created on first use so it picks up the app configuration
+inference_pool = None
+_inference_pool_lock = threading.Lock()
+
+
+def get_scorer():
+    """Returns the function scoring (matrix, bundle): the process pool when enabled, inline otherwise."""
+    global inference_pool
+
+    pool_size = current_app.config.get('INFERENCE_POOL_SIZE', 0)
+    if pool_size <= 0:
+        return score_feature_matrix
+
+    with _inference_pool_lock:
+        if inference_pool is None:
+            inference_pool = InferencePool(
+                pool_size,
+                max_rows=current_app.config.get('INFERENCE_POOL_MAX_ROWS', 1024),
+                timeout=current_app.config.get('INFERENCE_POOL_TIMEOUT_SECONDS', 30.0),
+                health_interval=current_app.config.get('INFERENCE_POOL_HEALTH_INTERVAL_SECONDS', 10.0),
+                ping_timeout=current_app.config.get('INFERENCE_POOL_PING_TIMEOUT_SECONDS', 1.0)
+            )
+
+    return inference_pool.score
+
+
+micro_batcher = None
+_micro_batcher_lock = threading.Lock()
+
+
+def _get_micro_batcher():
+    global micro_batcher
+
+    with _micro_batcher_lock:
+        if micro_batcher is None:
+            micro_batcher = MicroBatcher(
+                get_scorer(),
+                window_ms=current_app.config.get('PREDICT_MICRO_BATCH_WINDOW_MS', 5.0),
+                max_batch_size=current_app.config.get('PREDICT_MICRO_BATCH_MAX_SIZE', 32)
+            )
+
+    return micro_batcher
+
+
+# Created on first use; cleared whenever the registry swaps in a new model
+prediction_cache = None
+_prediction_cache_lock = threading.Lock()
+
+
+def _get_prediction_cache():
+    global prediction_cache
+
+    with _prediction_cache_lock:
+        if prediction_cache is None:
+            prediction_cache = PredictionCache(
+                current_app.config.get('FEATURE_PRECISION', {}),
+                max_entries=current_app.config.get('PREDICTION_CACHE_MAX_ENTRIES', 10000),
+                ttl_seconds=current_app.config.get('PREDICTION_CACHE_TTL_SECONDS', 300)
+            )
+            model_registry.add_listener(lambda old_bundle, new_bundle: prediction_cache.clear())
+
+    return prediction_cache
+
+
+# Created on first use when candidate versions are configured
+shadow_scorer = None
+_shadow_scorer_lock = threading.Lock()
+
+
+def _load_shadow_candidate(label):
+    if not model_registry.has_artifact(label):
+        raise ValueError(f"Unknown model version: {label}")
+    return load_runners_model(model_registry.artifact_path(label), label=label)
+
+
+def _get_shadow_scorer():
+    global shadow_scorer
+
+    if not current_app.config.get('SHADOW_MODEL_LABELS'):
+        return None
+
+    if shadow_scorer is None:
+        with _shadow_scorer_lock:
+            if shadow_scorer is None:
+                shadow_scorer = ShadowScorer(
+                    current_app.config['SHADOW_MODEL_LABELS'],
+                    _load_shadow_candidate,
+                    sample_rate=current_app.config.get('SHADOW_SAMPLE_RATE', 0.1),
+                    queue_size=current_app.config.get('SHADOW_QUEUE_SIZE', 1000),
+                    batch_size=current_app.config.get('SHADOW_BATCH_SIZE', 64)
+                )
+
+    return shadow_scorer
+
+
+# Contribution tables are built on the loading thread, not by the first explained request
+model_registry.add_listener(lambda old_bundle, new_bundle: warm_explainer(new_bundle))
+
+
+def _explain_option(bundle):
+    """
+    Reads ?explain=true (and ?explain_top=N) for a prediction request.
+    Returns (top_n, None) when explanations were asked for, (None, None) when not, or (None, error response).
+    """
+    if request.args.get('explain', '').lower() not in ('1', 'true', 'yes'):
+        return None, None
+
+    if not current_app.config.get('EXPLAIN_ENABLED', True):
+        return None, (jsonify({'error': 'Explanations are disabled.'}), 400)
+
+    try:
+        top_n = int(request.args.get('explain_top', current_app.config.get('EXPLAIN_TOP_FEATURES', 3)))
+    except ValueError:
+        return None, (jsonify({'error': 'explain_top must be an integer.'}), 400)
+
+    try:
+        get_explainer(bundle)
+    except ValueError as e:
+        return None, (jsonify({'error': str(e)}), 400)
+
+    return top_n, None
+
+
+def _explain_single_row(feature_matrix, risk_level, bundle, required_features, top_n):
+    """Explains a 1-row matrix, through the prediction cache when enabled (keyed like the model output)."""
+    cache = _get_prediction_cache() if current_app.config.get('PREDICTION_CACHE_ENABLED') else None
+
+    explained = None
+    if cache is not None:
+        cache_key = ('explanation', int(risk_level)) + cache.make_key(bundle.version, feature_matrix[0], required_features)
+        explained = cache.get(cache_key)
+
+    if explained is None:
+        with stage('predict', 'explain'):
+            contributions, base_values = get_explainer(bundle).explain(feature_matrix, [risk_level])
+        explained = (contributions[0], base_values[0])
+        if cache is not None:
+            cache.put(cache_key, explained)
+
+    return build_explanation(explained[0], explained[1], required_features, feature_matrix[0], top_n)
+
+
+def _score_single_row(feature_matrix, bundle, required_features):
+    """Scores a 1-row matrix through the prediction cache and micro-batcher when enabled."""
+    cache = _get_prediction_cache() if current_app.config.get('PREDICTION_CACHE_ENABLED') else None
+
+    if cache is not None:
+        with stage('predict', 'cache'):
+            cache_key = cache.make_key(bundle.version, feature_matrix[0], required_features)
+            cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    with stage('predict', 'inference'):
+        if current_app.config.get('PREDICT_MICRO_BATCHING'):
+            # Coalesce with other in-flight requests into one vectorized call
+            risk_level, row_probabilities = _get_micro_batcher().score(feature_matrix[0], bundle)
+        else:
+            risk_levels, probabilities = get_scorer()(feature_matrix, bundle)
+            risk_level = risk_levels[0]
+            row_probabilities = probabilities[0] if probabilities is not None else None
+    record_batch('predict', 1)
+
+    if cache is not None:
+        cache.put(cache_key, (risk_level, row_probabilities))
+
+    return risk_level, row_probabilities
+
+
+def get_model_bundle():
+    """
+    Returns (bundle, None) for the active model, reloading it if needed,
+    or (None, error_response) if it is still unavailable.
+    """
+    # Load on first use if the background warm-up has not finished (or is disabled)
+    bundle = model_registry.ensure_loaded()
+
+    # Check status again
+    if bundle is None:
+        return None, (jsonify({
+            'error': 'AI Model is not available on the server.',
+            'details': model_registry.error,
+            'status': model_registry.status
+        }), 500)
+
+    return bundle, None
+
+
+def _is_model_admin(user):
+    admin_emails = current_app.config.get('MODEL_ADMIN_EMAILS') or []
+    if admin_emails:
+        return user.email in admin_emails
+    return user.type == 'coach'
 
 
 @runners_model_bp.route('/predict', methods=['POST'])
+@instrumented('predict')
 @token_required
 def predict(current_user):
-    # Reload if needed
-    if model_state['status'] != 'Loaded':
-        load_runners_model()
+    # Hold on to this bundle for the whole request, even if a new version is swapped in meanwhile
+    bundle, unavailable = get_model_bundle()
+    if unavailable:
+        record_error('predict', 'model_unavailable')
+        return unavailable
 
-    # Check status again
-    if model_state['status'] != 'Loaded':
-        return jsonify({
-            'error': 'AI Model is not available on the server.',
-            'details': model_state['error'],
-            'status': model_state['status']
-        }), 500
+    explain_top, explain_error = _explain_option(bundle)
+    if explain_error:
+        return explain_error
 
-    data = request.get_json(force=True)
+    with stage('predict', 'parse'):
+        data = request.get_json(force=True)
 
     if not data:
         return jsonify({'error': 'No input data provided'}), 400
 
-    # Determine required features
-    if model_state['feature_names']:
-        required_features = model_state['feature_names']
-    else:
-        # Fallback order matches notebook
-        required_features = [
-            'heart_rate',
-            'body_temperature',
-            'joint_angles',
-            'gait_speed',
-            'cadence',
-            'step_count',
-            'jump_height',
-            'ground_reaction_force',
-            'range_of_motion',
-            'ambient_temperature'
-        ]
+    required_features = get_required_features(bundle)
+
+    try:
+        with stage('predict', 'validate'):
+            feature_matrix, row_errors, row_warnings = get_feature_schema(required_features).parse_records([data])
+
+        if row_errors:
+            record_row_errors('predict', row_errors)
+            return jsonify({'error': row_errors[0][0]['message'], 'details': row_errors[0]}), 400
+
+        risk_level, row_probabilities = _score_single_row(feature_matrix, bundle, required_features)
 
-    # Features that must physically be non-negative
-    # ambient_temperature is excluded as it can be negative in winter conditions
-    non_negative_features = [
-        'heart_rate',
-        'body_temperature',
-        'joint_angles',
-        'gait_speed',
-        'cadence',
-        'step_count',
-        'jump_height',
-        'ground_reaction_force',
-        'range_of_motion'
+        with stage('predict', 'drift'):
+            drift_monitor.observe('predict', feature_matrix, required_features)
+
+        shadow = _get_shadow_scorer()
+        if shadow is not None:
+            # Non-blocking: a full shadow queue drops the row instead of delaying the response
+            shadow.offer(feature_matrix[0], risk_level, row_probabilities, bundle.version)
+
+        with stage('predict', 'alerts'):
+            alerts, recommendations = generate_alerts_batch(
+                [risk_level],
+                [row_probabilities] if row_probabilities is not None else None,
+                feature_matrix,
+                required_features
+            )[0]
+
+        with stage('predict', 'serialize'):
+            response = build_prediction_response(risk_level, row_probabilities, alerts, recommendations, bundle.version)
+            if explain_top is not None:
+                response['explanation'] = _explain_single_row(
+                    feature_matrix, risk_level, bundle, required_features, explain_top
+                )
+            if row_warnings:
+                response['warnings'] = row_warnings[0]
+            response = jsonify(response)
+
+        return response, 200
+
+    except Exception as e:
+        record_error('predict', f'exception:{type(e).__name__}')
+        return jsonify({'error': f'Prediction logic error: {str(e)}'}), 500
+
+
+def _score_rows(feature_matrix, row_errors, row_warnings, bundle, required_features, first_index=0,
+                endpoint='predict_batch', explain_top=None):
+    """
+    Scores the rows without errors in one vectorized call and builds one result per row, in order:
+    the prediction response, or the row's error. Results are indexed from first_index.
+    With explain_top set, each prediction also gets its top contributing features.
+    """
+    record_row_errors(endpoint, row_errors)
+
+    n_rows = feature_matrix.shape[0]
+    results = [
+        {'index': first_index + i, 'error': row_errors[i][0]['message'], 'details': row_errors[i]}
+        if i in row_errors else None
+        for i in range(n_rows)
     ]
 
-    try:
-        features_list = []
-        input_data_for_alerts = {}
+    valid_rows = np.array([i for i in range(n_rows) if i not in row_errors], dtype=int)
+
+    if valid_rows.size:
+        valid_matrix = feature_matrix[valid_rows]
+        with stage(endpoint, 'inference'):
+            risk_levels, probabilities = get_scorer()(valid_matrix, bundle)
+        record_batch(endpoint, valid_rows.size)
+
+        with stage(endpoint, 'drift'):
+            drift_monitor.observe('predict', valid_matrix, required_features)
+
+        with stage(endpoint, 'alerts'):
+            alert_results = generate_alerts_batch(risk_levels, probabilities, valid_matrix, required_features)
+
+        if explain_top is not None:
+            with stage(endpoint, 'explain'):
+                contributions, base_values = get_explainer(bundle).explain(valid_matrix, risk_levels)
+
+        with stage(endpoint, 'format'):
+            for k, i in enumerate(valid_rows):
+                alerts, recommendations = alert_results[k]
+                row_probabilities = probabilities[k] if probabilities is not None else None
+                response = build_prediction_response(
+                    risk_levels[k], row_probabilities, alerts, recommendations, bundle.version
+                )
+                results[i] = {'index': first_index + int(i), **response}
+                if explain_top is not None:
+                    results[i]['explanation'] = build_explanation(
+                        contributions[k], base_values[k], required_features, valid_matrix[k], explain_top
+                    )
+                if i in row_warnings:
+                    results[i]['warnings'] = row_warnings[i]
 
-        for feature in required_features:
-            value = data.get(feature)
-            # Handle naming mismatch
-            if value is None and feature == 'joint_angles':
-                value = data.get('joint_angle')
+    return results
 
-            if value is None:
-                return jsonify({'error': f'Missing required feature: {feature}'}), 400
 
-            parsed_val = float(value)
-            if feature == 'step_count':
-                parsed_val = int(value)
+@runners_model_bp.route('/predict/batch', methods=['POST'])
+@instrumented('predict_batch')
+@token_required
+def predict_batch(current_user):
+    # Hold on to this bundle for the whole request, even if a new version is swapped in meanwhile
+    bundle, unavailable = get_model_bundle()
+    if unavailable:
+        record_error('predict_batch', 'model_unavailable')
+        return unavailable
 
-            # Ensure value is not negative
-            if feature in non_negative_features and parsed_val < 0:
-                return jsonify({'error': f'Invalid value for {feature}: must be non-negative.'}), 400
+    explain_top, explain_error = _explain_option(bundle)
+    if explain_error:
+        return explain_error
 
-            features_list.append(parsed_val)
-            input_data_for_alerts[feature] = parsed_val
+    with stage('predict_batch', 'parse'):
+        data = request.get_json(force=True)
 
-        input_vector = np.array([features_list])
+    if not data:
+        return jsonify({'error': 'No input data provided'}), 400
 
-        if model_state['scaler']:
-            input_vector = model_state['scaler'].transform(input_vector)
+    required_features = get_required_features(bundle)
+    schema = get_feature_schema(required_features)
 
-        model = model_state['model']
-        prediction = model.predict(input_vector)[0]
-        risk_level = int(prediction)
+    # Accept a bare list of records, {"records": [...]} or columnar {"columns": {feature: [...]}}
+    try:
+        with stage('predict_batch', 'validate'):
+            if isinstance(data, list):
+                feature_matrix, row_errors, row_warnings = schema.parse_records(data)
+            elif not isinstance(data, dict):
+                return jsonify({'error': 'Expected a list of records, "records" or "columns".'}), 400
+            elif isinstance(data.get('records'), list):
+                feature_matrix, row_errors, row_warnings = schema.parse_records(data['records'])
+            elif isinstance(data.get('columns'), dict):
+                feature_matrix, row_errors, row_warnings = schema.parse_columns(data['columns'])
+            else:
+                return jsonify({'error': 'Expected a list of records, "records" or "columns".'}), 400
+    except ValueError as e:
+        record_error('predict_batch', 'validation:malformed_columns')
+        return jsonify({'error': str(e)}), 400
 
-        probabilities = []
-        confidence = 0.0
+    n_rows = feature_matrix.shape[0]
+    max_rows = current_app.config.get('PREDICT_BATCH_MAX_ROWS', 1000)
 
-        if hasattr(model, 'predict_proba'):
-            probs_array = model.predict_proba(input_vector)[0]
-            probabilities = [round(float(p), 4) for p in probs_array]
-            confidence = probabilities[risk_level]
+    if n_rows == 0:
+        return jsonify({'error': 'No input data provided'}), 400
 
-        alerts, recommendations = generate_alert(risk_level, probabilities, input_data_for_alerts)
+    if n_rows > max_rows:
+        return jsonify({'error': f'Batch too large: {n_rows} rows (maximum is {max_rows}).'}), 413
 
-        labels = {0: "Healthy", 1: "Low Risk", 2: "Injured"}
+    try:
+        results = _score_rows(
+            feature_matrix, row_errors, row_warnings, bundle, required_features, explain_top=explain_top
+        )
 
-        response = {
-            "risk_level": risk_level,
-            "risk_label": labels.get(risk_level, "Unknown"),
-            "confidence": confidence,
-            "probabilities": probabilities,
-            "alerts": alerts,
-            "recommendations": recommendations
-        }
+        with stage('predict_batch', 'serialize'):
+            response = jsonify({
+                'count': n_rows,
+                'succeeded': n_rows - len(row_errors),
+                'failed': len(row_errors),
+                'model_version': bundle.version,
+                'results': results
+            })
 
-        return jsonify(response), 200
+        return response, 200
 
     except Exception as e:
+        record_error('predict_batch', f'exception:{type(e).__name__}')
         return jsonify({'error': f'Prediction logic error: {str(e)}'}), 500
+
+
+@runners_model_bp.route('/predict/stream', methods=['POST'])
+@instrumented('predict_stream')
+@token_required
+def predict_stream(current_user):
+    """
+    Scores newline-delimited JSON records (one feature object per line) chunk by chunk as the body arrives,
+    streaming one NDJSON result line per record, then a final {"summary": {...}} line.
+    """
+    # Hold on to this bundle for the whole stream, even if a new version is swapped in meanwhile
+    bundle, unavailable = get_model_bundle()
+    if unavailable:
+        record_error('predict_stream', 'model_unavailable')
+        return unavailable
+
+    explain_top, explain_error = _explain_option(bundle)
+    if explain_error:
+        return explain_error
+
+    required_features = get_required_features(bundle)
+    schema = get_feature_schema(required_features)
+    chunk_rows = max(1, current_app.config.get('PREDICT_STREAM_CHUNK_ROWS', 256))
+    max_line_bytes = current_app.config.get('PREDICT_STREAM_MAX_LINE_BYTES', 65536)
+
+    def generate():
+        count, failed = 0, 0
+
+        try:
+            chunks = iter_ndjson_chunks(request.stream, chunk_rows, max_line_bytes)
+            while True:
+                # Includes waiting for the client to upload the chunk
+                with stage('predict_stream', 'parse'):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                first_index, records, line_errors = chunk
+
+                with stage('predict_stream', 'validate'):
+                    feature_matrix, row_errors, row_warnings = schema.parse_records(records)
+                    # Unreadable lines keep their own error rather than "must be a JSON object"
+                    row_errors.update(line_errors)
+
+                results = _score_rows(
+                    feature_matrix, row_errors, row_warnings, bundle, required_features, first_index,
+                    'predict_stream', explain_top
+                )
+                count += len(results)
+                failed += len(row_errors)
+
+                with stage('predict_stream', 'serialize'):
+                    body = ''.join(json.dumps(result) + '\n' for result in results)
+                yield body
+
+        except Exception as e:
+            record_error('predict_stream', f'exception:{type(e).__name__}')
+            # Headers are already sent: report the failure in-band and stop
+            yield json.dumps({'error': f'Prediction logic error: {str(e)}'}) + '\n'
+            return
+
+        yield json.dumps({'summary': {
+            'count': count,
+            'succeeded': count - failed,
+            'failed': failed,
+            'model_version': bundle.version
+        }}) + '\n'
+
+    # A generator body is sent with chunked transfer encoding, one chunk per scored chunk of rows
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def _collect_scoring_metrics():
+    """/metrics families for the prediction cache, micro-batcher and inference pool of this process."""
+    families = []
+
+    if prediction_cache is not None:
+        cache = prediction_cache.get_metrics()
+        families += [
+            ('rips_prediction_cache_lookups_total', 'counter', 'Prediction cache lookups by result.',
+             [({'result': 'hit'}, cache['hits']), ({'result': 'miss'}, cache['misses'])]),
+            ('rips_prediction_cache_removals_total', 'counter', 'Prediction cache entries removed by reason.',
+             [({'reason': reason}, cache[f'{reason}s']) for reason in ('eviction', 'expiration', 'invalidation')]),
+            ('rips_prediction_cache_entries', 'gauge', 'Entries in the prediction cache.', [({}, cache['size'])])
+        ]
+
+    if micro_batcher is not None:
+        batcher = micro_batcher.get_metrics()
+        families += [
+            ('rips_micro_batcher_batches_total', 'counter', 'Batches scored by the micro-batcher.', [({}, batcher['batches'])]),
+            ('rips_micro_batcher_rows_total', 'counter', 'Rows scored by the micro-batcher.', [({}, batcher['rows_scored'])]),
+            ('rips_micro_batcher_errors_total', 'counter', 'Micro-batches that failed.', [({}, batcher['errors'])]),
+            ('rips_micro_batcher_queue_depth', 'gauge', 'Rows waiting for the micro-batcher.', [({}, batcher['queue_depth'])])
+        ]
+
+    if inference_pool is not None:
+        pool = inference_pool.get_metrics()
+        families += [
+            ('rips_inference_pool_calls_total', 'counter', 'Scoring calls dispatched to the inference pool.', [({}, pool['calls'])]),
+            ('rips_inference_pool_errors_total', 'counter', 'Inference pool failures by type.',
+             [({'type': kind}, pool[key]) for kind, key in (('error', 'errors'), ('timeout', 'timeouts'), ('restart', 'restarts'),
+                                                            ('version_fallback', 'version_fallbacks'))]),
+            ('rips_inference_pool_idle_workers', 'gauge', 'Idle inference pool workers.', [({}, pool['idle_workers'])])
+        ]
+
+    if shadow_scorer is not None:
+        shadow = shadow_scorer.get_metrics()
+        families += [
+            ('rips_shadow_rows_total', 'counter', 'Sampled /predict rows offered to the shadow worker by outcome.',
+             [({'outcome': 'queued'}, shadow['queued']), ({'outcome': 'dropped'}, shadow['dropped'])]),
+            ('rips_shadow_queue_depth', 'gauge', 'Rows waiting for the shadow worker.', [({}, shadow['queue_depth'])]),
+            ('rips_shadow_compared_rows_total', 'counter', 'Rows scored by a candidate model.',
+             [({'candidate': c['candidate_version'], 'primary': c['primary_version']}, c['rows']) for c in shadow['comparisons']]),
+            ('rips_shadow_agreement_ratio', 'gauge', 'Share of rows where the candidate predicts the primary risk level.',
+             [({'candidate': c['candidate_version'], 'primary': c['primary_version']}, c['agreement_rate']) for c in shadow['comparisons']])
+        ]
+
+    if drift_monitor.enabled:
+        drift = drift_monitor.get_metrics()
+        families += [
+            ('rips_drift_rows_total', 'counter', 'Rows added to the feature drift histograms.', [({}, drift['rows'])]),
+            ('rips_drift_flushes_total', 'counter', 'Drift histogram writes to the database by outcome.',
+             [({'outcome': 'ok'}, drift['flushes']), ({'outcome': 'error'}, drift['flush_errors'])])
+        ]
+
+    return families
+
+
+metrics.add_collector(_collect_scoring_metrics)
+
+
+@runners_model_bp.route('/micro_batcher/stats', methods=['GET'])
+@token_required
+def micro_batcher_stats(current_user):
+    if micro_batcher is None:
+        return jsonify({
+            'enabled': bool(current_app.config.get('PREDICT_MICRO_BATCHING')),
+            'message': 'Micro-batcher has not received any requests yet.'
+        }), 200
+
+    return jsonify({
+        'enabled': bool(current_app.config.get('PREDICT_MICRO_BATCHING')),
+        **micro_batcher.get_metrics()
+    }), 200
+
+
+@runners_model_bp.route('/cache/stats', methods=['GET'])
+@token_required
+def prediction_cache_stats(current_user):
+    enabled = bool(current_app.config.get('PREDICTION_CACHE_ENABLED'))
+
+    if prediction_cache is None:
+        return jsonify({'enabled': enabled, 'message': 'Prediction cache has not received any requests yet.'}), 200
+
+    return jsonify({'enabled': enabled, **prediction_cache.get_metrics()}), 200
+
+
+@runners_model_bp.route('/inference_pool/stats', methods=['GET'])
+@token_required
+def inference_pool_stats(current_user):
+    if inference_pool is None:
+        return jsonify({
+            'enabled': current_app.config.get('INFERENCE_POOL_SIZE', 0) > 0,
+            'message': 'Inference pool has not received any requests yet.'
+        }), 200
+
+    return jsonify({'enabled': True, **inference_pool.get_metrics()}), 200
+
+
+@runners_model_bp.route('/shadow/stats', methods=['GET'])
+@token_required
+def shadow_stats(current_user):
+    if shadow_scorer is None:
+        return jsonify({
+            'enabled': bool(current_app.config.get('SHADOW_MODEL_LABELS')),
+            'message': 'Shadow scoring has not received any requests yet.'
+        }), 200
+
+    return jsonify({'enabled': True, **shadow_scorer.get_metrics()}), 200
+
+
+@runners_model_bp.route('/shadow/reset', methods=['POST'])
+@token_required
+def reset_shadow(current_user):
+    if not _is_model_admin(current_user):
+        return jsonify({'error': 'Only model administrators can reset shadow scoring.'}), 403
+
+    if shadow_scorer is not None:
+        shadow_scorer.reset()
+
+    return jsonify({'message': 'Shadow comparisons cleared; candidates are reloaded on the next sampled row'}), 200
+
+
+@runners_model_bp.route('/drift', methods=['GET'])
+@token_required
+def feature_drift(current_user):
+    """
+    PSI and KS drift of each feature over the last ?hours= (default 24), merged across workers, against the
+    reference profile of ?version= (the active version by default), for ?source=predict, ingest or all.
+    """
+    if not drift_monitor.enabled:
+        return jsonify({'error': 'Drift monitoring is disabled.'}), 400
+
+    label = request.args.get('version') or model_registry.active_label()
+    if not model_registry.has_artifact(label):
+        return jsonify({'error': f'Unknown model version: {label}'}), 404
+
+    try:
+        hours = float(request.args.get('hours', 24))
+    except ValueError:
+        return jsonify({'error': 'hours must be a number.'}), 400
+    if hours <= 0:
+        return jsonify({'error': 'hours must be positive.'}), 400
+
+    source = request.args.get('source', 'all')
+    if source != 'all' and source not in DRIFT_SOURCES:
+        return jsonify({'error': f"source must be one of: all, {', '.join(DRIFT_SOURCES)}."}), 400
+
+    profile = load_reference_profile(profile_path_for(model_registry.artifact_path(label)))
+    if profile is None:
+        return jsonify({
+            'error': f'No reference profile for model version {label}.',
+            'details': f'Run "flask runners_model drift-profile --version {label}" to build it.'
+        }), 404
+
+    try:
+        # Include this worker's latest rows; the others' are at most DRIFT_FLUSH_SECONDS old
+        drift_monitor.flush()
+    except Exception as e:
+        print(f"x Drift monitor flush failed: {str(e)}")
+
+    try:
+        report = drift_report(profile, hours, DRIFT_SOURCES if source == 'all' else (source,))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+
+    return jsonify({
+        'version': label,
+        'source': source,
+        'hours': hours,
+        'reference': {
+            'source': profile.get('source'),
+            'model_version': profile.get('model_version'),
+            'created_at': profile.get('created_at'),
+            'rows': profile.get('rows')
+        },
+        'thresholds': {
+            'psi_warning': current_app.config.get('DRIFT_PSI_WARN', 0.1),
+            'psi_drift': current_app.config.get('DRIFT_PSI_ALERT', 0.25),
+            'min_rows': current_app.config.get('DRIFT_MIN_ROWS', 100)
+        },
+        **report
+    }), 200
+
+
+def _copy_request_body(path):
+    with open(path, 'wb') as f:
+        shutil.copyfileobj(request.stream, f, 1024 * 1024)
+
+
+def _get_own_job(current_user, job_id):
+    """The job, if it exists and the user submitted it (model administrators see every job)."""
+    job = ScoringJob.query.filter_by(id=job_id, deleted_on=None).first()
+    if job is None or (job.owner_id != current_user.id and not _is_model_admin(current_user)):
+        return None
+    return job
+
+
+def _job_response(job):
+    response = job_to_dict(job)
+    response['status_url'] = url_for('runners_model_bp.get_scoring_job', job_id=job.id)
+    if job.status == 'succeeded':
+        response['results_url'] = url_for('runners_model_bp.get_scoring_job_results', job_id=job.id)
+    return response
+
+
+@runners_model_bp.route('/jobs', methods=['POST'])
+@token_required
+def submit_scoring_job_request(current_user):
+    """
+    Queues an offline scoring job and returns its id at once; a job worker ("flask runners_model jobs-worker") runs it.
+    Either a JSON body {"session_ids": [...]} scoring those sessions' stored readings, or a CSV upload
+    (multipart field "file", or a text/csv body) with a header row naming the features. Options come
+    from the JSON body or the query string / form: version, format ('ndjson' or 'csv') and, for CSV, id_column.
+    """
+    max_bytes = current_app.config.get('SCORING_JOB_MAX_UPLOAD_MB', 512) * 2 ** 20
+    if request.content_length is not None and request.content_length > max_bytes:
+        return jsonify({'error': f'Upload larger than {max_bytes // 2 ** 20} MB.'}), 413
+
+    if request.is_json:
+        options = request.get_json(silent=True)
+        if not isinstance(options, dict):
+            return jsonify({'error': 'Invalid JSON body.'}), 400
+    else:
+        options = {**request.args.to_dict(), **request.form.to_dict()}
+
+    label = options.get('version') or model_registry.active_label()
+    if not isinstance(label, str) or not model_registry.has_artifact(label):
+        return jsonify({'error': f'Unknown model version: {label}'}), 404
+
+    output_format = options.get('format', 'ndjson')
+    if output_format not in OUTPUT_FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(OUTPUT_FORMATS)}."}), 400
+
+    job_options = {}
+    if request.is_json:
+        session_ids = options.get('session_ids')
+        if (not isinstance(session_ids, list) or not session_ids
+                or not all(isinstance(i, int) and not isinstance(i, bool) for i in session_ids)):
+            return jsonify({'error': 'session_ids must be a non-empty list of session ids.'}), 400
+
+        session_ids = sorted(set(session_ids))
+        found = {row.id for row in Session.query.with_entities(Session.id).filter(
+            Session.id.in_(session_ids), Session.deleted_on.is_(None)
+        )}
+        missing = [i for i in session_ids if i not in found]
+        if missing:
+            return jsonify({'error': 'Unknown sessions.', 'details': missing[:100]}), 404
+
+        job_options.update(source='sessions', session_ids=session_ids)
+
+    elif 'file' in request.files:
+        upload = request.files['file']
+        job_options.update(source='csv', write_input=upload.save, input_name=upload.filename or None)
+
+    elif request.mimetype == 'text/csv':
+        job_options.update(source='csv', write_input=_copy_request_body, input_name=options.get('name'))
+
+    else:
+        return jsonify({'error': 'Send {"session_ids": [...]} as JSON, or a CSV file ("file" field or a text/csv body).'}), 400
+
+    if job_options['source'] == 'csv':
+        job_options['id_column'] = options.get('id_column') or None
+
+    try:
+        job = submit_scoring_job(current_app, current_user, model_label=label, output_format=output_format, **job_options)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid upload: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'Could not queue the job: {str(e)}'}), 500
+
+    return jsonify(_job_response(job)), 202
+
+
+@runners_model_bp.route('/jobs', methods=['GET'])
+@token_required
+def list_scoring_jobs(current_user):
+    """The user's scoring jobs (every job for model administrators), newest first; ?status= filters, ?limit= caps (100)."""
+    query = ScoringJob.query.filter(ScoringJob.deleted_on.is_(None))
+    if not _is_model_admin(current_user):
+        query = query.filter(ScoringJob.owner_id == current_user.id)
+
+    status = request.args.get('status')
+    if status:
+        if status not in JOB_STATUSES:
+            return jsonify({'error': f"status must be one of: {', '.join(JOB_STATUSES)}."}), 400
+        query = query.filter(ScoringJob.status == status)
+
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+    jobs = query.order_by(ScoringJob.id.desc()).limit(limit).all()
+    return jsonify([_job_response(job) for job in jobs]), 200
+
+
+@runners_model_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@token_required
+def get_scoring_job(current_user, job_id):
+    job = _get_own_job(current_user, job_id)
+    if job is None:
+        return jsonify({'error': 'Scoring job not found.'}), 404
+    return jsonify(_job_response(job)), 200
+
+
+@runners_model_bp.route('/jobs/<int:job_id>/results', methods=['GET'])
+@token_required
+def get_scoring_job_results(current_user, job_id):
+    """The job's results file (NDJSON or CSV, one result per input row in input order) once it has succeeded."""
+    job = _get_own_job(current_user, job_id)
+    if job is None:
+        return jsonify({'error': 'Scoring job not found.'}), 404
+    if job.status != 'succeeded':
+        return jsonify({'error': f'Scoring job is {job.status}; results are available once it has succeeded.'}), 409
+
+    _, _, output_path = job_paths(jobs_dir(current_app), job.id, job.output_format)
+    if not os.path.exists(output_path):
+        return jsonify({'error': 'The results of this job are no longer available.'}), 410
+
+    return send_file(
+        output_path, mimetype=RESULT_MIMETYPES[job.output_format], as_attachment=True,
+        download_name=f'scoring-job-{job.id}.{job.output_format}'
+    )
+
+
+@runners_model_bp.route('/jobs/<int:job_id>/cancel', methods=['POST'])
+@token_required
+def cancel_scoring_job_request(current_user, job_id):
+    job = _get_own_job(current_user, job_id)
+    if job is None:
+        return jsonify({'error': 'Scoring job not found.'}), 404
+
+    status = cancel_scoring_job(current_app, job.id, current_user.name)
+    if status is None:
+        db.session.refresh(job)
+        return jsonify({'error': f'Scoring job already {job.status}.'}), 409
+
+    db.session.refresh(job)
+    message = 'Scoring job cancelled' if status == 'cancelled' else 'Cancellation requested; the job stops after its current chunk'
+    return jsonify({'message': message, **_job_response(job)}), 202
+
+
+@runners_model_bp.route('/models', methods=['GET'])
+@token_required
+def list_models(current_user):
+    bundle = model_registry.current()
+
+    return jsonify({
+        'versions': model_registry.list_versions(),
+        'active_label': model_registry.active_label(),
+        'loaded_version': bundle.version if bundle else None,
+        'loaded_at': bundle.loaded_at if bundle else None,
+        'artifact': os.path.basename(bundle.path) if bundle else None,
+        'performance': bundle.performance if bundle else None,
+        'status': model_registry.status,
+        'error': model_registry.error
+    }), 200
+
+
+@runners_model_bp.route('/models/reload', methods=['POST'])
+@token_required
+def reload_model(current_user):
+    if not _is_model_admin(current_user):
+        return jsonify({'error': 'Only model administrators can reload the model.'}), 403
+
+    data = request.get_json(silent=True) or {}
+    label = data.get('version')
+
+    try:
+        if label:
+            # Updates the shared pointer file; other workers pick it up through their watcher
+            model_registry.activate(label)
+        else:
+            model_registry.reload_async()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+
+    return jsonify({
+        'message': 'Model reload started',
+        'version': label or model_registry.active_label()
+    }), 202
+
+
+@runners_model_bp.route('/alerts/rules', methods=['GET'])
+@token_required
+def list_alert_rules(current_user):
+    return jsonify(alert_rules.describe()), 200
+
+
+@runners_model_bp.route('/alerts/reload', methods=['POST'])
+@token_required
+def reload_alert_rules(current_user):
+    if not _is_model_admin(current_user):
+        return jsonify({'error': 'Only model administrators can reload the alert rules.'}), 403
+
+    try:
+        count = alert_rules.reload()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'message': 'Alert rules reloaded', 'source': alert_rules.source, 'rules': count}), 200
+
+
+@runners_model_bp.cli.command('export')
+@click.option('--version', 'label', default=None, help='Version label to export (defaults to every pickled version).')
+def export_model_command(label):
+    """Writes the compact, checksummed .rmodel artifact next to each pickled model version."""
+    labels = [label] if label else model_registry.list_versions()
+    failed = False
+
+    for label in labels:
+        model_path = model_registry.artifact_path(label)
+        if not os.path.exists(model_path):
+            click.echo(f"x {label}: no pickled model at {model_path}")
+            failed = True
+            continue
+
+        try:
+            header = export_compact_artifact(model_path)
+        except Exception as e:
+            click.echo(f"x {label}: export failed: {str(e)}")
+            failed = True
+            continue
+
+        click.echo(f"{label}: {os.path.basename(compact_path_for(model_path))} "
+                   f"({header['model']['estimator']}, payload sha256 {header['payload_sha256'][:12]})")
+
+    if failed:
+        raise SystemExit(1)
+
+
+def _iter_csv_matrices(path, chunk_rows=10000):
+    """Yields (feature_names, matrix) chunks of a CSV file with a header row; empty cells become NaN."""
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        feature_names = [name.strip() for name in next(reader)]
+        chunk = []
+        for line in reader:
+            chunk.append([float(value) if value.strip() else np.nan for value in line])
+            if len(chunk) >= chunk_rows:
+                yield feature_names, np.array(chunk, dtype=float)
+                chunk = []
+        if chunk:
+            yield feature_names, np.array(chunk, dtype=float)
+
+
+@runners_model_bp.cli.command('drift-profile')
+@click.option('--version', 'label', default=None, help='Version label to profile (defaults to the active version).')
+@click.option('--source', type=click.Choice(['model', 'sensor_data', 'csv']), default='model',
+              help="Reference rows: the model's own training rows (KNN), every stored sensor reading, or --csv.")
+@click.option('--csv', 'csv_path', default=None, type=click.Path(exists=True, dir_okay=False),
+              help='CSV file of reference rows, one column per feature, for --source csv.')
+def drift_profile_command(label, source, csv_path):
+    """Writes the reference feature profile /drift compares live inputs with, next to the pickled model version."""
+    label = label or model_registry.active_label()
+    model_path = model_registry.artifact_path(label)
+    if not model_registry.has_artifact(label):
+        click.echo(f"x {label}: no pickled model at {model_path}")
+        raise SystemExit(1)
+
+    try:
+        if source == 'model':
+            bundle = load_runners_model(model_path, label=label)
+            if bundle is None:
+                raise ValueError('the model could not be loaded')
+            feature_names = get_required_features(bundle)
+            profile = build_reference_profile(
+                [reference_rows_from_model(bundle, feature_names)], feature_names, 'model', bundle.version
+            )
+
+        elif source == 'sensor_data':
+            columns = [getattr(SensorData, name) for name in drift_monitor.layout['ranges'] if hasattr(SensorData, name)]
+            query = db.select(*columns).where(SensorData.deleted_on.is_(None))
+            with db.engine.connect() as connection:
+                # Streamed in partitions: the sketch stays the same size however many readings are stored
+                partitions = connection.execution_options(yield_per=10000).execute(query).partitions()
+                profile = build_reference_profile(
+                    (np.array(partition, dtype=float) for partition in partitions),
+                    [column.key for column in columns], 'sensor_data', label
+                )
+
+        else:
+            if not csv_path:
+                raise ValueError('--source csv needs --csv PATH')
+            chunks = _iter_csv_matrices(csv_path)
+            first = next(chunks, None)
+            if first is None:
+                raise ValueError(f'{csv_path} is empty')
+            profile = build_reference_profile(
+                (matrix for _, matrix in itertools.chain([first], chunks)), first[0], f'csv:{os.path.basename(csv_path)}', label
+            )
+
+        path = profile_path_for(model_path)
+        save_reference_profile(profile, path)
+    except (OSError, ValueError) as e:
+        click.echo(f"x {label}: drift profile failed: {str(e)}")
+        raise SystemExit(1)
+
+    click.echo(f"{label}: {os.path.basename(path)} ({profile['rows']} {source} rows, {len(profile['features'])} features)")
+
+
+@runners_model_bp.cli.command('score')
+@click.argument('output', type=click.Path(dir_okay=False))
+@click.option('--csv', 'csv_path', default=None, type=click.Path(exists=True, dir_okay=False),
+              help='CSV file to score, with a header row naming the features.')
+@click.option('--sensor-data', is_flag=True, help='Score the stored sensor readings instead of a CSV file.')
+@click.option('--session-id', type=int, default=None, help='With --sensor-data, only the readings of this session.')
+@click.option('--id-column', default=None, help='CSV column copied into every result to join them back.')
+@click.option('--version', 'label', default=None, help='Version label to score with (defaults to the active version).')
+@click.option('--chunk-rows', type=int, default=None, help='Rows per chunk (BULK_SCORING_CHUNK_ROWS by default).')
+@click.option('--workers', type=int, default=None, help='Scoring processes (BULK_SCORING_WORKERS by default, 0 for one per CPU).')
+@click.option('--format', 'output_format', type=click.Choice(['ndjson', 'csv']), default=None,
+              help='Output format (by default CSV for a .csv output, NDJSON otherwise).')
+@click.option('--resume', is_flag=True, help='Continue an interrupted run from its checkpoint.')
+def score_command(output, csv_path, sensor_data, session_id, id_column, label, chunk_rows, workers, output_format, resume):
+    """Scores a CSV export or the stored sensor readings offline, chunk by chunk across a process pool."""
+    if bool(csv_path) == bool(sensor_data):
+        click.echo("x Give either --csv PATH or --sensor-data")
+        raise SystemExit(1)
+
+    label = label or model_registry.active_label()
+    if not model_registry.has_artifact(label):
+        click.echo(f"x {label}: no model at {model_registry.artifact_path(label)}")
+        raise SystemExit(1)
+
+    chunk_rows = chunk_rows or current_app.config.get('BULK_SCORING_CHUNK_ROWS', 10000)
+    workers = workers if workers is not None else current_app.config.get('BULK_SCORING_WORKERS', 0)
+    workers = workers if workers > 0 else os.cpu_count() or 1
+    output_format = output_format or ('csv' if output.lower().endswith('.csv') else 'ndjson')
+
+    try:
+        if csv_path:
+            source = CsvInput(csv_path, chunk_rows, id_column=id_column)
+        else:
+            # The resolved URL: workers connect on their own, outside the app
+            source = SensorDataInput(db.engine.url.render_as_string(hide_password=False), chunk_rows, session_id)
+
+        result = run_bulk_scoring(
+            source, output, model_registry.artifact_path(label), label,
+            workers=workers, output_format=output_format, resume=resume, echo=click.echo
+        )
+    except KeyboardInterrupt:
+        click.echo(f"x Interrupted: run the same command with --resume to continue ({checkpoint_path_for(output)})")
+        raise SystemExit(130)
+    except (OSError, ValueError, RuntimeError) as e:
+        click.echo(f"x Scoring failed: {str(e)}")
+        raise SystemExit(1)
+
+    rate = f", {result['rows_per_second']:,.0f} rows/s" if 'rows_per_second' in result else ''
+    click.echo(f"{output}: {result['rows']} rows scored with {result['model_version']} "
+               f"({result['failed']} failed) in {result['seconds']:.1f}s{rate}")
+
+
+@runners_model_bp.cli.command('retrain')
+@click.option('--version', 'label', default=None, help='Version label of the new model (defaults to retrained-<UTC timestamp>).')
+@click.option('--model', 'model_names', type=click.Choice(['all', *SEARCH_SPACES]), default='all',
+              help='Estimator family to search (defaults to every family).')
+@click.option('--folds', type=int, default=None, help='Cross-validation folds (RETRAIN_FOLDS by default).')
+@click.option('--jobs', type=int, default=None, help='Parallel fits (RETRAIN_JOBS by default, 0 for one per CPU).')
+@click.option('--chunk-rows', type=int, default=None, help='Readings per streamed partition (RETRAIN_CHUNK_ROWS by default).')
+@click.option('--min-rows', type=int, default=None, help='Fewest labeled readings to train on (RETRAIN_MIN_ROWS by default).')
+@click.option('--activate', is_flag=True, help='Make the new version the active one once written.')
+def retrain_command(label, model_names, folds, jobs, chunk_rows, min_rows, activate):
+    """Trains a new model version on the labeled sensor readings, picking hyperparameters by cross-validation."""
+    label = label or f"retrained-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}"
+    if not VERSION_LABEL_PATTERN.match(label) or label == 'default':
+        click.echo(f"x Invalid version label: {label}")
+        raise SystemExit(1)
+
+    model_path = model_registry.artifact_path(label)
+    if model_registry.has_artifact(label):
+        click.echo(f"x {label}: a model already exists at {model_path}")
+        raise SystemExit(1)
+
+    jobs = jobs if jobs is not None else current_app.config.get('RETRAIN_JOBS', 0)
+    jobs = jobs if jobs > 0 else os.cpu_count() or 1
+
+    try:
+        performance = retrain_runners_model(
+            model_path,
+            models=None if model_names == 'all' else [model_names],
+            folds=folds or current_app.config.get('RETRAIN_FOLDS', 5),
+            jobs=jobs,
+            chunk_rows=chunk_rows or current_app.config.get('RETRAIN_CHUNK_ROWS', 10000),
+            min_rows=min_rows if min_rows is not None else current_app.config.get('RETRAIN_MIN_ROWS', 100),
+            echo=click.echo
+        )
+    except (OSError, ValueError) as e:
+        click.echo(f"x {label}: retraining failed: {str(e)}")
+        raise SystemExit(1)
+
+    click.echo(f"{label}: {os.path.basename(model_path)} ({performance['estimator']} {performance['params']}, "
+               f"f1 {performance['f1_score']}, accuracy {performance['accuracy']} on {performance['training_rows']} readings)")
+
+    if activate:
+        model_registry.activate(label).join()
+        click.echo(f"{label}: active")
+
+
+@runners_model_bp.cli.command('jobs-worker')
+@click.option('--processes', type=int, default=None,
+              help='Scoring processes per job (SCORING_JOB_PROCESSES by default, 0 for one per CPU).')
+@click.option('--once', is_flag=True, help='Exit once the queue is empty instead of waiting for new jobs.')
+def jobs_worker_command(processes, once):
+    """Runs the scoring jobs queued through POST /jobs; start as many as the hosts can take."""
+    processes = processes if processes is not None else current_app.config.get('SCORING_JOB_PROCESSES', 0)
+    processes = processes if processes > 0 else os.cpu_count() or 1
+
+    worker = ScoringJobWorker(
+        current_app._get_current_object(),
+        processes=processes,
+        chunk_rows=current_app.config.get('BULK_SCORING_CHUNK_ROWS', 10000),
+        poll_seconds=current_app.config.get('SCORING_JOB_POLL_SECONDS', 2.0),
+        heartbeat_seconds=current_app.config.get('SCORING_JOB_HEARTBEAT_SECONDS', 10.0),
+        stale_seconds=current_app.config.get('SCORING_JOB_STALE_SECONDS', 120.0),
+        max_attempts=current_app.config.get('SCORING_JOB_MAX_ATTEMPTS', 3),
+        retention_hours=current_app.config.get('SCORING_JOB_RETENTION_HOURS', 72),
+        echo=click.echo
+    )
+
+    # Stopped like Ctrl+C: the running job goes back to the queue and resumes from its checkpoint
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    click.echo(f"Scoring job worker {worker.worker}: {processes} scoring process(es) per job")
+    try:
+        worker.run(once=once)
+    except KeyboardInterrupt:
+        click.echo("Scoring job worker stopped")
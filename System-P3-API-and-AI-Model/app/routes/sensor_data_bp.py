@@ -1,31 +1,140 @@
-from flask import Blueprint, request, jsonify
+import numpy as np
+from flask import Blueprint, request, jsonify, current_app
 from ..config import db
 from ..models.sensor_data import SensorData
 from ..utils.auth import token_required
-from datetime import date
+from ..utils.drift_monitor import drift_monitor
+from ..utils.feature_schema import get_feature_schema
+from ..utils.generate_alert import generate_alerts_batch
+from ..utils.live_feed import live_feed, session_topic, coach_topic
+from ..utils.model_registry import model_registry
+from ..utils.predict_runners_model import DEFAULT_FEATURE_NAMES, RISK_LABELS, get_required_features, build_prediction_response
+from ..utils.prediction_store import delete_stored_predictions, store_predictions
+from ..utils.rolling_features import mark_readings_changed, rolling_features
+from .runners_model_bp import get_scorer
+from datetime import date, datetime, timezone
 
 sensor_data_bp = Blueprint('sensor_data_bp', __name__)
 
 
+def _parse_recorded_at(value):
+    """Parses the optional ISO 8601 sample timestamp (raises ValueError if malformed)."""
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError('recorded_at must be an ISO 8601 string')
+    # fromisoformat only accepts the "Z" suffix from Python 3.11
+    recorded_at = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    # Stored as naive UTC so every database compares them the same way
+    if recorded_at.tzinfo is not None:
+        recorded_at = recorded_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return recorded_at
+
+
+def _parse_risk_label(value):
+    """Observed outcome of a reading: a RISK_LABELS key, or None when not known (yet)."""
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or value not in RISK_LABELS:
+        raise ValueError(f"risk_label must be one of {sorted(RISK_LABELS)} or null")
+    return value
+
+
+def _update_trends(sensor_data, values):
+    """Applies a new reading to its session's rolling statistics and returns them (None if disabled or failed)."""
+    if not current_app.config.get('ROLLING_FEATURES_ENABLED', True):
+        return None
+
+    try:
+        return rolling_features.update(sensor_data.session_id, sensor_data.id, sensor_data.recorded_at, values)
+    except Exception as e:
+        # The reading is already saved; the session state is rebuilt on next use
+        rolling_features.invalidate(sensor_data.session_id)
+        print(f"x Rolling features update failed for sensor data {sensor_data.id}: {str(e)}")
+        return None
+
+
+def _publish_live(sensor_data, values, current_user, trends=None):
+    """
+    Publishes a new reading and its session's rolling statistics to the session's and coach's live feeds,
+    followed by its prediction (also stored with the session predictions) when a model is loaded.
+    """
+    if not current_app.config.get('LIVE_FEED_ENABLED', True):
+        return
+
+    try:
+        session = sensor_data.session
+        topics = [session_topic(sensor_data.session_id)]
+        if session is not None:
+            topics.append(coach_topic(session.coach_id))
+
+        sample = {
+            'sensor_data_id': sensor_data.id,
+            'session_id': sensor_data.session_id,
+            'athlete_id': session.athlete_id if session is not None else None,
+            'recorded_at': sensor_data.recorded_at.isoformat() if sensor_data.recorded_at else None
+        }
+        live_feed.publish(topics, 'sensor_data', {**sample, **values, 'trends': trends})
+
+        # Never wait for a model load on the ingest path
+        bundle = model_registry.current()
+        if not current_app.config.get('LIVE_FEED_SCORE_ON_INGEST', True) or bundle is None:
+            return
+
+        required_features = get_required_features(bundle)
+        if any(name not in values for name in required_features):
+            return
+
+        feature_matrix = np.array([[values[name] for name in required_features]], dtype=float)
+        risk_levels, probabilities = get_scorer()(feature_matrix, bundle)
+        row_probabilities = probabilities[0] if probabilities is not None else None
+        alerts, recommendations = generate_alerts_batch(risk_levels, probabilities, feature_matrix, required_features)[0]
+
+        if current_app.config.get('PREDICTION_STORE_ENABLED', True):
+            store_predictions(
+                sensor_data.session_id, [sensor_data.id], risk_levels, probabilities, bundle.version, current_user.name
+            )
+
+        live_feed.publish(topics, 'prediction', {
+            **sample,
+            **build_prediction_response(risk_levels[0], row_probabilities, alerts, recommendations, bundle.version),
+            'trends': trends
+        })
+    except Exception as e:
+        # The reading is already saved; the live feed must not fail the ingest
+        print(f"x Live feed publish failed for sensor data {sensor_data.id}: {str(e)}")
+
+
 # CREATE
 @sensor_data_bp.route('/', methods=['POST'])
 @token_required
 def create_sensor_data(current_user):
     data = request.get_json()
 
+    # Same validation as the prediction endpoints
+    schema = get_feature_schema(DEFAULT_FEATURE_NAMES)
+    feature_matrix, row_errors, row_warnings = schema.parse_records([data])
+
+    if row_errors:
+        return jsonify({'error': row_errors[0][0]['message'], 'details': row_errors[0]}), 400
+
+    try:
+        recorded_at = _parse_recorded_at(data.get('recorded_at'))
+    except ValueError as e:
+        return jsonify({'error': f'Invalid recorded_at: {str(e)}'}), 400
+
     try:
+        risk_label = _parse_risk_label(data.get('risk_label'))
+    except ValueError as e:
+        return jsonify({'error': f'Invalid risk_label: {str(e)}'}), 400
+
+    try:
+        values = schema.row_values(feature_matrix[0])
         new_data = SensorData(
             session_id=data['session_id'],
-            body_temperature=data['body_temperature'],
-            ambient_temperature=data['ambient_temperature'],
-            heart_rate=data['heart_rate'],
-            joint_angles=data['joint_angles'],
-            gait_speed=data['gait_speed'],
-            cadence=data['cadence'],
-            step_count=data['step_count'],
-            jump_height=data['jump_height'],
-            ground_reaction_force=data['ground_reaction_force'],
-            range_of_motion=data['range_of_motion'],
+            **values,
+            recorded_at=recorded_at,
+            risk_label=risk_label,
             created_on=date.today(),
             created_by=current_user.name
         )
@@ -33,7 +142,15 @@ def create_sensor_data(current_user):
         db.session.add(new_data)
         db.session.commit()
 
-        return jsonify({'message': 'Sensor Data created successfully', 'id': new_data.id}), 201
+        drift_monitor.observe('ingest', feature_matrix, DEFAULT_FEATURE_NAMES)
+        trends = _update_trends(new_data, values)
+        _publish_live(new_data, values, current_user, trends)
+
+        response = {'message': 'Sensor Data created successfully', 'id': new_data.id}
+        if row_warnings:
+            response['warnings'] = row_warnings[0]
+
+        return jsonify(response), 201
     except KeyError as e:
         return jsonify({'error': f'Missing field: {str(e)}'}), 400
     except Exception as e:
@@ -87,6 +204,8 @@ def get_sensor_data_entry(current_user, id):
         'jump_height': d.jump_height,
         'ground_reaction_force': d.ground_reaction_force,
         'range_of_motion': d.range_of_motion,
+        'recorded_at': d.recorded_at.isoformat() if d.recorded_at else None,
+        'risk_label': d.risk_label,
         'created_on': str(d.created_on)
     }), 200
 
@@ -99,21 +218,41 @@ def update_sensor_data(current_user, id):
     d = SensorData.query.filter_by(id=id, deleted_on=None).first_or_404()
     data = request.get_json()
 
+    # Only the allow-listed sensor fields present in the body are validated and updated
+    schema = get_feature_schema(DEFAULT_FEATURE_NAMES)
+    feature_matrix, row_errors, row_warnings = schema.parse_records([data], partial=True)
+
+    if row_errors:
+        return jsonify({'error': row_errors[0][0]['message'], 'details': row_errors[0]}), 400
+
+    if 'risk_label' in data:
+        try:
+            # Labeling a reading does not change its features, so stored predictions stay valid
+            d.risk_label = _parse_risk_label(data['risk_label'])
+        except ValueError as e:
+            return jsonify({'error': f'Invalid risk_label: {str(e)}'}), 400
+
     try:
-        # Loop through allow-listed fields to update
-        fields = ['body_temperature', 'ambient_temperature', 'heart_rate',
-                  'joint_angles', 'gait_speed', 'cadence', 'step_count',
-                  'jump_height', 'ground_reaction_force', 'range_of_motion']
+        present = ~np.isnan(feature_matrix[0])
+        for field, value in schema.row_values(feature_matrix[0], present).items():
+            setattr(d, field, value)
 
-        for field in fields:
-            if field in data:
-                setattr(d, field, data[field])
+        # Stored predictions were made from the old values
+        if present.any():
+            delete_stored_predictions(d.id)
+            mark_readings_changed(d.session_id)
+            rolling_features.invalidate(d.session_id)
 
         d.updated_on = date.today()
         d.updated_by = current_user.name
 
         db.session.commit()
-        return jsonify({'message': 'Sensor Data updated successfully'}), 200
+
+        response = {'message': 'Sensor Data updated successfully'}
+        if row_warnings:
+            response['warnings'] = row_warnings[0]
+
+        return jsonify(response), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
@@ -129,8 +268,10 @@ def delete_sensor_data(current_user, id):
         # Soft delete
         d.deleted_on = date.today()
         d.deleted_by = current_user.name
+        mark_readings_changed(d.session_id)
 
         db.session.commit()
+        rolling_features.invalidate(d.session_id)
         return jsonify({'message': 'Sensor Data deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -1,7 +1,16 @@
-from flask import Blueprint, request, jsonify
+import numpy as np
+from flask import Blueprint, request, jsonify, current_app
 from ..config import db
 from ..models.session import Session
-from ..utils.auth import token_required
+from ..utils.auth import token_required, stream_token_required
+from ..utils.feature_schema import get_feature_schema
+from ..utils.metrics import stage, instrumented, record_batch, record_error, record_row_errors
+from ..utils.live_feed import live_feed, session_topic, sse_response
+from ..utils.predict_runners_model import get_required_features, RISK_LABELS
+from ..utils.session_scoring import check_session_features, load_session_feature_matrix, summarize_session_predictions
+from ..utils.prediction_store import load_stored_predictions, store_predictions, load_prediction_history
+from ..utils.rolling_features import rolling_features
+from .runners_model_bp import get_model_bundle, get_scorer
 from datetime import date
 
 session_bp = Blueprint('session_bp', __name__)
@@ -101,4 +110,187 @@ def delete_session(current_user, id):
         return jsonify({'message': 'Session deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': str(e)}), 400
\ No newline at end of file
+        return jsonify({'error': str(e)}), 400
+
+
+# SCORE ALL SAMPLES
+@session_bp.route('/<int:id>/predict', methods=['GET'])
+@instrumented('predict_session')
+@token_required
+def predict_session(current_user, id):
+    Session.query.filter_by(id=id, deleted_on=None).first_or_404()
+
+    # Hold on to this bundle for the whole request, even if a new version is swapped in meanwhile
+    bundle, unavailable = get_model_bundle()
+    if unavailable:
+        record_error('predict_session', 'model_unavailable')
+        return unavailable
+
+    required_features = get_required_features(bundle)
+    store_enabled = current_app.config.get('PREDICTION_STORE_ENABLED', True)
+
+    try:
+        check_session_features(required_features)
+    except ValueError as e:
+        # The model needs inputs the stored readings do not have: not a server failure
+        record_error('predict_session', 'validation:model_features')
+        return jsonify({'error': str(e)}), 409
+
+    try:
+        with stage('predict_session', 'load'):
+            if store_enabled:
+                # Samples already scored by this model version are read back instead of re-scored
+                sensor_data_ids, recorded_at, stored = load_stored_predictions(id, bundle.version)
+            else:
+                sensor_data_ids, recorded_at, _ = load_session_feature_matrix(id, required_features)
+                stored = [None] * sensor_data_ids.size
+
+        if not sensor_data_ids.size:
+            return jsonify({'error': 'Session has no sensor data to score.'}), 404
+
+        results = list(stored)
+        row_errors = {}
+        unscored = [i for i, result in enumerate(stored) if result is None]
+
+        if unscored:
+            with stage('predict_session', 'load'):
+                loaded_ids, _, loaded_matrix = load_session_feature_matrix(id, required_features)
+                positions = {int(sensor_data_id): k for k, sensor_data_id in enumerate(loaded_ids)}
+                unscored = [i for i in unscored if int(sensor_data_ids[i]) in positions]
+                feature_matrix = loaded_matrix[[positions[int(sensor_data_ids[i])] for i in unscored]]
+
+            # Stored rows were validated at ingest; re-check for rows written before that
+            with stage('predict_session', 'validate'):
+                feature_matrix, unscored_errors, _ = get_feature_schema(required_features).validate(feature_matrix)
+            row_errors = {unscored[k]: errors for k, errors in unscored_errors.items()}
+            record_row_errors('predict_session', unscored_errors)
+
+            valid = [k for k in range(len(unscored)) if k not in unscored_errors]
+            if valid:
+                with stage('predict_session', 'inference'):
+                    risk_levels, probabilities = get_scorer()(feature_matrix[valid], bundle)
+                record_batch('predict_session', len(valid))
+                scored_rows = [unscored[k] for k in valid]
+
+                for k, i in enumerate(scored_rows):
+                    results[i] = (int(risk_levels[k]), probabilities[k] if probabilities is not None else None)
+
+                if store_enabled:
+                    with stage('predict_session', 'store'):
+                        store_predictions(
+                            id,
+                            sensor_data_ids[scored_rows],
+                            risk_levels,
+                            probabilities,
+                            bundle.version,
+                            current_user.name,
+                            batch_size=current_app.config.get('PREDICTION_STORE_BATCH_SIZE', 500)
+                        )
+
+        scored = [i for i, result in enumerate(results) if result is not None]
+        failures = [
+            {'sensor_data_id': int(sensor_data_ids[i]), 'error': errors[0]['message'], 'details': errors}
+            for i, errors in sorted(row_errors.items())
+        ]
+
+        if not scored:
+            record_error('predict_session', 'validation:no_valid_rows')
+            return jsonify({
+                'error': 'Session has no valid sensor data to score.',
+                'failed': len(row_errors),
+                'errors': failures
+            }), 409
+
+        risk_levels = np.array([results[i][0] for i in scored], dtype=int)
+
+        samples = []
+        for i in scored:
+            risk_level, row_probabilities = results[i]
+            sample = {
+                'sensor_data_id': int(sensor_data_ids[i]),
+                'recorded_at': recorded_at[i].isoformat() if recorded_at[i] is not None else None,
+                'risk_level': risk_level,
+                'risk_label': RISK_LABELS.get(risk_level, "Unknown")
+            }
+            if row_probabilities is not None:
+                sample['probabilities'] = [round(float(p), 4) for p in row_probabilities]
+                sample['confidence'] = sample['probabilities'][risk_level]
+            samples.append(sample)
+
+        summary = summarize_session_predictions(
+            risk_levels,
+            sensor_data_ids[scored],
+            [recorded_at[i] for i in scored],
+            current_app.config.get('SENSOR_SAMPLE_INTERVAL_SECONDS', 1.0)
+        )
+
+        return jsonify({
+            'session_id': id,
+            'model_version': bundle.version,
+            'count': int(sensor_data_ids.size),
+            'succeeded': len(scored),
+            'failed': len(row_errors),
+            'from_store': sum(result is not None for result in stored),
+            'errors': failures,
+            'summary': summary,
+            'trends': rolling_features.snapshot(id) if current_app.config.get('ROLLING_FEATURES_ENABLED', True) else None,
+            'samples': samples
+        }), 200
+
+    except Exception as e:
+        record_error('predict_session', f'exception:{type(e).__name__}')
+        return jsonify({'error': f'Prediction logic error: {str(e)}'}), 500
+
+
+# PREDICTION HISTORY
+@session_bp.route('/<int:id>/predictions', methods=['GET'])
+@token_required
+def get_session_predictions(current_user, id):
+    Session.query.filter_by(id=id, deleted_on=None).first_or_404()
+
+    # Only what was stored when the samples were scored; the model is never called here
+    model_version = request.args.get('model_version')
+    rows = load_prediction_history(id, model_version)
+
+    result = []
+    for row in rows:
+        prediction = {
+            'sensor_data_id': row.sensor_data_id,
+            'recorded_at': row.recorded_at.isoformat() if row.recorded_at else None,
+            'model_version': row.model_version,
+            'risk_level': row.risk_level,
+            'risk_label': RISK_LABELS.get(row.risk_level, "Unknown"),
+            'predicted_at': row.predicted_at.isoformat()
+        }
+        if row.probabilities is not None:
+            prediction['probabilities'] = [round(float(p), 4) for p in row.probabilities]
+            prediction['confidence'] = prediction['probabilities'][row.risk_level]
+        result.append(prediction)
+
+    return jsonify({'session_id': id, 'model_version': model_version, 'count': len(result), 'predictions': result}), 200
+
+
+# ROLLING FEATURES
+@session_bp.route('/<int:id>/features', methods=['GET'])
+@token_required
+def get_session_features(current_user, id):
+    """Rolling statistics over the session's newest readings, kept up to date at ingest."""
+    Session.query.filter_by(id=id, deleted_on=None).first_or_404()
+
+    if not current_app.config.get('ROLLING_FEATURES_ENABLED', True):
+        return jsonify({'error': 'Rolling features are disabled.'}), 404
+
+    return jsonify({'session_id': id, **rolling_features.snapshot(id)}), 200
+
+
+# LIVE FEED
+@session_bp.route('/<int:id>/live', methods=['GET'])
+@stream_token_required
+def session_live_feed(current_user, id):
+    """Server-Sent Events stream of the session's new sensor readings and their predictions."""
+    Session.query.filter_by(id=id, deleted_on=None).first_or_404()
+
+    if not current_app.config.get('LIVE_FEED_ENABLED', True):
+        return jsonify({'error': 'Live feed is disabled.'}), 404
+
+    return sse_response(live_feed, session_topic(id))
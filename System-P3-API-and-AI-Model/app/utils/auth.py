@@ -5,39 +5,64 @@ import jwt
 from functools import wraps
 
 
+def _authenticate(token):
+    """Returns (current_user, None), or (None, error_response) if the token is not accepted."""
+    if not token:
+        return None, (jsonify({'error': 'Token is missing'}), 401)
+
+    # Check if token is revoked
+    if RevokedToken.query.filter_by(token=token).first():
+        return None, (jsonify({'error': 'Token has been revoked (User logged out)'}), 401)
+
+    try:
+        data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
+        # Ensure the user itself isn't deleted (soft deleted users shouldn't have access)
+        current_user = Person.query.filter_by(id=data['user_id'], deleted_on=None).first()
+        if not current_user:
+            return None, (jsonify({'error': 'User not found'}), 401)
+    except jwt.ExpiredSignatureError:
+        return None, (jsonify({'error': 'Token has expired'}), 401)
+    except jwt.InvalidTokenError:
+        return None, (jsonify({'error': 'Invalid token'}), 401)
+    except Exception as e:
+        return None, (jsonify({'error': f'Token error: {str(e)}'}), 401)
+
+    return current_user, None
+
+
+def _header_token():
+    # Check if token is in headers
+    if 'Authorization' in request.headers:
+        auth_header = request.headers['Authorization']
+        if auth_header.startswith("Bearer "):
+            return auth_header.split(" ")[1]
+        return auth_header
+    return None
+
+
 def token_required(f):
     @wraps(f)
     def decorator(*args, **kwargs):
-        token = None
-
-        # Check if token is in headers
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            if auth_header.startswith("Bearer "):
-                token = auth_header.split(" ")[1]
-            else:
-                token = auth_header
-
-        if not token:
-            return jsonify({'error': 'Token is missing'}), 401
-
-        # Check if token is revoked
-        if RevokedToken.query.filter_by(token=token).first():
-            return jsonify({'error': 'Token has been revoked (User logged out)'}), 401
-
-        try:
-            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
-            # Ensure the user itself isn't deleted (soft deleted users shouldn't have access)
-            current_user = Person.query.filter_by(id=data['user_id'], deleted_on=None).first()
-            if not current_user:
-                return jsonify({'error': 'User not found'}), 401
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Invalid token'}), 401
-        except Exception as e:
-            return jsonify({'error': f'Token error: {str(e)}'}), 401
+        current_user, error = _authenticate(_header_token())
+        if error:
+            return error
+
+        return f(current_user, *args, **kwargs)
+
+    return decorator
+
+
+def stream_token_required(f):
+    """
+    Like token_required, but also accepts the token as a ?token= query parameter,
+    since browser EventSource clients cannot set an Authorization header.
+    """
+    @wraps(f)
+    def decorator(*args, **kwargs):
+        current_user, error = _authenticate(_header_token() or request.args.get('token'))
+        if error:
+            return error
 
         return f(current_user, *args, **kwargs)
 
-    return decorator
\ No newline at end of file
+    return decorator
@@ -0,0 +1,466 @@
+import csv
+import fcntl
+import io
+import json
+import mmap
+import multiprocessing
+import os
+import signal
+import time
+import numpy as np
+from .feature_schema import get_feature_schema
+from .generate_alert import generate_alerts_batch
+from .load_runners_model import load_runners_model
+from .metrics import untimed
+from .predict_runners_model import get_required_features, score_feature_matrix, build_prediction_response
+
+# Progress of a run, next to its output; rewritten after every chunk that reaches the disk
+CHECKPOINT_SUFFIX = '.progress.json'
+CHECKPOINT_FORMAT_VERSION = 1
+
+OUTPUT_FORMATS = ('ndjson', 'csv')
+CSV_RESULT_COLUMNS = (
+    'risk_level', 'risk_label', 'confidence', 'probabilities', 'alerts', 'recommendations', 'warnings', 'error'
+)
+
+# Bytes of the input scanned for line breaks at a time when planning CSV chunks
+PLAN_BLOCK_BYTES = 64 * 2 ** 20
+
+# Seconds between progress lines
+PROGRESS_INTERVAL_SECONDS = 2.0
+
+
+class CsvInput:
+    """
+    A CSV file with a header row naming the features, split into chunks of chunk_rows lines.
+
+    The file is memory-mapped: planning only looks for line breaks, and each worker maps the file
+    itself and parses its own byte range, so rows are never copied through the parent process.
+    Rows are identified by their zero-based line number after the header (blank lines included),
+    plus the id_column value when one is given. Quoted fields must not contain line breaks.
+    """
+
+    kind = 'csv'
+
+    def __init__(self, path, chunk_rows, id_column=None):
+        self.path = os.path.abspath(path)
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.id_column = id_column
+        self._mmap = None
+
+        with open(self.path, 'rb') as f:
+            self.header = [name.strip() for name in next(csv.reader([f.readline().decode('utf-8-sig')]), [])]
+            self.data_start = f.tell()
+
+        if not self.header:
+            raise ValueError(f'{path} has no header row')
+        if id_column and id_column not in self.header:
+            raise ValueError(f'Column {id_column} is not in the header of {path}')
+
+    def __getstate__(self):
+        # Sent to spawned workers without the parent's map
+        return {**self.__dict__, '_mmap': None}
+
+    def fingerprint(self):
+        stat = os.stat(self.path)
+        return {'kind': self.kind, 'path': self.path, 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    def key_columns(self):
+        return ['index'] + ([self.id_column] if self.id_column else [])
+
+    def plan(self):
+        """Returns [(start, end, first_index)] byte ranges of chunk_rows lines each."""
+        size = os.path.getsize(self.path)
+        if size <= self.data_start:
+            return []
+
+        tasks = []
+        start, first_index, lines = self.data_start, 0, 0
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for block_start in range(self.data_start, size, PLAN_BLOCK_BYTES):
+                block = np.frombuffer(mapped, dtype=np.uint8, count=min(PLAN_BLOCK_BYTES, size - block_start), offset=block_start)
+                line_ends = np.flatnonzero(block == 10) + block_start + 1
+                del block
+
+                # Every chunk_rows-th line break closes a chunk
+                for k in range(self.chunk_rows - lines - 1, line_ends.size, self.chunk_rows):
+                    end = int(line_ends[k])
+                    tasks.append((start, end, first_index))
+                    start, first_index = end, first_index + self.chunk_rows
+                lines = (lines + line_ends.size) % self.chunk_rows
+
+        if start < size:
+            tasks.append((start, size, first_index))
+        return tasks
+
+    def restore(self, fingerprint):
+        pass
+
+    def read(self, task, feature_names):
+        """Returns (records, keys) of one chunk: feature dicts and the identifying fields of each row."""
+        if self._mmap is None:
+            with open(self.path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        start, end, first_index = task
+        # Split on line feeds only, as the chunks were planned (csv handles a trailing carriage return)
+        lines = self._mmap[start:end].decode('utf-8').split('\n')
+        if lines[-1] == '':
+            lines.pop()
+
+        records, keys = [], []
+        for k, values in enumerate(csv.reader(lines)):
+            if not values:
+                continue
+            # Empty cells are missing values, not unparseable ones
+            record = {name: value if value.strip() else None for name, value in zip(self.header, values)}
+            records.append(record)
+            key = {'index': first_index + k}
+            if self.id_column:
+                key[self.id_column] = record.get(self.id_column)
+            keys.append(key)
+
+        return records, keys
+
+
+class SensorDataInput:
+    """
+    The stored sensor readings (optionally of one session, or of a list of sessions), in chunks of
+    chunk_rows consecutive ids.
+
+    The id range is fixed when the run starts, so resuming scores exactly the chunks that are left.
+    Workers query their own id range over their own database connection.
+    """
+
+    kind = 'sensor_data'
+
+    def __init__(self, database_uri, chunk_rows, session_id=None, id_range=None, session_ids=None):
+        self.database_uri = database_uri
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.session_id = session_id
+        self.session_ids = sorted(set(session_ids)) if session_ids is not None else None
+        self.id_range = id_range
+        self._engine = None
+
+    def __getstate__(self):
+        return {**self.__dict__, '_engine': None}
+
+    def _table(self):
+        from ..models.sensor_data import SensorData
+        return SensorData.__table__
+
+    def _connect(self):
+        if self._engine is None:
+            from sqlalchemy import create_engine
+            self._engine = create_engine(self.database_uri)
+        return self._engine.connect()
+
+    def _filters(self, table):
+        filters = [table.c.deleted_on.is_(None)]
+        if self.session_id is not None:
+            filters.append(table.c.session_id == self.session_id)
+        if self.session_ids is not None:
+            filters.append(table.c.session_id.in_(self.session_ids))
+        return filters
+
+    def fingerprint(self):
+        if self.id_range is None:
+            from sqlalchemy import func, select
+            table = self._table()
+            with self._connect() as connection:
+                low, high = connection.execute(select(func.min(table.c.id), func.max(table.c.id)).where(*self._filters(table))).one()
+            self.id_range = (low, high) if low is not None else (0, -1)
+        fingerprint = {'kind': self.kind, 'session_id': self.session_id, 'id_range': list(self.id_range)}
+        if self.session_ids is not None:
+            fingerprint['session_ids'] = self.session_ids
+        return fingerprint
+
+    def restore(self, fingerprint):
+        # Resume over the id range the run started with, whatever was ingested since
+        if (fingerprint.get('kind') == self.kind and fingerprint.get('session_id') == self.session_id
+                and fingerprint.get('session_ids') == self.session_ids):
+            self.id_range = tuple(fingerprint['id_range'])
+
+    def key_columns(self):
+        return ['sensor_data_id', 'session_id']
+
+    def plan(self):
+        """Returns [(first_id, last_id)] ranges of chunk_rows ids each."""
+        self.fingerprint()
+        low, high = self.id_range
+        return [(first, min(first + self.chunk_rows - 1, high)) for first in range(low, high + 1, self.chunk_rows)]
+
+    def read(self, task, feature_names):
+        from sqlalchemy import select
+        table = self._table()
+        feature_columns = [column for column in table.c if column.key in feature_names]
+
+        query = (
+            select(table.c.id, table.c.session_id, *feature_columns)
+            .where(table.c.id.between(*task), *self._filters(table))
+            .order_by(table.c.id)
+        )
+        with self._connect() as connection:
+            rows = connection.execute(query).all()
+
+        records = [{column.key: row[2 + j] for j, column in enumerate(feature_columns)} for row in rows]
+        keys = [{'sensor_data_id': row[0], 'session_id': row[1]} for row in rows]
+        return records, keys
+
+
+def score_records(records, keys, bundle, required_features):
+    """
+    Validates and scores a chunk of feature dicts like /predict/batch does (same schema, model and alert rules).
+    Returns (results, failed): one result per record (its keys plus the prediction response, or its error)
+    and the number of records rejected by validation.
+    """
+    feature_matrix, row_errors, row_warnings = get_feature_schema(required_features).parse_records(records)
+
+    results = [
+        {**keys[i], 'error': row_errors[i][0]['message'], 'details': row_errors[i]} if i in row_errors else None
+        for i in range(len(records))
+    ]
+
+    valid_rows = np.array([i for i in range(len(records)) if i not in row_errors], dtype=int)
+    if valid_rows.size:
+        valid_matrix = feature_matrix[valid_rows]
+        risk_levels, probabilities = score_feature_matrix(valid_matrix, bundle, timer=untimed)
+        alert_results = generate_alerts_batch(risk_levels, probabilities, valid_matrix, required_features)
+
+        for k, i in enumerate(valid_rows.tolist()):
+            alerts, recommendations = alert_results[k]
+            row_probabilities = probabilities[k] if probabilities is not None else None
+            results[i] = {
+                **keys[i],
+                **build_prediction_response(risk_levels[k], row_probabilities, alerts, recommendations, bundle.version)
+            }
+            if i in row_warnings:
+                results[i]['warnings'] = row_warnings[i]
+
+    return results, len(row_errors)
+
+
+def format_results(results, output_format, key_columns):
+    if output_format == 'ndjson':
+        return ''.join(json.dumps(result) + '\n' for result in results)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    for result in results:
+        writer.writerow([result.get(name) for name in key_columns] + [
+            result.get('risk_level'),
+            result.get('risk_label'),
+            result.get('confidence'),
+            json.dumps(result['probabilities']) if 'probabilities' in result else None,
+            '; '.join(result.get('alerts', [])),
+            '; '.join(result.get('recommendations', [])),
+            '; '.join(warning['message'] for warning in result.get('warnings', [])),
+            result.get('error')
+        ])
+    return buffer.getvalue()
+
+
+# ---- Workers ----
+
+_worker = None
+# Why a pool worker could not load the model, reported with the first chunk it is given
+_worker_error = None
+
+
+def _init_worker(source, model_path, label, expected_version, output_format):
+    """Loads the model once per process (memory-mapped, like the API workers)."""
+    global _worker
+
+    bundle = load_runners_model(model_path, label=label)
+    if bundle.version != expected_version:
+        raise RuntimeError(f'Model changed during the run: expected {expected_version}, loaded {bundle.version}')
+
+    required_features = get_required_features(bundle)
+    _worker = (source, bundle, required_features, output_format, source.key_columns())
+
+
+def _init_pool_worker(*args):
+    global _worker_error
+
+    # Ctrl+C is handled by the parent, which terminates the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        _init_worker(*args)
+    except Exception as e:
+        # Raised from an initializer, the error would only make the pool start the worker again, forever,
+        # while the run waits for its chunks: it goes back to the parent through _score_chunk instead
+        _worker_error = f'{type(e).__name__}: {str(e)}'
+
+
+def _score_chunk(task):
+    """Scores one chunk in a worker. Returns (output text, rows, failed rows)."""
+    if _worker is None:
+        raise RuntimeError(f'Scoring worker could not load the model: {_worker_error}')
+    source, bundle, required_features, output_format, key_columns = _worker
+    records, keys = source.read(task, required_features)
+    results, failed = score_records(records, keys, bundle, required_features)
+    return format_results(results, output_format, key_columns), len(results), failed
+
+
+# ---- Runs ----
+
+def checkpoint_path_for(output_path):
+    return output_path + CHECKPOINT_SUFFIX
+
+
+def _write_checkpoint(path, checkpoint):
+    temporary_path = f'{path}.tmp'
+    with open(temporary_path, 'w') as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary_path, path)
+
+
+def _open_output(output_path, resume):
+    """
+    Opens the output for the run and locks it, so a second run or --resume on the same output fails
+    instead of interleaving with this one. A new run creates the file and fails if it already exists.
+    """
+    try:
+        output = open(output_path, 'r+b' if resume else 'xb')
+    except FileExistsError:
+        raise ValueError(f'{output_path} already exists: use --resume to continue it, or remove it')
+    except FileNotFoundError:
+        raise ValueError(f'Nothing to resume: {output_path} does not exist')
+
+    try:
+        fcntl.flock(output, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        output.close()
+        raise ValueError(f'Another run is writing {output_path}')
+    return output
+
+
+def _start_run(source, output, checkpoint_path, output_format, version, resume):
+    """Returns (checkpoint, tasks) for a new run, or the remaining chunks of the interrupted one when resuming."""
+    if resume:
+        if not os.path.exists(checkpoint_path):
+            raise ValueError(f'Nothing to resume: {checkpoint_path} does not exist')
+        with open(checkpoint_path) as f:
+            checkpoint = json.load(f)
+
+        source.restore(checkpoint.get('input', {}))
+        expected = {
+            'input': source.fingerprint(),
+            'chunk_rows': source.chunk_rows,
+            'format': output_format,
+            'model_version': version
+        }
+        changed = [name for name, value in expected.items() if checkpoint.get(name) != value]
+        if changed:
+            raise ValueError(f"Cannot resume: {', '.join(changed)} changed since the run started")
+
+        # Drop anything written after the last chunk that was checkpointed
+        output.truncate(checkpoint['output_bytes'])
+    else:
+        header = b''
+        if output_format == 'csv':
+            header = (','.join(source.key_columns() + list(CSV_RESULT_COLUMNS)) + '\n').encode()
+        output.write(header)
+
+        checkpoint = {
+            'format_version': CHECKPOINT_FORMAT_VERSION,
+            'input': source.fingerprint(),
+            'chunk_rows': source.chunk_rows,
+            'format': output_format,
+            'model_version': version,
+            'chunks_total': None,
+            'chunks_done': 0,
+            'rows': 0,
+            'failed': 0,
+            'seconds': 0.0,
+            'output_bytes': len(header),
+            'completed': False
+        }
+
+    # Re-planned on resume: the input's fingerprint guarantees the same chunks
+    tasks = source.plan()
+    checkpoint['chunks_total'] = len(tasks)
+    _write_checkpoint(checkpoint_path, checkpoint)
+    return checkpoint, tasks[checkpoint['chunks_done']:]
+
+
+def run_bulk_scoring(source, output_path, model_path, label, workers=1, output_format='ndjson', resume=False, echo=print,
+                     on_progress=None):
+    """
+    Scores every row of source into output_path (NDJSON or CSV), one chunk at a time, across `workers`
+    processes (inline when 1). Chunks are appended in input order and fsynced before the checkpoint
+    next to the output records them, so an interrupted run continues with resume=True from the last
+    chunk on disk. Returns the final checkpoint.
+
+    on_progress(checkpoint) is called once the chunks are planned and after every checkpointed chunk;
+    an exception raised from it stops the run like an interruption.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f'Unknown output format: {output_format}')
+
+    checkpoint_path = checkpoint_path_for(output_path)
+    if not resume and os.path.exists(checkpoint_path):
+        raise ValueError(f'{checkpoint_path} already exists: use --resume to continue that run, or remove it')
+
+    bundle = load_runners_model(model_path, label=label)
+
+    with _open_output(output_path, resume) as output:
+        checkpoint, tasks = _start_run(source, output, checkpoint_path, output_format, bundle.version, resume)
+        if on_progress is not None:
+            on_progress(checkpoint)
+        if checkpoint['completed'] or not tasks:
+            checkpoint['completed'] = True
+            _write_checkpoint(checkpoint_path, checkpoint)
+            return checkpoint
+
+        workers = max(1, min(int(workers), len(tasks)))
+        initargs = (source, model_path, label, bundle.version, output_format)
+        del bundle
+
+        if workers == 1:
+            _init_worker(*initargs)
+            pool, results = None, map(_score_chunk, tasks)
+        else:
+            # spawn: each worker loads the model itself instead of inheriting the parent's state
+            pool = multiprocessing.get_context('spawn').Pool(workers, initializer=_init_pool_worker, initargs=initargs)
+            results = pool.imap(_score_chunk, tasks)
+
+        started = time.perf_counter()
+        elapsed_before = checkpoint['seconds']
+        rows_this_run = 0
+        next_progress = started + PROGRESS_INTERVAL_SECONDS
+
+        try:
+            output.seek(0, os.SEEK_END)
+            for text, rows, failed in results:
+                data = text.encode()
+                output.write(data)
+                output.flush()
+                os.fsync(output.fileno())
+
+                rows_this_run += rows
+                checkpoint['chunks_done'] += 1
+                checkpoint['rows'] += rows
+                checkpoint['failed'] += failed
+                checkpoint['output_bytes'] += len(data)
+                checkpoint['seconds'] = elapsed_before + time.perf_counter() - started
+                checkpoint['completed'] = checkpoint['chunks_done'] == checkpoint['chunks_total']
+                _write_checkpoint(checkpoint_path, checkpoint)
+                if on_progress is not None:
+                    on_progress(checkpoint)
+
+                now = time.perf_counter()
+                if now >= next_progress or checkpoint['completed']:
+                    next_progress = now + PROGRESS_INTERVAL_SECONDS
+                    echo(f"chunk {checkpoint['chunks_done']}/{checkpoint['chunks_total']}: {checkpoint['rows']} rows "
+                         f"({checkpoint['failed']} failed), {rows_this_run / max(now - started, 1e-9):,.0f} rows/s")
+        finally:
+            if pool is not None:
+                # Also stops the workers when the run is interrupted; the checkpoint stays at the last written chunk
+                pool.terminate()
+                pool.join()
+
+    checkpoint['rows_per_second'] = round(rows_this_run / max(time.perf_counter() - started, 1e-9), 1)
+    return checkpoint
@@ -0,0 +1,316 @@
+import numpy as np
+
+# Keep the (n_queries, n_reference) distance block of the KNN evaluator around 32 MB
+KNN_DISTANCE_BLOCK_ELEMENTS = 4_000_000
+
+
+class _FlatArrays:
+    """Export/restore of a compiled component as JSON-serializable params plus named NumPy arrays."""
+
+    PARAMS = ()
+    ARRAYS = ()
+
+    def to_arrays(self):
+        params = {name: getattr(self, name) for name in self.PARAMS}
+        arrays = {name: getattr(self, name) for name in self.ARRAYS if getattr(self, name) is not None}
+        return params, arrays
+
+    @classmethod
+    def from_arrays(cls, params, arrays):
+        # Bypass __init__: the arrays may be read-only views of a memory-mapped artifact
+        component = cls.__new__(cls)
+        for name in cls.PARAMS:
+            setattr(component, name, params[name])
+        for name in cls.ARRAYS:
+            setattr(component, name, arrays.get(name))
+        component._restored()
+        return component
+
+    def _restored(self):
+        pass
+
+
+class CompiledScaler(_FlatArrays):
+    """StandardScaler reduced to its mean/scale arrays, applied in the same order as sklearn."""
+
+    ARRAYS = ('mean', 'scale')
+
+    def __init__(self, scaler):
+        self.mean = np.array(scaler.mean_, dtype=np.float64) if scaler.with_mean else None
+        self.scale = np.array(scaler.scale_, dtype=np.float64) if scaler.with_std else None
+
+    def transform(self, feature_matrix):
+        scaled = np.array(feature_matrix, dtype=np.float64)
+        if self.mean is not None:
+            scaled -= self.mean
+        if self.scale is not None:
+            scaled /= self.scale
+        return scaled
+
+    def inverse_transform(self, scaled_matrix):
+        feature_matrix = np.array(scaled_matrix, dtype=np.float64)
+        if self.scale is not None:
+            feature_matrix *= self.scale
+        if self.mean is not None:
+            feature_matrix += self.mean
+        return feature_matrix
+
+
+class CompiledKNN(_FlatArrays):
+    """KNeighborsClassifier reduced to its reference matrix and encoded labels."""
+
+    PARAMS = ('n_neighbors', 'weights', 'metric')
+    # The row-major reference matrix is only needed for its shape, so it is not stored
+    ARRAYS = ('reference_columns', 'labels', 'classes_')
+
+    METRICS = {
+        ('minkowski', 1): 'manhattan',
+        ('minkowski', 2): 'euclidean',
+        ('manhattan', None): 'manhattan',
+        ('euclidean', None): 'euclidean'
+    }
+
+    def __init__(self, model):
+        self.reference = np.ascontiguousarray(model._fit_X, dtype=np.float64)
+        # Feature-major copy so each per-feature pass reads contiguous memory
+        self.reference_columns = np.ascontiguousarray(self.reference.T)
+        self.labels = np.asarray(model._y, dtype=np.intp)
+        self.classes_ = np.asarray(model.classes_)
+        self.n_neighbors = int(model.n_neighbors)
+        self.weights = model.weights
+        self.metric = self.METRICS[(model.metric, model.p if model.metric == 'minkowski' else None)]
+        # Optional KNNIndex over the reference rows, attached by the loader for large reference sets
+        self.index = None
+
+    def _restored(self):
+        self.reference = self.reference_columns.T
+        self.index = None
+
+    @classmethod
+    def supports(cls, model):
+        if type(model).__name__ != 'KNeighborsClassifier':
+            return False
+        if getattr(model, 'outputs_2d_', False) or model.weights not in ('uniform', 'distance'):
+            return False
+        if model.metric_params:
+            return False
+        p = model.p if model.metric == 'minkowski' else None
+        return (model.metric, p) in cls.METRICS
+
+    def _reduced_distances(self, query):
+        # Accumulate feature by feature, matching the sequential loop of sklearn's distance metrics
+        reduced = np.zeros((query.shape[0], self.reference.shape[0]), dtype=np.float64)
+        for j in range(self.reference.shape[1]):
+            diff = query[:, j, np.newaxis] - self.reference_columns[np.newaxis, j]
+            if self.metric == 'euclidean':
+                reduced += diff * diff
+            else:
+                reduced += np.abs(diff)
+        return reduced
+
+    def kneighbors(self, query):
+        """Returns (distances, indices) of the k nearest reference rows, closest first."""
+        k = self.n_neighbors
+
+        if self.index is not None:
+            distances, indices = self.index.query(self.reference_columns, query, k, self.metric)
+        else:
+            reduced = self._reduced_distances(query)
+
+            candidates = np.argpartition(reduced, k - 1, axis=1)[:, :k]
+            candidate_distances = np.take_along_axis(reduced, candidates, axis=1)
+            order = np.argsort(candidate_distances, axis=1, kind='stable')
+
+            indices = np.take_along_axis(candidates, order, axis=1)
+            distances = np.take_along_axis(candidate_distances, order, axis=1)
+
+        if self.metric == 'euclidean':
+            distances = np.sqrt(distances)
+
+        return distances, indices
+
+    def predict_proba(self, scaled_matrix):
+        n_rows = scaled_matrix.shape[0]
+        # Per block, brute force holds a distance per reference row; the index one box bound per leaf
+        block_width = self.index.n_leaves if self.index is not None else self.reference.shape[0]
+        block_rows = max(1, KNN_DISTANCE_BLOCK_ELEMENTS // max(1, block_width))
+        probabilities = np.zeros((n_rows, self.classes_.size), dtype=np.float64)
+
+        for start in range(0, n_rows, block_rows):
+            block = scaled_matrix[start:start + block_rows]
+            distances, indices = self.kneighbors(block)
+            probabilities[start:start + block_rows] = self._vote(distances, indices)
+
+        return probabilities
+
+    def _vote(self, distances, indices):
+        if self.weights == 'distance':
+            # Exact matches get all the weight, as in sklearn's _get_weights
+            with np.errstate(divide='ignore'):
+                weights = 1.0 / distances
+            inf_mask = np.isinf(weights)
+            inf_row = np.any(inf_mask, axis=1)
+            weights[inf_row] = inf_mask[inf_row]
+        else:
+            weights = np.ones_like(distances)
+
+        all_rows = np.arange(indices.shape[0])
+        neighbor_labels = self.labels[indices]
+        votes = np.zeros((indices.shape[0], self.classes_.size), dtype=np.float64)
+
+        for i in range(indices.shape[1]):
+            votes[all_rows, neighbor_labels[:, i]] += weights[:, i]
+
+        votes /= votes.sum(axis=1)[:, np.newaxis]
+        return votes
+
+
+class CompiledForest(_FlatArrays):
+    """Decision tree / random forest flattened into one set of node arrays."""
+
+    PARAMS = ('max_depth', 'is_ensemble')
+    ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots', 'classes_')
+
+    def __init__(self, model):
+        estimators = list(getattr(model, 'estimators_', [model]))
+        n_classes = int(np.atleast_1d(model.n_classes_)[0])
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+
+        for estimator in estimators:
+            tree = estimator.tree_
+            left = tree.children_left.astype(np.intp)
+            right = tree.children_right.astype(np.intp)
+            is_leaf = left == -1
+
+            value = np.array(tree.value[:, 0, :n_classes], dtype=np.float64)
+            totals = value.sum(axis=1)
+            if not np.allclose(totals, 1.0):
+                # Older artifacts store raw class counts instead of fractions
+                value = value / totals[:, np.newaxis]
+
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.intp))
+            thresholds.append(tree.threshold.astype(np.float64))
+            # Leaves point to themselves so traversal can run a fixed number of steps
+            lefts.append(np.where(is_leaf, np.arange(tree.node_count), left) + offset)
+            rights.append(np.where(is_leaf, np.arange(tree.node_count), right) + offset)
+            values.append(value)
+            roots.append(offset)
+
+            offset += tree.node_count
+
+        self.feature = np.concatenate(features)
+        self.threshold = np.concatenate(thresholds)
+        self.left = np.concatenate(lefts)
+        self.right = np.concatenate(rights)
+        self.value = np.concatenate(values)
+        self.roots = np.array(roots, dtype=np.intp)
+        self.max_depth = int(max(estimator.tree_.max_depth for estimator in estimators))
+        self.classes_ = np.asarray(model.classes_)
+        self.is_ensemble = hasattr(model, 'estimators_')
+
+    @classmethod
+    def supports(cls, model):
+        name = type(model).__name__
+        if name in ('DecisionTreeClassifier', 'ExtraTreeClassifier'):
+            return model.n_outputs_ == 1
+        if name in ('RandomForestClassifier', 'ExtraTreesClassifier'):
+            return model.n_outputs_ == 1 and all(hasattr(e, 'tree_') for e in model.estimators_)
+        return False
+
+    def apply(self, scaled_matrix):
+        """Returns the flat leaf index reached by every row in every tree: (n_trees, n_rows)."""
+        # sklearn evaluates tree splits on float32 inputs
+        X = np.asarray(scaled_matrix, dtype=np.float32)
+        n_rows = X.shape[0]
+        rows = np.arange(n_rows)
+
+        nodes = np.repeat(self.roots[:, np.newaxis], n_rows, axis=1)
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return nodes
+
+    def predict_proba(self, scaled_matrix):
+        leaves = self.apply(scaled_matrix)
+
+        if not self.is_ensemble:
+            return self.value[leaves[0]].copy()
+
+        # Accumulate tree by tree in estimator order, as RandomForestClassifier does
+        probabilities = np.zeros((leaves.shape[1], self.classes_.size), dtype=np.float64)
+        for tree_leaves in leaves:
+            probabilities += self.value[tree_leaves]
+
+        probabilities /= leaves.shape[0]
+        return probabilities
+
+
+class CompiledModel:
+    """Scaler and estimator evaluated with plain NumPy; exposes the sklearn predict/predict_proba API."""
+
+    ESTIMATOR_TYPES = {cls.__name__: cls for cls in (CompiledKNN, CompiledForest)}
+
+    def __init__(self, estimator, scaler=None):
+        self.estimator = estimator
+        self.scaler = scaler
+        self.classes_ = estimator.classes_
+        self.kind = type(estimator).__name__
+
+    def to_arrays(self):
+        """Returns (spec, arrays): a JSON-serializable description and the flat arrays, keyed 'estimator.*' / 'scaler.*'."""
+        estimator_params, estimator_arrays = self.estimator.to_arrays()
+        arrays = {f'estimator.{name}': array for name, array in estimator_arrays.items()}
+
+        scaler_params = None
+        if self.scaler is not None:
+            scaler_params, scaler_arrays = self.scaler.to_arrays()
+            arrays.update({f'scaler.{name}': array for name, array in scaler_arrays.items()})
+
+        spec = {'estimator': self.kind, 'estimator_params': estimator_params, 'scaler_params': scaler_params}
+        return spec, arrays
+
+    @classmethod
+    def from_arrays(cls, spec, arrays):
+        """Rebuilds a compiled model from the output of to_arrays (e.g. read back from an artifact)."""
+        estimator_type = cls.ESTIMATOR_TYPES.get(spec['estimator'])
+        if estimator_type is None:
+            raise ValueError(f"Unsupported compiled estimator: {spec['estimator']}")
+
+        def section(prefix):
+            return {name[len(prefix):]: array for name, array in arrays.items() if name.startswith(prefix)}
+
+        estimator = estimator_type.from_arrays(spec['estimator_params'], section('estimator.'))
+        scaler = None
+        if spec.get('scaler_params') is not None:
+            scaler = CompiledScaler.from_arrays(spec['scaler_params'], section('scaler.'))
+
+        return cls(estimator, scaler)
+
+    def predict_proba(self, feature_matrix):
+        """Scores raw (unscaled) feature rows."""
+        scaled = self.scaler.transform(feature_matrix) if self.scaler is not None else np.asarray(feature_matrix, dtype=np.float64)
+        return self.estimator.predict_proba(scaled)
+
+    def predict(self, feature_matrix):
+        return self.classes_[self.predict_proba(feature_matrix).argmax(axis=1)]
+
+
+def compile_runners_model(model, scaler=None):
+    """
+    Compiles a fitted estimator (and optional StandardScaler) into flat NumPy arrays.
+    Returns None for unsupported estimators so callers can fall back to sklearn.
+    """
+    if scaler is not None and type(scaler).__name__ != 'StandardScaler':
+        return None
+
+    if CompiledKNN.supports(model):
+        estimator = CompiledKNN(model)
+    elif CompiledForest.supports(model):
+        estimator = CompiledForest(model)
+    else:
+        return None
+
+    return CompiledModel(estimator, CompiledScaler(scaler) if scaler is not None else None)
@@ -0,0 +1,494 @@
+import hashlib
+import json
+import math
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+import numpy as np
+from ..config import Config, db
+from .compile_runners_model import CompiledKNN
+
+# Reference profile written next to each pickled model version
+PROFILE_SUFFIX = '.drift.json'
+PROFILE_FORMAT_VERSION = 1
+
+# What the live histograms are kept for: prediction inputs and ingested sensor readings
+SOURCES = ('predict', 'ingest')
+
+# Floor for empty bins in the PSI, which is undefined when a bin has no mass on one side
+PSI_EPSILON = 1e-4
+
+
+def profile_path_for(model_path):
+    """Returns the reference profile path that sits next to a pickled model."""
+    return os.path.splitext(model_path)[0] + PROFILE_SUFFIX
+
+
+def histogram_layout(feature_names, ranges, bins):
+    """Returns (layout, key): the bin definition of every feature and a short hash identifying it."""
+    layout = {
+        'bins': int(bins),
+        'ranges': {name: [float(ranges[name][0]), float(ranges[name][1])] for name in feature_names}
+    }
+    key = hashlib.sha256(json.dumps(layout, sort_keys=True).encode()).hexdigest()[:16]
+    return layout, key
+
+
+class HistogramSketch:
+    """
+    Fixed-edge histograms of a set of features, with running sums for their mean and spread.
+
+    Each feature gets `bins` equal-width bins over its expected range plus an underflow and an overflow
+    bin, so the memory used never depends on how many rows were seen, and two sketches with the same
+    layout (from other workers, windows or the reference data) merge by adding their counts.
+    Updating with a batch is one vectorized binning and one bincount over all features at once.
+    """
+
+    def __init__(self, layout):
+        self.layout = layout
+        self.feature_names = list(layout['ranges'])
+        self.bins = layout['bins']
+
+        bounds = np.array([layout['ranges'][name] for name in self.feature_names], dtype=np.float64).reshape(-1, 2)
+        self.low = bounds[:, 0]
+        self.width = np.where(bounds[:, 1] > bounds[:, 0], bounds[:, 1] - bounds[:, 0], 1.0) / self.bins
+        # Offset of each feature's first bin in the flattened counts
+        self.offsets = np.arange(len(self.feature_names)) * (self.bins + 2)
+        self._offsets, self._low, self._width = self.offsets.tolist(), self.low.tolist(), self.width.tolist()
+
+        n_features = len(self.feature_names)
+        self.counts = np.zeros((n_features, self.bins + 2), dtype=np.int64)
+        self.n = np.zeros(n_features, dtype=np.int64)
+        self.sums = np.zeros(n_features)
+        self.sum_squares = np.zeros(n_features)
+        self.rows = 0
+
+    def update(self, feature_matrix):
+        """Adds a (n_rows, n_features) matrix in the sketch's feature order; NaN values are skipped."""
+        feature_matrix = np.asarray(feature_matrix, dtype=np.float64)
+        if not feature_matrix.size:
+            return
+        if feature_matrix.shape[0] == 1 and np.isfinite(feature_matrix).all():
+            self._update_row(feature_matrix[0])
+            return
+
+        finite = np.isfinite(feature_matrix)
+        with np.errstate(invalid='ignore'):
+            # Bin 0 is underflow, 1..bins the range, bins + 1 overflow
+            positions = np.clip(np.floor((feature_matrix - self.low) / self.width), -1, self.bins) + 1
+        flat = (positions + self.offsets)[finite].astype(np.intp)
+        self.counts.reshape(-1)[:] += np.bincount(flat, minlength=self.counts.size)
+
+        values = np.where(finite, feature_matrix, 0.0)
+        self.n += finite.sum(axis=0)
+        self.sums += values.sum(axis=0)
+        self.sum_squares += (values * values).sum(axis=0)
+        self.rows += feature_matrix.shape[0]
+
+    def _update_row(self, row):
+        # Single /predict rows: binning ten values in plain Python beats the per-call NumPy overhead
+        bins = self.bins
+        flat = []
+        for offset, x, low, width in zip(self._offsets, row.tolist(), self._low, self._width):
+            position = math.floor((x - low) / width)
+            flat.append(offset + (0 if position < 0 else bins + 1 if position >= bins else position + 1))
+        # One bin per feature, so the indices are distinct
+        self.counts.reshape(-1)[flat] += 1
+        self.n += 1
+        self.sums += row
+        self.sum_squares += row * row
+        self.rows += 1
+
+    def merge(self, other):
+        if other.layout != self.layout:
+            raise ValueError('Histogram sketches with different layouts cannot be merged')
+        self.counts += other.counts
+        self.n += other.n
+        self.sums += other.sums
+        self.sum_squares += other.sum_squares
+        self.rows += other.rows
+
+    def to_dict(self):
+        return {
+            name: {
+                'counts': self.counts[j].tolist(),
+                'n': int(self.n[j]),
+                'sum': float(self.sums[j]),
+                'sum_sq': float(self.sum_squares[j])
+            }
+            for j, name in enumerate(self.feature_names)
+        }
+
+    @classmethod
+    def from_dict(cls, layout, features, rows=0):
+        sketch = cls(layout)
+        for j, name in enumerate(sketch.feature_names):
+            feature = features.get(name)
+            if feature is None:
+                continue
+            sketch.counts[j] = feature['counts']
+            sketch.n[j] = feature['n']
+            sketch.sums[j] = feature['sum']
+            sketch.sum_squares[j] = feature['sum_sq']
+        sketch.rows = int(rows)
+        return sketch
+
+    def mean_std(self, j):
+        n = int(self.n[j])
+        if not n:
+            return None, None
+        mean = self.sums[j] / n
+        return float(mean), float(np.sqrt(max(self.sum_squares[j] / n - mean * mean, 0.0)))
+
+
+def compare_histograms(reference_counts, live_counts):
+    """
+    Returns (psi, ks) between two histograms over the same bins.
+
+    PSI sums (live - reference) * ln(live / reference) over the bin shares. KS is the largest gap between
+    the two cumulative distributions at the bin edges: a lower bound of the exact two-sample statistic.
+    """
+    reference = np.asarray(reference_counts, dtype=np.float64)
+    live = np.asarray(live_counts, dtype=np.float64)
+    reference_share = reference / reference.sum()
+    live_share = live / live.sum()
+
+    psi_reference = np.maximum(reference_share, PSI_EPSILON)
+    psi_live = np.maximum(live_share, PSI_EPSILON)
+    psi = float(np.sum((psi_live - psi_reference) * np.log(psi_live / psi_reference)))
+    ks = float(np.max(np.abs(np.cumsum(live_share) - np.cumsum(reference_share))))
+    return psi, ks
+
+
+def drift_status(psi, live_rows):
+    if live_rows < Config.DRIFT_MIN_ROWS:
+        return 'insufficient_data'
+    if psi >= Config.DRIFT_PSI_ALERT:
+        return 'drift'
+    if psi >= Config.DRIFT_PSI_WARN:
+        return 'warning'
+    return 'stable'
+
+
+# ---- Reference profiles ----
+
+def reference_rows_from_model(bundle, feature_names):
+    """
+    Returns the training rows kept by a KNN model, unscaled, in feature_names order.
+    Raises ValueError for models that do not keep them.
+    """
+    compiled = bundle.compiled
+    if compiled is not None and isinstance(compiled.estimator, CompiledKNN):
+        rows = compiled.estimator.reference
+        rows = compiled.scaler.inverse_transform(rows) if compiled.scaler is not None else np.array(rows, dtype=np.float64)
+    elif getattr(bundle.model, '_fit_X', None) is not None:
+        rows = bundle.model._fit_X
+        rows = bundle.scaler.inverse_transform(rows) if bundle.scaler is not None else np.array(rows, dtype=np.float64)
+    else:
+        name = compiled.kind if compiled is not None else type(bundle.model).__name__
+        raise ValueError(f"{name} does not keep its training rows: build the profile from a CSV file or the sensor data")
+
+    if len(feature_names) != rows.shape[1]:
+        raise ValueError(f"Model has {rows.shape[1]} reference columns for {len(feature_names)} features")
+    return rows
+
+
+def build_reference_profile(matrices, feature_names, source, model_version=None):
+    """
+    Builds a reference profile from (n_rows, len(feature_names)) matrices, in the live sketches' layout.
+    Features without a configured range are not profiled.
+    """
+    layout, layout_key = drift_monitor.layout, drift_monitor.layout_key
+    sketch = HistogramSketch(layout)
+    columns = [feature_names.index(name) if name in feature_names else -1 for name in sketch.feature_names]
+
+    for feature_matrix in matrices:
+        sketch.update(_aligned(np.asarray(feature_matrix, dtype=np.float64), columns))
+
+    if not sketch.rows:
+        raise ValueError('No reference rows to profile')
+
+    return {
+        'format': PROFILE_FORMAT_VERSION,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'source': source,
+        'model_version': model_version,
+        'rows': sketch.rows,
+        'layout': layout,
+        'layout_key': layout_key,
+        'features': sketch.to_dict()
+    }
+
+
+def save_reference_profile(profile, path):
+    # Written aside and renamed so workers never read a half-written profile
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    with open(temporary_path, 'w') as f:
+        json.dump(profile, f)
+    os.replace(temporary_path, path)
+
+
+_profiles = {}
+_profiles_lock = threading.Lock()
+
+
+def load_reference_profile(path):
+    """Returns the profile at path (re-read when the file changes), or None if there is none."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    with _profiles_lock:
+        cached = _profiles.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+    with open(path) as f:
+        profile = json.load(f)
+
+    with _profiles_lock:
+        _profiles[path] = (mtime, profile)
+    return profile
+
+
+def _aligned(feature_matrix, columns):
+    """Reorders matrix columns into a sketch's feature order; features the matrix lacks become NaN."""
+    if -1 not in columns:
+        return feature_matrix[:, columns]
+    aligned = np.full((feature_matrix.shape[0], len(columns)), np.nan)
+    for j, column in enumerate(columns):
+        if column >= 0:
+            aligned[:, j] = feature_matrix[:, column]
+    return aligned
+
+
+# ---- Live sketches ----
+
+class DriftMonitor:
+    """
+    Per-worker histograms of every prediction input and ingested reading, in fixed time windows.
+
+    Request threads only add their rows to the current window's sketch. At most every flush_seconds,
+    the worker writes its windows to the drift_sketch table (one row per window, source and worker,
+    overwritten each time), so the table holds every worker's counts and a report merges them by
+    addition. Windows older than retention_hours are deleted when a window closes.
+    """
+
+    def __init__(self, ranges, bins=20, window_seconds=3600, flush_seconds=10, retention_hours=168, enabled=True):
+        self.enabled = enabled
+        self.layout, self.layout_key = histogram_layout(list(ranges), ranges, bins)
+        self.window_seconds = max(1, int(window_seconds))
+        self.flush_seconds = float(flush_seconds)
+        self.retention_hours = float(retention_hours)
+
+        self._lock = threading.Lock()
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        # A forked worker starts empty under its own name, or the parent's counts would be stored twice
+        self._pid = os.getpid()
+        self.worker = f'{socket.gethostname()}:{self._pid}:{uuid.uuid4().hex[:8]}'
+        self._window_start = None
+        self._sketches = {}
+        # Closed windows not written yet: [(window_start, {source: sketch})]
+        self._closed = []
+        self._columns = {}
+        self._next_flush = 0.0
+        self._metrics = {'rows': 0, 'flushes': 0, 'flush_errors': 0}
+
+    def _current_window(self):
+        now = int(time.time())
+        return datetime.fromtimestamp(now - now % self.window_seconds, timezone.utc).replace(tzinfo=None)
+
+    def record(self, source, feature_matrix, feature_names):
+        """Adds scored or ingested rows (columns named by feature_names) to this worker's current window."""
+        if not self.enabled:
+            return
+
+        feature_names = tuple(feature_names)
+        window_start = self._current_window()
+
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+
+            if window_start != self._window_start:
+                if self._sketches:
+                    self._closed.append((self._window_start, self._sketches))
+                self._window_start, self._sketches = window_start, {}
+
+            columns = self._columns.get(feature_names)
+            if columns is None:
+                columns = self._columns[feature_names] = [
+                    feature_names.index(name) if name in feature_names else -1
+                    for name in self.layout['ranges']
+                ]
+
+            sketch = self._sketches.get(source)
+            if sketch is None:
+                sketch = self._sketches[source] = HistogramSketch(self.layout)
+            sketch.update(_aligned(np.asarray(feature_matrix, dtype=np.float64), columns))
+            self._metrics['rows'] += len(feature_matrix)
+
+    def observe(self, source, feature_matrix, feature_names):
+        """record() then flush() when due; never raises, so monitoring cannot fail a request."""
+        if not self.enabled:
+            return
+        try:
+            self.record(source, feature_matrix, feature_names)
+            if time.monotonic() >= self._next_flush:
+                self.flush()
+        except Exception as e:
+            print(f"x Drift monitor update failed: {str(e)}")
+
+    def flush(self):
+        """Writes this worker's open and closed windows to the drift_sketch table (needs an app context)."""
+        with self._lock:
+            self._next_flush = time.monotonic() + self.flush_seconds
+            closed, self._closed = self._closed, []
+            windows = closed + ([(self._window_start, self._sketches)] if self._sketches else [])
+            # Serialized under the lock so request threads can keep updating the live sketches
+            snapshot = [
+                (window_start, source, sketch.rows, sketch.to_dict())
+                for window_start, sketches in windows
+                for source, sketch in sketches.items()
+            ]
+        if not snapshot:
+            return
+
+        try:
+            self._write(snapshot, prune=bool(closed))
+        except Exception:
+            with self._lock:
+                # Retried with the next flush
+                self._closed = closed + self._closed
+                self._metrics['flush_errors'] += 1
+            raise
+
+        with self._lock:
+            self._metrics['flushes'] += 1
+
+    def _write(self, snapshot, prune=False):
+        from ..models.drift_sketch import DriftSketch
+        table = DriftSketch.__table__
+        flushed_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        today = date.today()
+
+        # Its own transaction: the request's session may hold unrelated pending changes
+        with db.engine.begin() as connection:
+            for window_start, source, rows, sketch in snapshot:
+                key = (table.c.window_start == window_start) & (table.c.worker == self.worker) & (table.c.source == source)
+                values = {'layout': self.layout_key, 'rows': rows, 'sketch': sketch, 'flushed_at': flushed_at}
+                updated = connection.execute(
+                    table.update().where(key).values(**values, updated_on=today, updated_by='drift_monitor')
+                )
+                if updated.rowcount == 0:
+                    connection.execute(table.insert().values(
+                        window_start=window_start, worker=self.worker, source=source, **values,
+                        created_on=today, created_by='drift_monitor'
+                    ))
+
+            if prune and self.retention_hours > 0:
+                cutoff = flushed_at - timedelta(hours=self.retention_hours)
+                connection.execute(table.delete().where(table.c.window_start < cutoff))
+
+    def load_merged(self, hours, sources):
+        """
+        Returns (sketch, workers, windows): every worker's rows for the sources over the last `hours`
+        (from the start of the window containing that time) merged into one sketch.
+        """
+        from ..models.drift_sketch import DriftSketch
+        table = DriftSketch.__table__
+
+        since = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=hours)
+        since_ts = int(since.replace(tzinfo=timezone.utc).timestamp())
+        since = datetime.fromtimestamp(since_ts - since_ts % self.window_seconds, timezone.utc).replace(tzinfo=None)
+
+        query = db.select(table.c.window_start, table.c.worker, table.c.rows, table.c.sketch).where(
+            table.c.window_start >= since,
+            table.c.source.in_(sources),
+            table.c.layout == self.layout_key
+        )
+
+        merged = HistogramSketch(self.layout)
+        workers, windows = set(), set()
+        for row in db.session.execute(query):
+            merged.merge(HistogramSketch.from_dict(self.layout, row.sketch, row.rows))
+            workers.add(row.worker)
+            windows.add(row.window_start)
+
+        return merged, workers, windows
+
+    def get_metrics(self):
+        with self._lock:
+            return {
+                'worker': self.worker,
+                'window_start': self._window_start.isoformat() if self._window_start else None,
+                'window_rows': {source: sketch.rows for source, sketch in self._sketches.items()},
+                **self._metrics
+            }
+
+
+def drift_report(profile, hours, sources):
+    """
+    Compares the merged live histograms of the last `hours` with a reference profile, per feature.
+    Raises ValueError if the profile was built with another histogram layout.
+    """
+    if profile.get('layout_key') != drift_monitor.layout_key:
+        raise ValueError(
+            'The reference profile was built with other feature ranges or bins: rebuild it with '
+            '"flask runners_model drift-profile".'
+        )
+
+    live, workers, windows = drift_monitor.load_merged(hours, sources)
+    reference = HistogramSketch.from_dict(profile['layout'], profile['features'], profile.get('rows', 0))
+
+    features = {}
+    for j, name in enumerate(live.feature_names):
+        live_rows, reference_rows = int(live.n[j]), int(reference.n[j])
+        if not live_rows or not reference_rows:
+            features[name] = {'status': 'insufficient_data', 'live_rows': live_rows, 'reference_rows': reference_rows}
+            continue
+
+        psi, ks = compare_histograms(reference.counts[j], live.counts[j])
+        live_mean, live_std = live.mean_std(j)
+        reference_mean, reference_std = reference.mean_std(j)
+        features[name] = {
+            'status': drift_status(psi, live_rows),
+            'psi': round(psi, 4),
+            'ks': round(ks, 4),
+            'live_rows': live_rows,
+            'reference_rows': reference_rows,
+            'live_mean': round(live_mean, 4),
+            'reference_mean': round(reference_mean, 4),
+            'live_std': round(live_std, 4),
+            'reference_std': round(reference_std, 4),
+            # Share of live values outside the configured range (the underflow and overflow bins)
+            'out_of_range': round(float(live.counts[j, 0] + live.counts[j, -1]) / live_rows, 4)
+        }
+
+    scored = {name: f for name, f in features.items() if 'psi' in f}
+    return {
+        'rows': live.rows,
+        'workers': len(workers),
+        'windows': len(windows),
+        'max_psi': max((f['psi'] for f in scored.values()), default=None),
+        'drifted_features': sorted(name for name, f in scored.items() if f['status'] == 'drift'),
+        'warning_features': sorted(name for name, f in scored.items() if f['status'] == 'warning'),
+        'features': features
+    }
+
+
+drift_monitor = DriftMonitor(
+    Config.FEATURE_RANGES,
+    bins=Config.DRIFT_BINS,
+    window_seconds=Config.DRIFT_WINDOW_SECONDS,
+    flush_seconds=Config.DRIFT_FLUSH_SECONDS,
+    retention_hours=Config.DRIFT_RETENTION_HOURS,
+    enabled=Config.DRIFT_MONITOR_ENABLED
+)
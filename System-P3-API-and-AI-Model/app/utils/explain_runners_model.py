@@ -0,0 +1,149 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from ..config import Config
+from .compile_runners_model import CompiledForest
+from .predict_runners_model import get_required_features
+
+# Explainers kept per process: the active version and the one being swapped out
+MAX_CACHED_EXPLAINERS = 2
+
+
+class ForestContributions:
+    """
+    Per-feature contributions of a tree ensemble (the Saabas method), from tables built once per model.
+
+    Walking a row down a tree, every split moves the node value from the parent's to the child's;
+    that change is credited to the feature the parent splits on. For each leaf the credits along its
+    path are summed at build time into one (n_classes, n_features) table, so explaining a batch is
+    the leaf lookup predict_proba already does plus one gather per tree. For every row and class,
+    base value + sum of contributions equals the predicted probability.
+    """
+
+    def __init__(self, forest, scale_fn, n_features):
+        self.forest = forest
+        self.scale_fn = scale_fn
+        self.classes_ = np.asarray(forest.classes_)
+        self.n_trees = forest.roots.size
+        self._class_index = {int(c): k for k, c in enumerate(self.classes_.tolist())}
+
+        n_nodes = forest.left.size
+        nodes = np.arange(n_nodes)
+        is_leaf = forest.left == nodes
+        n_classes = forest.value.shape[1]
+
+        parent = np.full(n_nodes, -1, dtype=np.intp)
+        internal = np.flatnonzero(~is_leaf)
+        parent[forest.left[internal]] = internal
+        parent[forest.right[internal]] = internal
+
+        # Credits summed from the root, one tree level at a time (a level's nodes are distinct)
+        path = np.zeros((n_nodes, n_classes, n_features))
+        frontier = forest.roots
+        while frontier.size:
+            frontier = frontier[~is_leaf[frontier]]
+            children = np.concatenate([forest.left[frontier], forest.right[frontier]])
+            if not children.size:
+                break
+            parents = parent[children]
+            path[children] = path[parents]
+            path[children, :, forest.feature[parents]] += forest.value[children] - forest.value[parents]
+            frontier = children
+
+        leaves = np.flatnonzero(is_leaf)
+        self.leaf_position = np.full(n_nodes, -1, dtype=np.intp)
+        self.leaf_position[leaves] = np.arange(leaves.size)
+        self.table = path[leaves]
+        # Expected value of each class before any split
+        self.base_value = forest.value[forest.roots].mean(axis=0)
+
+    @classmethod
+    def table_bytes(cls, forest, n_features):
+        n_leaves = int((forest.left == np.arange(forest.left.size)).sum())
+        return n_leaves * forest.value.shape[1] * n_features * 8
+
+    def explain(self, feature_matrix, risk_levels):
+        """
+        Returns (contributions, base_values) for the class of each row's risk level:
+        contributions is (n_rows, n_features) in probability units, base_values is (n_rows,).
+        """
+        risk_levels = np.asarray(risk_levels, dtype=int)
+        class_index = np.array([self._class_index.get(level, 0) for level in risk_levels.tolist()], dtype=np.intp)
+
+        leaves = self.leaf_position[self.forest.apply(self.scale_fn(feature_matrix))]
+
+        contributions = np.zeros((risk_levels.size, self.table.shape[2]))
+        for tree_leaves in leaves:
+            contributions += self.table[tree_leaves, class_index]
+        contributions /= self.n_trees
+
+        return contributions, self.base_value[class_index]
+
+
+_explainers = OrderedDict()
+_explainers_lock = threading.Lock()
+
+
+def _build_explainer(bundle):
+    """Returns a ForestContributions for the bundle, or an error message if its model cannot be explained."""
+    compiled = bundle.compiled
+    if compiled is not None and isinstance(compiled.estimator, CompiledForest):
+        forest = compiled.estimator
+        scale_fn = compiled.scaler.transform if compiled.scaler is not None else lambda m: np.asarray(m, dtype=np.float64)
+    elif bundle.model is not None and CompiledForest.supports(bundle.model):
+        forest = CompiledForest(bundle.model)
+        scale_fn = bundle.scaler.transform if bundle.scaler is not None else lambda m: np.asarray(m, dtype=np.float64)
+    else:
+        name = compiled.kind if compiled is not None else type(bundle.model).__name__
+        return f"Explanations are only available for decision tree and random forest models, not {name}."
+
+    n_features = len(get_required_features(bundle))
+    table_mb = ForestContributions.table_bytes(forest, n_features) / 2 ** 20
+    if table_mb > Config.EXPLAIN_MAX_TABLE_MB:
+        return f"Model too large to explain: its contribution tables would take {table_mb:.0f} MB."
+
+    return ForestContributions(forest, scale_fn, n_features)
+
+
+def get_explainer(bundle):
+    """
+    Returns the bundle's ForestContributions, built on first use and kept per model version.
+    Raises ValueError if the model cannot be explained.
+    """
+    with _explainers_lock:
+        explainer = _explainers.get(bundle.version)
+        if explainer is None:
+            explainer = _explainers[bundle.version] = _build_explainer(bundle)
+            while len(_explainers) > MAX_CACHED_EXPLAINERS:
+                _explainers.popitem(last=False)
+        _explainers.move_to_end(bundle.version)
+
+    if isinstance(explainer, str):
+        raise ValueError(explainer)
+    return explainer
+
+
+def warm_explainer(bundle):
+    """Builds the bundle's tables ahead of the first explained request (no-op for other models)."""
+    if not Config.EXPLAIN_ENABLED:
+        return
+    try:
+        get_explainer(bundle)
+    except ValueError:
+        pass
+
+
+def build_explanation(contributions, base_value, feature_names, feature_row, top_n):
+    """Formats one row's contributions: the top_n features by absolute contribution, largest first."""
+    order = np.argsort(-np.abs(contributions), kind='stable')[:max(0, int(top_n))]
+    return {
+        'base_value': round(float(base_value), 4),
+        'top_features': [
+            {
+                'feature': feature_names[j],
+                'value': float(feature_row[j]),
+                'contribution': round(float(contributions[j]), 4)
+            }
+            for j in order.tolist()
+        ]
+    }
@@ -0,0 +1,206 @@
+import numpy as np
+from ..config import Config
+
+# Features that must physically be non-negative
+# ambient_temperature is excluded as it can be negative in winter conditions
+NON_NEGATIVE_FEATURES = [
+    'heart_rate',
+    'body_temperature',
+    'joint_angles',
+    'gait_speed',
+    'cadence',
+    'step_count',
+    'jump_height',
+    'ground_reaction_force',
+    'range_of_motion'
+]
+
+# Features stored as whole numbers; fractional input is truncated
+INTEGER_FEATURES = ['step_count']
+
+# Handle naming mismatch sent by older clients
+FEATURE_ALIASES = {
+    'joint_angles': ['joint_angle']
+}
+
+# What to do with values outside Config.FEATURE_RANGES: 'reject' (error), 'warn' (accept with a warning) or 'ignore'
+RANGE_POLICIES = ('reject', 'warn', 'ignore')
+
+
+def field_error(field, code, message):
+    return {'field': field, 'code': code, 'message': message}
+
+
+class FeatureSchema:
+    """
+    Validation rules for one feature order, compiled once into NumPy arrays
+    (bounds, integer and non-negative masks) so whole matrices are checked in a single pass.
+
+    Errors and warnings are returned per row as lists of {'field', 'code', 'message'} dicts.
+    """
+
+    def __init__(self, feature_names, feature_ranges=None, range_policy='warn'):
+        if range_policy not in RANGE_POLICIES:
+            raise ValueError(f"Unknown range policy: {range_policy}")
+
+        feature_ranges = feature_ranges or {}
+        self.fields = list(feature_names)
+        self.range_policy = range_policy
+        self.lookup_keys = [[name] + FEATURE_ALIASES.get(name, []) for name in self.fields]
+
+        self.integer = np.array([name in INTEGER_FEATURES for name in self.fields], dtype=bool)
+        self.non_negative = np.array([name in NON_NEGATIVE_FEATURES for name in self.fields], dtype=bool)
+        # Features without a configured range get (-inf, inf)
+        self.lower = np.array([feature_ranges.get(name, (-np.inf, np.inf))[0] for name in self.fields], dtype=float)
+        self.upper = np.array([feature_ranges.get(name, (-np.inf, np.inf))[1] for name in self.fields], dtype=float)
+
+    def _lookup(self, source, j):
+        for key in self.lookup_keys[j]:
+            value = source.get(key)
+            if value is not None:
+                return value
+        return None
+
+    def _to_column(self, values, j, errors):
+        """Converts one column to floats in a single NumPy call, falling back per value to find bad entries."""
+        try:
+            column = np.array(values, dtype=float)
+            # Equal-length lists in every cell convert too, as extra dimensions: only scalars take the fast path
+            if column.ndim == 1:
+                return column
+        except (TypeError, ValueError):
+            pass
+
+        column = np.full(len(values), np.nan)
+        for i, value in enumerate(values):
+            if value is None:
+                continue
+            try:
+                column[i] = float(value)
+            except (TypeError, ValueError):
+                field = self.fields[j]
+                errors.setdefault(i, []).append(
+                    field_error(field, 'not_numeric', f'Invalid value for {field}: must be numeric.')
+                )
+        return column
+
+    def parse_records(self, records, partial=False):
+        """
+        Builds a float matrix from a list of feature dicts.
+        With partial=True missing fields are not errors (they stay NaN), e.g. for updates.
+        Returns (feature_matrix, row_errors, row_warnings) keyed by row index.
+        """
+        errors = {}
+        feature_matrix = np.full((len(records), len(self.fields)), np.nan)
+
+        for i, record in enumerate(records):
+            if not isinstance(record, dict):
+                errors[i] = [field_error(None, 'not_an_object', 'Each record must be a JSON object.')]
+
+        valid_records = [record if isinstance(record, dict) else {} for record in records]
+        for j, field in enumerate(self.fields):
+            if len(self.lookup_keys[j]) == 1:
+                values = [record.get(field) for record in valid_records]
+            else:
+                values = [self._lookup(record, j) for record in valid_records]
+            feature_matrix[:, j] = self._to_column(values, j, errors)
+
+        return self.validate(feature_matrix, errors, partial=partial)
+
+    def parse_columns(self, columns):
+        """
+        Builds a float matrix from columnar input ({feature: [values, ...]}).
+        Returns (feature_matrix, row_errors, row_warnings), or raises ValueError if the columns are malformed.
+        """
+        lengths = {len(v) for v in columns.values() if isinstance(v, list)}
+        if len(lengths) != 1:
+            raise ValueError('All columns must be lists of the same length.')
+
+        errors = {}
+        feature_matrix = np.full((lengths.pop(), len(self.fields)), np.nan)
+
+        for j, field in enumerate(self.fields):
+            column = self._lookup(columns, j)
+            if not isinstance(column, list):
+                raise ValueError(f'Missing required feature column: {field}')
+            feature_matrix[:, j] = self._to_column(column, j, errors)
+
+        return self.validate(feature_matrix, errors)
+
+    def validate(self, feature_matrix, row_errors=None, partial=False):
+        """
+        Applies every rule to the whole matrix with NumPy masks (integer features are truncated in place).
+        Returns (feature_matrix, row_errors, row_warnings).
+        """
+        row_errors = row_errors if row_errors is not None else {}
+        row_warnings = {}
+
+        missing = np.isnan(feature_matrix)
+        # Rows with unparseable values are already reported; do not also call them missing
+        for i, field_errors in row_errors.items():
+            for error in field_errors:
+                if error['field'] is not None:
+                    missing[i, self.fields.index(error['field'])] = False
+                else:
+                    missing[i] = False
+
+        with np.errstate(invalid='ignore'):
+            feature_matrix[:, self.integer] = np.trunc(feature_matrix[:, self.integer])
+
+            checks = [
+                (np.isinf(feature_matrix), 'not_finite', 'Invalid value for {field}: must be finite.'),
+                ((feature_matrix < 0) & self.non_negative, 'negative', 'Invalid value for {field}: must be non-negative.')
+            ]
+            if not partial:
+                checks.insert(0, (missing, 'missing', 'Missing required feature: {field}'))
+
+            failed = np.zeros(feature_matrix.shape, dtype=bool)
+            for mask, code, message in checks:
+                self._report(mask & ~failed, code, message, row_errors)
+                failed |= mask
+
+            if self.range_policy != 'ignore':
+                out_of_range = ~failed & ~np.isnan(feature_matrix) & ((feature_matrix < self.lower) | (feature_matrix > self.upper))
+                if self.range_policy == 'reject':
+                    self._report(out_of_range, 'out_of_range', 'Invalid value for {field}: must be between {lower:g} and {upper:g}.', row_errors)
+                else:
+                    self._report(out_of_range, 'out_of_range', 'Value for {field} is outside the expected range {lower:g}-{upper:g}.', row_warnings)
+
+        # Field errors in feature order, so the first one matches the old single-message behaviour
+        for i in row_errors:
+            row_errors[i].sort(key=lambda e: -1 if e['field'] is None else self.fields.index(e['field']))
+
+        return feature_matrix, row_errors, row_warnings
+
+    def _report(self, mask, code, message, target):
+        # Only rows/fields that actually fail are visited, so clean input costs no Python loop
+        rows, columns = np.nonzero(mask)
+        if rows.size == 0:
+            return
+
+        messages = [message.format(field=field, lower=self.lower[j], upper=self.upper[j]) for j, field in enumerate(self.fields)]
+        for i, j in zip(rows.tolist(), columns.tolist()):
+            target.setdefault(i, []).append(field_error(self.fields[j], code, messages[j]))
+
+    def row_values(self, feature_row, present=None):
+        """Returns {field: value} for one validated row with integer features as int (skips absent fields)."""
+        values = {}
+        for j, field in enumerate(self.fields):
+            if present is not None and not present[j]:
+                continue
+            value = feature_row[j]
+            values[field] = int(value) if self.integer[j] else float(value)
+        return values
+
+
+_schemas = {}
+
+
+def get_feature_schema(feature_names):
+    """Returns the compiled schema for a feature order (compiled once per order and process)."""
+    key = tuple(feature_names)
+    schema = _schemas.get(key)
+    if schema is None:
+        schema = FeatureSchema(key, Config.FEATURE_RANGES, Config.FEATURE_RANGE_POLICY)
+        _schemas[key] = schema
+    return schema
@@ -1,28 +1,283 @@
-def generate_alert(prediction, probabilities, feature_values):
-    """Generate alerts based on prediction and sensor data."""
-    risk_levels = ['Healthy', 'Low Risk', 'Injured']
-    current_risk = risk_levels[prediction] if prediction < len(risk_levels) else "Unknown"
+import json
+import os
+import threading
+import time
+import numpy as np
+from ..config import Config
+
+# Condition operators: {"operand": [operator, value]}; a bare value means equality.
+# Numeric values may name a Config.ALERT_THRESHOLDS entry instead, e.g. [">=", "high_confidence"].
+OPERATORS = {
+    '>': lambda x, v: x > v,
+    '>=': lambda x, v: x >= v,
+    '<': lambda x, v: x < v,
+    '<=': lambda x, v: x <= v,
+    '==': lambda x, v: x == v,
+    '!=': lambda x, v: x != v,
+    # Rule value lists are short: comparing item by item beats np.isin's sort
+    # x is a column for batches and a Python scalar for single rows
+    'in': lambda x, v: np.logical_or.reduce([x == item for item in v]) if v else np.zeros(np.shape(x), dtype=bool),
+    'not_in': lambda x, v: ~np.logical_or.reduce([x == item for item in v]) if v else np.ones(np.shape(x), dtype=bool),
+    'between': lambda x, v: (x >= v[0]) & (x <= v[1]),
+    'outside': lambda x, v: (x < v[0]) | (x > v[1])
+}
+
+# Rule outputs, in the order they are returned
+OUTPUT_KINDS = ('alert', 'recommendation')
+
+# Distinct rule-match patterns whose messages are kept between calls
+MAX_CACHED_PATTERNS = 4096
+
+
+class AlertRule:
+    def __init__(self, kind, message, conditions):
+        self.kind = kind
+        self.message = message
+        # (operand, operator function, value)
+        self.conditions = conditions
+
+
+def _resolve_value(value, thresholds):
+    if isinstance(value, str):
+        if value not in thresholds:
+            raise ValueError(f"Unknown alert threshold: {value}")
+        return float(thresholds[value])
+    if isinstance(value, (list, tuple)):
+        return [_resolve_value(v, thresholds) for v in value]
+    return value
+
+
+def compile_rules(rules, thresholds):
+    """
+    Validates rule dicts ({"when": {operand: condition}, "alert" | "recommendation": message})
+    and compiles them into AlertRules. Raises ValueError on an invalid rule.
+    """
+    compiled = []
+
+    for position, rule in enumerate(rules):
+        if not isinstance(rule, dict):
+            raise ValueError(f"Alert rule {position} must be an object")
+
+        outputs = [kind for kind in OUTPUT_KINDS if kind in rule]
+        if len(outputs) != 1 or not isinstance(rule[outputs[0]], str):
+            raise ValueError(f"Alert rule {position} needs exactly one 'alert' or 'recommendation' message")
+
+        conditions = []
+        for operand, condition in (rule.get('when') or {}).items():
+            if isinstance(condition, (list, tuple)) and condition and condition[0] in OPERATORS:
+                operator, value = condition[0], condition[1] if len(condition) == 2 else list(condition[1:])
+            elif isinstance(condition, (list, tuple)):
+                raise ValueError(f"Alert rule {position}: unknown operator for {operand}: {condition[0] if condition else None}")
+            else:
+                operator, value = '==', condition
+
+            value = _resolve_value(value, thresholds)
+            if operator in ('in', 'not_in') and (not isinstance(value, list) or not value):
+                raise ValueError(f"Alert rule {position}: '{operator}' needs a non-empty list of values for {operand}")
+            if operator in ('between', 'outside') and (not isinstance(value, list) or len(value) != 2):
+                raise ValueError(f"Alert rule {position}: '{operator}' needs [low, high] for {operand}")
+
+            conditions.append((operand, OPERATORS[operator], value))
+
+        compiled.append(AlertRule(outputs[0], rule[outputs[0]], conditions))
+
+    return compiled
+
+
+class AlertRuleEngine:
+    """
+    Alerts and recommendations from an ordered rule table (Config.ALERT_RULES, or the JSON file at
+    ALERT_RULES_PATH when set), evaluated for a whole scored batch with one NumPy mask per rule.
+
+    Operands are 'risk_level', 'confidence' (probability of the predicted class) and any model feature;
+    a rule whose operand is not available never matches. The file is re-read when it changes, and a
+    file that fails to compile leaves the current rules in place.
+    """
+
+    def __init__(self, rules, thresholds, path=None, check_interval=2.0):
+        self.default_rules = rules
+        self.default_thresholds = dict(thresholds)
+        self.path = path or None
+        self.check_interval = float(check_interval)
+
+        self.source = None
+        self.loaded_at = None
+        self.error = None
+
+        self._rules = []
+        self._raw_rules = []
+        # Messages of every rule-match pattern seen so far, keyed on the packed pattern bits
+        self._pattern_messages = {}
+        self._mtime = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+        self.reload()
 
-    alerts = []
-    recommendations = []
+    def _read_source(self):
+        """Returns (rules, thresholds, source) from the rules file when present, else from the configuration."""
+        if self.path and os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            # Either a bare list of rules or {"thresholds": {...}, "rules": [...]}
+            if isinstance(data, list):
+                return data, self.default_thresholds, self.path
+            return data.get('rules', []), {**self.default_thresholds, **data.get('thresholds', {})}, self.path
 
-    if prediction == 2:  # Injured
-        alerts.append("HIGH RISK: Potential injury detected!")
-        if feature_values.get('heart_rate', 0) > 160:
-            recommendations.append("Elevated heart rate detected - consider reducing intensity")
-        if feature_values.get('body_temperature', 0) > 38:
-            recommendations.append("High body temperature - hydrate and cool down")
+        return self.default_rules, self.default_thresholds, 'config'
 
-        ja = feature_values.get('joint_angles')
-        if ja is not None and (ja < 60 or ja > 175):
-            recommendations.append("Abnormal joint angles detected - check form")
+    def reload(self):
+        """Recompiles the rules. Raises ValueError (keeping the current rules) if they are invalid."""
+        with self._lock:
+            self._mtime = os.path.getmtime(self.path) if self.path and os.path.exists(self.path) else None
+            self._next_check = time.monotonic() + self.check_interval
 
-    elif prediction == 1:  # Low Risk
-        alerts.append("CAUTION: Elevated injury risk indicators")
-        recommendations.append("Monitor your form and consider moderate intensity")
+            try:
+                rules, thresholds, source = self._read_source()
+                compiled = compile_rules(rules, thresholds)
+            except (OSError, ValueError, TypeError, AttributeError) as e:
+                self.error = str(e)
+                raise ValueError(f"Alert rules not reloaded: {str(e)}")
+
+            # Swapped as a whole, so a batch always sees one complete rule set
+            self._rules, self._pattern_messages = compiled, {}
+            self._raw_rules = list(rules)
+            self.source = source
+            self.loaded_at = time.time()
+            self.error = None
+
+        return len(compiled)
+
+    def _reload_if_changed(self):
+        if not self.path or time.monotonic() < self._next_check:
+            return
+
+        mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+        if mtime == self._mtime:
+            self._next_check = time.monotonic() + self.check_interval
+            return
+
+        try:
+            self.reload()
+            print(f"Alert rules reloaded from {self.source}")
+        except ValueError as e:
+            print(f"x {str(e)}")
+
+    def evaluate(self, risk_levels, probabilities, feature_matrix, feature_names):
+        """Returns one (alerts, recommendations) per row of a scored batch (rows may share the lists)."""
+        self._reload_if_changed()
+        rules, pattern_messages = self._rules, self._pattern_messages
+
+        risk_levels = np.asarray(risk_levels, dtype=int)
+        n_rows = risk_levels.size
+        if n_rows == 0:
+            return []
+        if not rules:
+            return [([], []) for _ in range(n_rows)]
+
+        # Probability of the predicted class (NaN, which matches nothing, when the model gives none)
+        confidence = np.full(n_rows, np.nan)
+        if probabilities is not None:
+            probabilities = np.asarray(probabilities, dtype=float)
+            known = (risk_levels >= 0) & (risk_levels < probabilities.shape[1])
+            confidence[known] = probabilities[np.flatnonzero(known), risk_levels[known]]
+
+        feature_matrix = np.asarray(feature_matrix, dtype=float)
+
+        if n_rows == 1:
+            # Single /predict rows: plain Python comparisons avoid the per-call NumPy overhead
+            operands = dict(zip(feature_names, feature_matrix[0].tolist()))
+            operands['risk_level'] = int(risk_levels[0])
+            operands['confidence'] = float(confidence[0])
+            return [self._row_messages(rules, pattern_messages, operands)]
+
+        operands = {name: feature_matrix[:, j] for j, name in enumerate(feature_names)}
+        operands['risk_level'] = risk_levels
+        operands['confidence'] = confidence
+
+        masks = np.zeros((len(rules), n_rows), dtype=bool)
+        with np.errstate(invalid='ignore'):
+            for r, rule in enumerate(rules):
+                mask = np.ones(n_rows, dtype=bool)
+                for operand, operator, value in rule.conditions:
+                    column = operands.get(operand)
+                    if column is None:
+                        mask[:] = False
+                        break
+                    mask &= operator(column, value)
+                masks[r] = mask
+
+        # Rows matching the same rules get the same messages: pack each row's matches into bytes
+        # and build the messages once per distinct pattern (cached until the rules change)
+        packed = np.ascontiguousarray(np.packbits(masks, axis=0, bitorder='little').T)
+        keys = packed.view(np.dtype((np.void, packed.shape[1]))).reshape(-1)
+        distinct, first_row, pattern_of_row = np.unique(keys, return_index=True, return_inverse=True)
+
+        messages = []
+        for key, row in zip(distinct.tolist(), first_row.tolist()):
+            pattern = self._pattern(rules, pattern_messages, key, np.flatnonzero(masks[:, row]).tolist())
+            # Copied per call so the cache cannot be changed through a result
+            messages.append((list(pattern[0]), list(pattern[1])))
+
+        # Rows with the same pattern share their lists: results are read-only
+        return [messages[k] for k in pattern_of_row.reshape(-1).tolist()]
+
+    @staticmethod
+    def _pattern(rules, pattern_messages, key, matched):
+        pattern = pattern_messages.get(key)
+        if pattern is None:
+            if len(pattern_messages) >= MAX_CACHED_PATTERNS:
+                pattern_messages.clear()
+            pattern = ([], [])
+            for r in matched:
+                pattern[OUTPUT_KINDS.index(rules[r].kind)].append(rules[r].message)
+            pattern_messages[key] = pattern
+        return pattern
+
+    def _row_messages(self, rules, pattern_messages, operands):
+        matched = []
+        for r, rule in enumerate(rules):
+            for operand, operator, value in rule.conditions:
+                x = operands.get(operand)
+                if x is None or not operator(x, value):
+                    break
+            else:
+                matched.append(r)
+
+        # Same key as the packed bits of the batch path
+        key = sum(1 << r for r in matched).to_bytes(-(-len(rules) // 8), 'little')
+        pattern = self._pattern(rules, pattern_messages, key, matched)
+        return list(pattern[0]), list(pattern[1])
+
+    def describe(self):
+        return {
+            'source': self.source,
+            'loaded_at': self.loaded_at,
+            'error': self.error,
+            'rules': self._raw_rules
+        }
+
+
+alert_rules = AlertRuleEngine(
+    Config.ALERT_RULES,
+    Config.ALERT_THRESHOLDS,
+    path=Config.ALERT_RULES_PATH,
+    check_interval=Config.ALERT_RULES_CHECK_SECONDS
+)
+
+
+def generate_alert(prediction, probabilities, feature_values):
+    """Generate alerts based on prediction and sensor data."""
+    feature_names = list(feature_values)
+    feature_row = [[feature_values[name] if feature_values[name] is not None else np.nan for name in feature_names]]
+    return alert_rules.evaluate(
+        [prediction],
+        [probabilities] if probabilities is not None and len(probabilities) else None,
+        np.array(feature_row, dtype=float).reshape(1, len(feature_names)),
+        feature_names
+    )[0]
 
-    else:  # Healthy
-        alerts.append("OPTIMAL: All parameters within safe ranges")
-        recommendations.append("Maintain current performance level")
 
-    return alerts, recommendations
+def generate_alerts_batch(risk_levels, probabilities, feature_matrix, feature_names):
+    """Generate alerts for every row of a scored batch. Returns a list of (alerts, recommendations)."""
+    return alert_rules.evaluate(risk_levels, probabilities, feature_matrix, feature_names)
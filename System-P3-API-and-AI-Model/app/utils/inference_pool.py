@@ -0,0 +1,341 @@
+import atexit
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from .predict_runners_model import score_feature_matrix
+
+# Shared-memory layout of every worker slot
+MAX_FEATURES = 32
+MAX_CLASSES = 16
+# Output rows hold the class probabilities followed by the predicted risk level
+OUTPUT_WIDTH = MAX_CLASSES + 1
+
+
+class ModelVersionMismatch(RuntimeError):
+    """A worker loaded another model version than the request's bundle (the artifact changed on disk)."""
+
+
+def _artifact_stat(path):
+    """Size and mtime of a model artifact and of its compact export, to tell when either changes on disk."""
+    from .model_artifact import compact_path_for
+
+    stats = []
+    for artifact_path in (path, compact_path_for(path)):
+        try:
+            stat = os.stat(artifact_path)
+            stats.append((stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            stats.append(None)
+    return tuple(stats)
+
+
+def _worker_main(conn, input_name, output_name, max_rows):
+    """Entry point of a pool process: holds one model bundle and scores rows placed in shared memory."""
+    # Ctrl+C and gunicorn's signals are handled by the parent, which stops us explicitly
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from .load_runners_model import load_runners_model
+    from .predict_runners_model import score_feature_matrix
+
+    # Spawned workers share the parent's resource tracker, so only the parent unlinks these segments
+    input_shm = shared_memory.SharedMemory(name=input_name)
+    output_shm = shared_memory.SharedMemory(name=output_name)
+    inputs = np.ndarray((max_rows, MAX_FEATURES), dtype=np.float64, buffer=input_shm.buf)
+    outputs = np.ndarray((max_rows, OUTPUT_WIDTH), dtype=np.float64, buffer=output_shm.buf)
+
+    bundle = None
+    # (requested version, artifact stat) of the last load that gave another version, so requests
+    # for that version do not reload the same changed file again and again
+    mismatch = None
+
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+
+            command = message[0]
+
+            if command == 'stop':
+                break
+
+            if command == 'ping':
+                conn.send(('pong', bundle.version if bundle else None))
+                continue
+
+            # ('score', n_rows, n_features, artifact path, label, version)
+            _, n_rows, n_features, path, label, version = message
+            try:
+                if bundle is None or bundle.version != version:
+                    artifact = _artifact_stat(path)
+                    if mismatch != (version, artifact):
+                        bundle = load_runners_model(path, label=label)
+                        mismatch = None if bundle.version == version else (version, artifact)
+
+                if bundle.version != version:
+                    # Never score with a model other than the one the response will name
+                    conn.send(('mismatch', bundle.version))
+                    continue
+
+                risk_levels, probabilities = score_feature_matrix(inputs[:n_rows, :n_features], bundle)
+                outputs[:n_rows, MAX_CLASSES] = risk_levels
+
+                n_classes = 0
+                if probabilities is not None:
+                    n_classes = probabilities.shape[1]
+                    outputs[:n_rows, :n_classes] = probabilities
+
+                conn.send(('ok', n_classes, bundle.version))
+            except Exception as e:
+                conn.send(('error', str(e)))
+    finally:
+        del inputs, outputs
+        input_shm.close()
+        output_shm.close()
+
+
+class _PoolWorker:
+    """One long-lived process plus its shared-memory input/output buffers."""
+
+    def __init__(self, context, max_rows):
+        self.input_shm = shared_memory.SharedMemory(create=True, size=max_rows * MAX_FEATURES * 8)
+        self.output_shm = shared_memory.SharedMemory(create=True, size=max_rows * OUTPUT_WIDTH * 8)
+        self.inputs = np.ndarray((max_rows, MAX_FEATURES), dtype=np.float64, buffer=self.input_shm.buf)
+        self.outputs = np.ndarray((max_rows, OUTPUT_WIDTH), dtype=np.float64, buffer=self.output_shm.buf)
+
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, self.input_shm.name, self.output_shm.name, max_rows),
+            name='inference-worker',
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(('stop',))
+        except Exception:
+            pass
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=2)
+
+        self.conn.close()
+        del self.inputs, self.outputs
+        for shm in (self.input_shm, self.output_shm):
+            shm.close()
+            shm.unlink()
+
+
+class InferencePool:
+    """
+    Pool of long-lived processes, each holding the model once, so CPU-bound scoring
+    runs outside the request process's GIL.
+
+    Rows are written into a worker's shared-memory input buffer and results read back
+    from its output buffer; only a small control tuple crosses the pipe.
+    """
+
+    def __init__(self, size, max_rows=1024, timeout=30.0, health_interval=10.0, ping_timeout=1.0):
+        self.size = max(1, int(size))
+        self.max_rows = max(1, int(max_rows))
+        self.timeout = float(timeout)
+        self.health_interval = float(health_interval)
+        # An idle worker answers a ping at once; this is not the (much longer) scoring timeout
+        self.ping_timeout = float(ping_timeout)
+
+        # spawn: never fork a process that is already running request threads
+        self._context = multiprocessing.get_context('spawn')
+        self._workers = []
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._health_thread = None
+        self._metrics = {'calls': 0, 'rows': 0, 'errors': 0, 'restarts': 0, 'timeouts': 0, 'version_fallbacks': 0}
+
+    def start(self):
+        """Starts the worker processes (once per process that uses the pool)."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            self._pid = os.getpid()
+            self._workers = [_PoolWorker(self._context, self.max_rows) for _ in range(self.size)]
+            self._idle = queue.Queue()
+            for worker in self._workers:
+                self._idle.put(worker)
+
+            if self.health_interval > 0:
+                self._health_thread = threading.Thread(target=self._health_loop, name='inference-pool-health', daemon=True)
+                self._health_thread.start()
+
+            atexit.register(self.shutdown)
+
+    def _replace(self, worker):
+        """Stops a crashed or hung worker and starts a fresh one in its slot."""
+        try:
+            worker.stop()
+        except Exception:
+            pass
+
+        with self._lock:
+            # Never start a process for a pool that has been shut down meanwhile
+            if self._pid != os.getpid():
+                raise RuntimeError('Inference pool is shut down')
+
+            replacement = _PoolWorker(self._context, self.max_rows)
+            self._workers = [replacement if w is worker else w for w in self._workers]
+            self._metrics['restarts'] += 1
+        return replacement
+
+    def _dispatch(self, worker, chunk, bundle):
+        n_rows, n_features = chunk.shape
+        worker.inputs[:n_rows, :n_features] = chunk
+        worker.conn.send(('score', n_rows, n_features, bundle.path, bundle.label, bundle.version))
+
+        if not worker.conn.poll(self.timeout):
+            with self._lock:
+                self._metrics['timeouts'] += 1
+            raise TimeoutError(f'Inference worker did not answer within {self.timeout}s')
+
+        reply = worker.conn.recv()
+        if reply[0] == 'error':
+            raise RuntimeError(reply[1])
+        loaded_version = reply[1] if reply[0] == 'mismatch' else reply[2]
+        if loaded_version != bundle.version:
+            raise ModelVersionMismatch(f'Inference worker has {loaded_version} from {bundle.path}, not {bundle.version}')
+
+        n_classes = reply[1]
+        risk_levels = worker.outputs[:n_rows, MAX_CLASSES].astype(int)
+        probabilities = worker.outputs[:n_rows, :n_classes].copy() if n_classes else None
+        return risk_levels, probabilities
+
+    def _score_chunk(self, chunk, bundle):
+        worker = self._idle.get()
+        try:
+            try:
+                return self._dispatch(worker, chunk, bundle)
+            except (EOFError, BrokenPipeError, ConnectionResetError, OSError, TimeoutError):
+                # The worker died or hung mid-request: replace it and retry once
+                worker = self._replace(worker)
+                return self._dispatch(worker, chunk, bundle)
+        finally:
+            self._idle.put(worker)
+
+    def score(self, feature_matrix, bundle):
+        """Scores a matrix in the pool. Same contract as score_feature_matrix."""
+        self.start()
+
+        feature_matrix = np.asarray(feature_matrix, dtype=np.float64)
+        if feature_matrix.shape[1] > MAX_FEATURES:
+            raise ValueError(f'Inference pool supports at most {MAX_FEATURES} features')
+
+        risk_levels, probabilities = [], []
+        try:
+            for start in range(0, feature_matrix.shape[0], self.max_rows):
+                chunk_levels, chunk_probabilities = self._score_chunk(feature_matrix[start:start + self.max_rows], bundle)
+                risk_levels.append(chunk_levels)
+                probabilities.append(chunk_probabilities)
+        except ModelVersionMismatch:
+            # The artifact changed after this bundle was loaded: the bundle in hand scores inline, so results
+            # carry the model_version they were made with until the registry swaps in the new version
+            with self._lock:
+                self._metrics['version_fallbacks'] += 1
+            risk_levels, probabilities = score_feature_matrix(feature_matrix, bundle)
+            risk_levels, probabilities = [risk_levels], [probabilities]
+        except Exception:
+            with self._lock:
+                self._metrics['errors'] += 1
+            raise
+
+        with self._lock:
+            self._metrics['calls'] += 1
+            self._metrics['rows'] += feature_matrix.shape[0]
+
+        if any(p is None for p in probabilities):
+            return np.concatenate(risk_levels), None
+        return np.concatenate(risk_levels), np.vstack(probabilities)
+
+    def check_health(self):
+        """
+        Pings the idle workers and restarts the ones that are dead or unresponsive.
+        Workers are taken out one at a time and put back before the next is pinged, so requests
+        keep the rest of the pool while a hung worker runs out its ping timeout.
+        """
+        checked = set()
+        for _ in range(self.size):
+            if self._pid != os.getpid():
+                return
+
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+
+            if id(worker) in checked:
+                # Every idle worker has been pinged this round
+                self._idle.put(worker)
+                return
+            checked.add(id(worker))
+
+            healthy = False
+            try:
+                if worker.process.is_alive():
+                    worker.conn.send(('ping',))
+                    healthy = worker.conn.poll(self.ping_timeout) and worker.conn.recv()[0] == 'pong'
+            except Exception:
+                healthy = False
+
+            if healthy:
+                self._idle.put(worker)
+                continue
+
+            try:
+                worker = self._replace(worker)
+                checked.add(id(worker))
+            finally:
+                self._idle.put(worker)
+
+    def _health_loop(self):
+        while self._pid == os.getpid():
+            time.sleep(self.health_interval)
+            try:
+                self.check_health()
+            except Exception as e:
+                print(f"x Inference pool health check failed: {str(e)}")
+
+    def get_metrics(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+            alive = sum(1 for w in self._workers if w.process.is_alive())
+
+        return {
+            'size': self.size,
+            'alive_workers': alive,
+            'idle_workers': self._idle.qsize(),
+            'max_rows_per_dispatch': self.max_rows,
+            **metrics
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            workers, self._workers = self._workers, []
+            self._pid = None
+            self._idle = queue.Queue()
+
+        for worker in workers:
+            try:
+                worker.stop()
+            except Exception:
+                pass
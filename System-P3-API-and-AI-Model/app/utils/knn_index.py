@@ -0,0 +1,202 @@
+import os
+import numpy as np
+from .model_artifact import read_array_container, write_array_container
+
+KNN_INDEX_SUFFIX = '.knnindex'
+
+# Rows sampled per node to pick the split feature (the one with the widest spread)
+SPLIT_SAMPLE_SIZE = 1024
+
+# Leaves scanned per search step; the step doubles up to this so close leaves are checked first
+MAX_LEAVES_PER_STEP = 16
+
+
+def knn_index_path_for(model_path):
+    """Returns the index path that sits next to a model artifact (pickle or compact export)."""
+    return os.path.splitext(model_path)[0] + KNN_INDEX_SUFFIX
+
+
+class KNNIndex:
+    """
+    Exact nearest-neighbour index over the scaled KNN reference set.
+
+    A KD-tree whose leaves are buckets of reference rows with bounding boxes: a query visits
+    leaves in order of their box distance and stops once no remaining box can hold a closer
+    row, so only a small part of the reference set is compared. Distances are accumulated
+    feature by feature like the brute-force evaluator, so neighbours match it exactly
+    (ties at the k-th distance are broken by reference row index).
+    """
+
+    def __init__(self, order, leaf_bounds, lower_columns, upper_columns):
+        # Reference row ids grouped leaf by leaf; leaf i owns order[leaf_bounds[i]:leaf_bounds[i + 1]]
+        self.order = order
+        self.leaf_bounds = leaf_bounds
+        # Bounding box of every leaf, feature-major: (n_features, n_leaves)
+        self.lower_columns = lower_columns
+        self.upper_columns = upper_columns
+
+    @property
+    def n_leaves(self):
+        return self.leaf_bounds.size - 1
+
+    @property
+    def n_rows(self):
+        return self.order.size
+
+    @classmethod
+    def build(cls, reference_columns, leaf_size=0, seed=0):
+        """Builds the index over a feature-major (n_features, n_rows) reference matrix."""
+        n_rows = reference_columns.shape[1]
+        # Small leaves keep the boxes tight; growing them with the cube root of n keeps the per-query box scan cheap
+        leaf_size = int(leaf_size) or max(32, int(round(n_rows ** (1 / 3))))
+        rng = np.random.default_rng(seed)
+
+        order = np.arange(n_rows, dtype=np.intp)
+        leaf_starts = []
+        segments = [(0, n_rows)]
+
+        # Depth-first, left half first, so leaves come out in row order
+        while segments:
+            start, end = segments.pop()
+            if end - start <= leaf_size:
+                leaf_starts.append(start)
+                continue
+
+            rows = order[start:end]
+            sample = rows if rows.size <= SPLIT_SAMPLE_SIZE else rows[rng.integers(0, rows.size, SPLIT_SAMPLE_SIZE)]
+            feature = int(np.argmax(np.ptp(reference_columns[:, sample], axis=1)))
+
+            middle = rows.size // 2
+            order[start:end] = rows[np.argpartition(reference_columns[feature, rows], middle)]
+
+            segments.append((start + middle, end))
+            segments.append((start, start + middle))
+
+        leaf_starts = np.array(leaf_starts, dtype=np.intp)
+        lower_columns = np.empty((reference_columns.shape[0], leaf_starts.size), dtype=np.float64)
+        upper_columns = np.empty_like(lower_columns)
+
+        for j in range(reference_columns.shape[0]):
+            column = reference_columns[j, order]
+            lower_columns[j] = np.minimum.reduceat(column, leaf_starts)
+            upper_columns[j] = np.maximum.reduceat(column, leaf_starts)
+
+        leaf_bounds = np.append(leaf_starts, n_rows).astype(np.intp)
+        return cls(order, leaf_bounds, lower_columns, upper_columns)
+
+    def box_distances(self, query, metric):
+        """Lower bound of the reduced distance from every query row to every leaf: (n_queries, n_leaves)."""
+        bounds = np.zeros((query.shape[0], self.n_leaves), dtype=np.float64)
+        for j in range(query.shape[1]):
+            values = query[:, j, np.newaxis]
+            # At most one of the two gaps is non-zero
+            gap = np.maximum(self.lower_columns[np.newaxis, j] - values, 0.0)
+            gap += np.maximum(values - self.upper_columns[np.newaxis, j], 0.0)
+            if metric == 'euclidean':
+                bounds += gap * gap
+            else:
+                bounds += gap
+        return bounds
+
+    def query(self, reference_columns, query, k, metric):
+        """Returns (reduced distances, indices) of the k nearest reference rows, closest first."""
+        n_queries = query.shape[0]
+        distances = np.empty((n_queries, k), dtype=np.float64)
+        indices = np.empty((n_queries, k), dtype=np.intp)
+
+        bounds = self.box_distances(query, metric)
+        for i in range(n_queries):
+            distances[i], indices[i] = self._query_row(reference_columns, query[i], bounds[i], k, metric)
+
+        return distances, indices
+
+    def _query_row(self, reference_columns, row, bounds, k, metric):
+        best_distances = np.full(k, np.inf)
+        best_indices = np.full(k, -1, dtype=np.intp)
+
+        # The closest box gives a first k-th distance; only the other boxes within it need sorting
+        closest = int(np.argmin(bounds))
+        best_distances, best_indices = self._scan_leaves(
+            reference_columns, row, [closest], best_distances, best_indices, metric
+        )
+        leaf_order = np.flatnonzero(bounds <= best_distances[-1])
+        leaf_order = leaf_order[leaf_order != closest]
+        leaf_order = leaf_order[np.argsort(bounds[leaf_order], kind='stable')]
+
+        position, step = 0, 1
+        while position < leaf_order.size:
+            leaves = leaf_order[position:position + step]
+            # Leaves are sorted by box distance: once one cannot beat the k-th best, none can
+            leaves = leaves[bounds[leaves] <= best_distances[-1]]
+            if leaves.size == 0:
+                break
+
+            best_distances, best_indices = self._scan_leaves(
+                reference_columns, row, leaves, best_distances, best_indices, metric
+            )
+
+            position += leaves.size
+            step = min(step * 2, MAX_LEAVES_PER_STEP)
+
+        return best_distances, best_indices
+
+    def _scan_leaves(self, reference_columns, row, leaves, best_distances, best_indices, metric):
+        """Merges the rows of `leaves` into the current k best."""
+        rows = np.concatenate([self.order[self.leaf_bounds[leaf]:self.leaf_bounds[leaf + 1]] for leaf in leaves])
+
+        reduced = np.zeros(rows.size, dtype=np.float64)
+        for j in range(row.size):
+            diff = row[j] - reference_columns[j, rows]
+            if metric == 'euclidean':
+                reduced += diff * diff
+            else:
+                reduced += np.abs(diff)
+
+        k = best_distances.size
+        candidate_distances = np.concatenate([best_distances, reduced])
+        candidate_indices = np.concatenate([best_indices, rows])
+        keep = np.lexsort((candidate_indices, candidate_distances))[:k]
+        return candidate_distances[keep], candidate_indices[keep]
+
+    def save(self, path, source_sha256):
+        """Persists the index in the compact layout, tied to the artifact it was built from."""
+        header = {'kind': 'knn_index', 'source_sha256': source_sha256, 'n_rows': self.n_rows}
+        arrays = {
+            'order': self.order,
+            'leaf_bounds': self.leaf_bounds,
+            'lower_columns': self.lower_columns,
+            'upper_columns': self.upper_columns
+        }
+        return write_array_container(path, header, arrays)
+
+    @classmethod
+    def load(cls, path, source_sha256=None, mmap_mode='r'):
+        """Reads a persisted index. Raises ValueError if it belongs to another artifact."""
+        header, arrays = read_array_container(path, mmap_mode=mmap_mode)
+        if header.get('kind') != 'knn_index':
+            raise ValueError(f"{os.path.basename(path)} is not a KNN index")
+        if source_sha256 is not None and header.get('source_sha256') != source_sha256:
+            raise ValueError(f"{os.path.basename(path)} was built from a different model artifact")
+
+        return cls(arrays['order'], arrays['leaf_bounds'], arrays['lower_columns'], arrays['upper_columns'])
+
+
+def load_or_build_knn_index(reference_columns, path, source_sha256, leaf_size=0, mmap_mode='r'):
+    """Loads the persisted index for an artifact, or builds it and saves it next to the artifact."""
+    if os.path.exists(path):
+        try:
+            index = KNNIndex.load(path, source_sha256, mmap_mode=mmap_mode)
+            if index.n_rows == reference_columns.shape[1]:
+                return index
+        except (OSError, ValueError) as e:
+            print(f"x Rebuilding KNN index {os.path.basename(path)}: {str(e)}")
+
+    index = KNNIndex.build(reference_columns, leaf_size=leaf_size)
+
+    try:
+        index.save(path, source_sha256)
+    except OSError as e:
+        # A read-only models folder only costs a rebuild on the next boot
+        print(f"x Could not persist KNN index to {path}: {str(e)}")
+
+    return index
@@ -0,0 +1,274 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque, namedtuple
+from flask import Response, request, current_app, jsonify
+from ..config import Config
+from .metrics import metrics
+
+LiveEvent = namedtuple('LiveEvent', ['id', 'type', 'data'])
+
+
+def session_topic(session_id):
+    return f'session:{session_id}'
+
+
+def coach_topic(coach_id):
+    return f'coach:{coach_id}'
+
+
+class _Topic:
+    def __init__(self, lock, replay_events, dropped_through):
+        self.events = deque(maxlen=replay_events)
+        self.condition = threading.Condition(lock)
+        self.subscribers = 0
+        # Id of the newest event this topic can no longer replay: pushed out of the buffer, or
+        # published before the topic was (re)created
+        self.dropped_through = dropped_through
+
+
+class LiveFeed:
+    """
+    In-process publish/subscribe for live session data.
+
+    Every topic keeps its last replay_events events in a ring buffer shared by all of its subscribers,
+    so publishing costs one append per topic however many clients listen, and a reconnecting client
+    resumes after its Last-Event-ID. Event ids increase across every topic of the process.
+
+    Ids are sent to clients as "<epoch>-<n>", the epoch being random per process: a Last-Event-ID
+    from before a restart, or from another worker, is recognized as unknown instead of being
+    compared with this process's counter.
+    """
+
+    def __init__(self, replay_events=256, max_topics=1024):
+        self.replay_events = max(1, int(replay_events))
+        self.max_topics = max(1, int(max_topics))
+
+        self._lock = threading.Lock()
+        self._metrics = {'published': 0, 'delivered': 0, 'resets': 0}
+        self._reset()
+
+    def _reset(self):
+        # A forked worker starts its own feed: the parent's ids and buffers mean nothing to its clients
+        self._pid = os.getpid()
+        self.epoch = uuid.uuid4().hex[:8]
+        self._topics = OrderedDict()
+        self._last_event_id = 0
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _topic(self, name):
+        self._check_fork()
+        topic = self._topics.get(name)
+        if topic is None:
+            topic = self._topics[name] = _Topic(self._lock, self.replay_events, self._last_event_id)
+            # Forget the replay buffers of the least recently used topics nobody listens to
+            excess = len(self._topics) - self.max_topics
+            if excess > 0:
+                idle = [key for key, value in self._topics.items() if value.subscribers == 0 and key != name]
+                for stale in idle[:excess]:
+                    del self._topics[stale]
+        self._topics.move_to_end(name)
+        return topic
+
+    @property
+    def last_event_id(self):
+        with self._lock:
+            self._check_fork()
+            return self._last_event_id
+
+    def format_event_id(self, event_id):
+        return f'{self.epoch}-{event_id}'
+
+    def parse_event_id(self, value):
+        """The event id of a Last-Event-ID this process sent, or None for any other value."""
+        epoch, _, number = (value or '').rpartition('-')
+        with self._lock:
+            self._check_fork()
+            if epoch != self.epoch or not number.isdigit() or int(number) > self._last_event_id:
+                return None
+        return int(number)
+
+    def publish(self, topics, event_type, data):
+        """Appends one event to every topic and wakes their subscribers. Returns the event id."""
+        with self._lock:
+            self._check_fork()
+            self._last_event_id += 1
+            event = LiveEvent(self._last_event_id, event_type, data)
+
+            for name in topics:
+                topic = self._topic(name)
+                if len(topic.events) == topic.events.maxlen:
+                    topic.dropped_through = topic.events[0].id
+                topic.events.append(event)
+                topic.condition.notify_all()
+
+            self._metrics['published'] += 1
+
+        return event.id
+
+    def has_subscribers(self, topics):
+        with self._lock:
+            self._check_fork()
+            return any(name in self._topics and self._topics[name].subscribers for name in topics)
+
+    def subscribe(self, name):
+        with self._lock:
+            self._topic(name).subscribers += 1
+
+    def unsubscribe(self, name):
+        with self._lock:
+            self._check_fork()
+            topic = self._topics.get(name)
+            if topic is not None:
+                topic.subscribers = max(0, topic.subscribers - 1)
+
+    def wait(self, name, last_event_id, timeout):
+        """
+        Returns (events after last_event_id, missed, position), waiting up to timeout seconds for one to be
+        published. missed is True when events after last_event_id can no longer be replayed; position is
+        the id to wait after next time.
+        """
+        with self._lock:
+            topic = self._topic(name)
+            if last_event_id >= topic.dropped_through and (not topic.events or topic.events[-1].id <= last_event_id):
+                topic.condition.wait(timeout)
+
+            missed = last_event_id < topic.dropped_through
+            events = [event for event in topic.events if event.id > last_event_id]
+            position = events[-1].id if events else max(last_event_id, topic.dropped_through)
+
+            self._metrics['delivered'] += len(events)
+            if missed:
+                self._metrics['resets'] += 1
+
+        return events, missed, position
+
+    def record_reset(self):
+        with self._lock:
+            self._metrics['resets'] += 1
+
+    def get_metrics(self):
+        with self._lock:
+            self._check_fork()
+            return {
+                **self._metrics,
+                'topics': len(self._topics),
+                'subscribers': sum(topic.subscribers for topic in self._topics.values()),
+                'last_event_id': self._last_event_id
+            }
+
+
+def format_sse(event_type, data, event_id=None):
+    """Formats one Server-Sent Events message."""
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines.append(f'event: {event_type}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def _reset_message(feed, position):
+    # Carries the id to resume after (unless events follow with their own), so a reconnect
+    # does not ask for the lost events again
+    return format_sse(
+        'reset', {'reason': 'Events since Last-Event-ID are no longer available.'},
+        feed.format_event_id(position) if position is not None else None
+    )
+
+
+def sse_stream(feed, topic, last_event_id=None, heartbeat_seconds=15.0, max_seconds=0.0, retry_ms=1000):
+    """
+    Yields the SSE messages of one topic: replayed events after last_event_id (a Last-Event-ID value),
+    then new events as they are published, with a comment line every heartbeat_seconds of silence so
+    proxies keep the connection. Ends after max_seconds (0 for never); the client reconnects with
+    Last-Event-ID and misses nothing. An id this process did not send starts with a reset event.
+    """
+    deadline = time.monotonic() + max_seconds if max_seconds > 0 else None
+    # Subscribed first, so the topic exists (and knows what it cannot replay) before the position is taken
+    feed.subscribe(topic)
+
+    try:
+        yield f'retry: {int(retry_ms)}\n\n'
+
+        position = feed.parse_event_id(last_event_id)
+        if position is None:
+            position = feed.last_event_id
+            if last_event_id:
+                # Sent before a restart or by another worker: what came since is unknown
+                feed.record_reset()
+                yield _reset_message(feed, position)
+        last_event_id = position
+
+        while True:
+            timeout = heartbeat_seconds
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+                if timeout <= 0:
+                    return
+
+            events, missed, last_event_id = feed.wait(topic, last_event_id, timeout)
+
+            if missed:
+                # Tell the client to reload the session state it missed
+                yield _reset_message(feed, None if events else last_event_id)
+
+            if events:
+                yield ''.join(format_sse(event.type, event.data, feed.format_event_id(event.id)) for event in events)
+            else:
+                yield ': heartbeat\n\n'
+    finally:
+        feed.unsubscribe(topic)
+
+
+def sse_response(feed, topic):
+    """
+    Streams a topic to the current request as text/event-stream, resuming after its Last-Event-ID
+    (header, or ?last_event_id= for clients that cannot set it).
+
+    Refused with 503 on a gunicorn sync worker: the stream would hold its only thread, and the
+    client's immediate reconnects would keep the worker from serving anything else.
+    """
+    environ = request.environ
+    if environ.get('SERVER_SOFTWARE', '').startswith('gunicorn') and not environ.get('wsgi.multithread'):
+        return jsonify({
+            'error': 'Live feeds need threaded or async server workers.',
+            'details': 'Run gunicorn with GUNICORN_WORKER_CLASS=gthread (the default of gunicorn.conf.py).'
+        }), 503
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+
+    stream = sse_stream(
+        feed,
+        topic,
+        last_event_id,
+        heartbeat_seconds=current_app.config.get('LIVE_FEED_HEARTBEAT_SECONDS', 10.0),
+        max_seconds=current_app.config.get('LIVE_FEED_MAX_STREAM_SECONDS', 25.0)
+    )
+
+    # Not wrapped in stream_with_context: the request context (and its database session)
+    # is released as soon as the view returns instead of being held for the whole stream
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Stop nginx from buffering the stream
+        'X-Accel-Buffering': 'no'
+    })
+
+
+live_feed = LiveFeed(Config.LIVE_FEED_REPLAY_EVENTS, Config.LIVE_FEED_MAX_TOPICS)
+
+
+def _collect_live_feed_metrics():
+    feed = live_feed.get_metrics()
+    return [
+        ('rips_live_feed_events_total', 'counter', 'Live feed events by direction.',
+         [({'direction': 'published'}, feed['published']), ({'direction': 'delivered'}, feed['delivered'])]),
+        ('rips_live_feed_resets_total', 'counter', 'Live feed reconnects that missed events.', [({}, feed['resets'])]),
+        ('rips_live_feed_subscribers', 'gauge', 'Open live feed streams.', [({}, feed['subscribers'])])
+    ]
+
+
+metrics.add_collector(_collect_live_feed_metrics)
@@ -1,68 +1,192 @@
+import hashlib
 import os
+import time
+from collections import namedtuple
 import joblib
+from ..config import Config
+from .compile_runners_model import compile_runners_model, CompiledKNN
+from .knn_index import knn_index_path_for, load_or_build_knn_index
+from .model_artifact import ARTIFACT_SUFFIX, compact_path_for, read_artifact_header, read_compact_artifact
 
-# Use a dictionary to manage state mutable across functions
-model_state = {
-    'model': None,
-    'scaler': None,
-    'feature_names': None,
-    'performance': None,
-    'status': 'Not Loaded',
-    'error': 'Model loading has not been attempted yet.'
-}
+# Immutable snapshot of one loaded artifact. Requests hold on to the bundle they started with,
+# so a hot-swap never changes the model underneath an in-flight prediction.
+ModelBundle = namedtuple('ModelBundle', [
+    'version',
+    'label',
+    'path',
+    'checksum',
+    'model',
+    'scaler',
+    'feature_names',
+    'performance',
+    'compiled',
+    'loaded_at'
+])
 
 
-def load_runners_model():
-    """Loads the model artifacts from disk."""
-    global model_state
+def compute_checksum(path):
+    """Returns the SHA-256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def attach_knn_index(compiled, model_path, source_sha256):
+    """
+    Gives a compiled KNN model with a large reference set its KNNIndex, loaded from next to the
+    artifact or built (and saved there) on first use. Smaller models keep brute-force search.
+    """
+    if compiled is None or not Config.KNN_INDEX_ENABLED:
+        return
+
+    estimator = compiled.estimator
+    if not isinstance(estimator, CompiledKNN) or estimator.reference.shape[0] < Config.KNN_INDEX_MIN_ROWS:
+        return
+
+    try:
+        estimator.index = load_or_build_knn_index(
+            estimator.reference_columns,
+            knn_index_path_for(model_path),
+            source_sha256,
+            leaf_size=Config.KNN_INDEX_LEAF_SIZE,
+            mmap_mode=Config.MODEL_MMAP_MODE
+        )
+    except Exception as e:
+        print(f"x KNN index unavailable, using brute-force search: {str(e)}")
+
+
+def find_compact_artifact(model_path):
+    """
+    Returns the compact artifact to load instead of the pickle at model_path, or None.
+    A compact artifact exported from a different pickle than the one on disk is ignored.
+    The pickle is only hashed when its size or mtime differ from the ones recorded at export.
+    """
+    if Config.MODEL_ARTIFACT_FORMAT == 'pickle' or not Config.COMPILE_RUNNERS_MODEL:
+        return None
+
+    compact_path = compact_path_for(model_path)
+    if not os.path.exists(compact_path):
+        return None
+
+    if os.path.exists(model_path):
+        try:
+            header, _ = read_artifact_header(compact_path)
+        except (OSError, ValueError) as e:
+            print(f"x Ignoring unreadable compact artifact {compact_path}: {str(e)}")
+            return None
+
+        source = header['source']
+        stat = os.stat(model_path)
+        unchanged = source.get('size') == stat.st_size and source.get('mtime_ns') == stat.st_mtime_ns
+        if not unchanged and source['sha256'] != compute_checksum(model_path):
+            print(f"x Ignoring stale compact artifact {compact_path}: re-export it from the current pickle")
+            return None
+
+    return compact_path
+
+
+def load_compact_runners_model(model_path, label='default'):
+    """
+    Loads a compact (.rmodel) artifact into a ModelBundle scored by the compiled evaluator.
+    The bundle is versioned by the source pickle's checksum, so a pickle and its export are the same version.
+    """
+    try:
+        header, compiled = read_compact_artifact(model_path, mmap_mode=Config.MODEL_MMAP_MODE)
+    except Exception as e:
+        raise RuntimeError(f"Compact model load failed: {str(e)}")
+
+    checksum = header['source']['sha256']
+
+    # Indexes are tied to the source pickle, so the pickle and its export share one
+    attach_knn_index(compiled, model_path, checksum)
+
+    feature_names = header.get('feature_names')
+
+    # The compiled model applies the scaler itself, so there is no separate scaler to run
+    return ModelBundle(
+        version=f"{label}:{checksum[:12]}",
+        label=label,
+        path=model_path,
+        checksum=checksum,
+        model=compiled,
+        scaler=None,
+        feature_names=list(feature_names) if feature_names is not None else None,
+        performance=header.get('performance'),
+        compiled=compiled,
+        loaded_at=time.time()
+    )
+
+
+def load_runners_model(model_path=None, label='default'):
+    """
+    Loads the model artifacts from disk into a ModelBundle.
+    Prefers a compact artifact next to the pickle; falls back to unpickling.
+    Raises RuntimeError with a readable message if the artifact cannot be loaded.
+    """
+    if model_path is None:
+        model_path = Config.MODEL_PATH
+
+    if model_path.endswith(ARTIFACT_SUFFIX):
+        return load_compact_runners_model(model_path, label=label)
+
+    compact_path = find_compact_artifact(model_path)
+    if compact_path is not None:
+        try:
+            return load_compact_runners_model(compact_path, label=label)
+        except RuntimeError as e:
+            if not os.path.exists(model_path):
+                raise
+            print(f"x {str(e)}; falling back to {os.path.basename(model_path)}")
 
     # Check dependencies
     if joblib is None:
-        model_state['status'] = 'Error'
-        model_state['error'] = "Critical dependency 'joblib' is missing. Please install it."
-        print(f"x {model_state['error']}")
-        return
+        raise RuntimeError("Critical dependency 'joblib' is missing. Please install it.")
+
+    if not os.path.exists(model_path):
+        raise RuntimeError(f"Model file not found at: {model_path}")
 
+    checksum = compute_checksum(model_path)
+
+    # Try Joblib (Primary method for scikit-learn KNN models)
+    # With mmap_mode the NumPy arrays stay backed by the file, so every process shares the page cache
     try:
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        model_path = os.path.join(base_dir, 'ai_classification_models', 'runners_injury_prediction_model.pkl')
+        loaded_object = joblib.load(model_path, mmap_mode=Config.MODEL_MMAP_MODE)
+    except Exception as e:
+        raise RuntimeError(f"Joblib load failed: {str(e)}")
 
-        if not os.path.exists(model_path):
-            model_state['status'] = 'Error'
-            model_state['error'] = f"Model file not found at: {model_path}"
-            print(f"x {model_state['error']}")
-            return
+    if not loaded_object:
+        raise RuntimeError("Unexpected error: model file is empty")
 
-        loaded_object = None
+    # Extract components
+    if isinstance(loaded_object, dict):
+        model = loaded_object.get('model')
+        scaler = loaded_object.get('scaler')
+        feature_names = loaded_object.get('feature_names')
+        performance = loaded_object.get('performance')
+    else:
+        model, scaler, feature_names, performance = loaded_object, None, None, None
 
-        # Try Joblib (Primary method for scikit-learn KNN models)
+    # Flatten supported estimators into NumPy arrays; None means score with sklearn
+    compiled = None
+    if Config.COMPILE_RUNNERS_MODEL:
         try:
-            loaded_object = joblib.load(model_path)
+            compiled = compile_runners_model(model, scaler)
         except Exception as e:
-            model_state['status'] = 'Error'
-            model_state['error'] = f"Joblib load failed: {str(e)}"
-            print(f"x {model_state['error']}")
-            return
-
-        # Extract components
-        if loaded_object:
-            if isinstance(loaded_object, dict):
-                model_state['model'] = loaded_object.get('model')
-                model_state['scaler'] = loaded_object.get('scaler')
-                model_state['feature_names'] = loaded_object.get('feature_names')
-                model_state['performance'] = loaded_object.get('performance')
-            else:
-                model_state['model'] = loaded_object
-
-            model_state['status'] = 'Loaded'
-            model_state['error'] = ''
-
-        else:
-            model_state['status'] = 'Error'
-            model_state['error'] = f"Unexpected error"
-            print(f"x {model_state['error']}")
+            print(f"x Model compilation failed, falling back to scikit-learn: {str(e)}")
 
-    except Exception as e:
-        model_state['status'] = 'Error'
-        model_state['error'] = f"Unexpected error during loading: {str(e)}"
-        print(f"x {model_state['error']}")
+    attach_knn_index(compiled, model_path, checksum)
+
+    return ModelBundle(
+        version=f"{label}:{checksum[:12]}",
+        label=label,
+        path=model_path,
+        checksum=checksum,
+        model=model,
+        scaler=scaler,
+        feature_names=list(feature_names) if feature_names is not None else None,
+        performance=performance,
+        compiled=compiled,
+        loaded_at=time.time()
+    )
@@ -0,0 +1,283 @@
+import bisect
+import threading
+import time
+from functools import wraps
+from ..config import Config
+
+# Latency buckets (seconds) from 50 µs to 10 s
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# Rows per scored batch
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, labels, extra=None):
+    pairs = list(zip(labelnames, labels)) + (list(extra.items()) if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram; observe() is one bisect and three additions under a lock."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][position] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, *labels):
+        """Context manager observing the seconds spent in its block."""
+        return _Timer(self, labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            values = sorted((labels, ([*state[0]], state[1], state[2])) for labels, state in self._values.items())
+
+        for labels, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = {'le': _format_value(float(bound)) if bound != float('inf') else '+Inf'}
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {count}')
+        return lines
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+        return False
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_TIMER = _NullTimer()
+
+
+def untimed(stage):
+    """Timer factory for scoring that stays out of the serving inference metrics (shadow, offline)."""
+    return NULL_TIMER
+
+
+class MetricsRegistry:
+    """
+    Process-wide metrics rendered in the Prometheus text format.
+
+    Hot-path metrics (counters, histograms) are updated in place; state that other components already
+    track (cache, micro-batcher, pool, model registry) is read by collectors only when /metrics is scraped.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """
+        Registers a function called at scrape time returning a list of
+        (name, type, help, [(labels dict, value), ...]) families.
+        """
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+
+        for collector in self._collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                # One broken collector must not hide the other metrics
+                lines.append(f'# collector error: {_escape(e)}')
+                continue
+
+            for name, kind, documentation, samples in families:
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    lines.append(f'{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry(Config.METRICS_ENABLED)
+
+PREDICTION_STAGE_SECONDS = metrics.histogram(
+    'rips_prediction_stage_seconds',
+    'Seconds spent in each stage of a prediction request.',
+    ['endpoint', 'stage']
+)
+PREDICTION_REQUEST_SECONDS = metrics.histogram(
+    'rips_prediction_request_seconds',
+    'Seconds from the start of a prediction request to its response.',
+    ['endpoint']
+)
+INFERENCE_STAGE_SECONDS = metrics.histogram(
+    'rips_inference_stage_seconds',
+    'Seconds spent scaling features and evaluating the model per scored batch (in this process).',
+    ['stage']
+)
+PREDICTION_BATCH_ROWS = metrics.histogram(
+    'rips_prediction_batch_rows',
+    'Rows per scored batch.',
+    ['endpoint'],
+    buckets=SIZE_BUCKETS
+)
+PREDICTION_REQUESTS = metrics.counter(
+    'rips_prediction_requests_total',
+    'Prediction requests by response status.',
+    ['endpoint', 'status']
+)
+PREDICTION_ROWS = metrics.counter(
+    'rips_prediction_rows_total',
+    'Rows scored by the model.',
+    ['endpoint']
+)
+PREDICTION_ERRORS = metrics.counter(
+    'rips_prediction_errors_total',
+    'Prediction errors by type (validation codes per field, model_unavailable, exception class).',
+    ['endpoint', 'type']
+)
+
+
+def stage(endpoint, name):
+    """Times one stage of a prediction request (a no-op when metrics are disabled)."""
+    if not metrics.enabled:
+        return NULL_TIMER
+    return PREDICTION_STAGE_SECONDS.time(endpoint, name)
+
+
+def inference_stage(name):
+    if not metrics.enabled:
+        return NULL_TIMER
+    return INFERENCE_STAGE_SECONDS.time(name)
+
+
+def record_batch(endpoint, n_rows):
+    if metrics.enabled and n_rows:
+        PREDICTION_BATCH_ROWS.observe(n_rows, endpoint)
+        PREDICTION_ROWS.inc(endpoint, amount=n_rows)
+
+
+def record_error(endpoint, error_type, amount=1):
+    if metrics.enabled:
+        PREDICTION_ERRORS.inc(endpoint, error_type, amount=amount)
+
+
+def record_row_errors(endpoint, row_errors):
+    """Counts the field errors of rejected rows by validation code."""
+    if not metrics.enabled or not row_errors:
+        return
+    codes = {}
+    for errors in row_errors.values():
+        for error in errors:
+            codes[error['code']] = codes.get(error['code'], 0) + 1
+    for code, amount in codes.items():
+        PREDICTION_ERRORS.inc(endpoint, f'validation:{code}', amount=amount)
+
+
+def instrumented(endpoint):
+    """Route decorator recording the request latency and response status of a prediction endpoint."""
+    def wrap(f):
+        @wraps(f)
+        def decorator(*args, **kwargs):
+            if not metrics.enabled:
+                return f(*args, **kwargs)
+
+            started = time.perf_counter()
+            status = 500
+            try:
+                result = f(*args, **kwargs)
+                status = result[1] if isinstance(result, tuple) else getattr(result, 'status_code', 200)
+                return result
+            except Exception as e:
+                # abort() / first_or_404() carry their own status
+                status = getattr(e, 'code', None) or 500
+                raise
+            finally:
+                # Streamed responses are counted when their body starts, not when it ends
+                PREDICTION_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint)
+                PREDICTION_REQUESTS.inc(endpoint, str(status))
+
+        return decorator
+
+    return wrap
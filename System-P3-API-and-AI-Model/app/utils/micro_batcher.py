@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+
+# Upper bounds of the batch-size histogram buckets (the last bucket is open-ended)
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128]
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row scoring calls into one vectorized model call.
+
+    Request threads enqueue a feature row with the model bundle they resolved and block
+    on a Future. A background thread collects rows for up to `window_ms` (or until
+    `max_batch_size` rows are waiting), scores them with `score_fn(matrix, bundle)`,
+    one call per bundle, and fans the results back out.
+    """
+
+    def __init__(self, score_fn, window_ms=5.0, max_batch_size=32):
+        self.score_fn = score_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, int(max_batch_size))
+
+        self._condition = threading.Condition()
+        self._pending = []
+        self._worker = None
+        self._worker_pid = None
+
+        self._metrics = {
+            'requests': 0,
+            'rows': 0,
+            'batches': 0,
+            'errors': 0,
+            'max_queue_depth': 0,
+            'total_wait_seconds': 0.0,
+            'batch_size_histogram': [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        }
+
+    def _ensure_worker(self):
+        # The worker thread does not survive a fork, so start one per process on first use
+        if self._worker is not None and self._worker.is_alive() and self._worker_pid == os.getpid():
+            return
+
+        self._worker_pid = os.getpid()
+        self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, feature_row, bundle):
+        """Queues one feature row and returns a Future resolving to (risk_level, probabilities)."""
+        future = Future()
+
+        with self._condition:
+            self._ensure_worker()
+            self._pending.append((np.asarray(feature_row, dtype=float), bundle, future, time.perf_counter()))
+            self._metrics['requests'] += 1
+            self._metrics['max_queue_depth'] = max(self._metrics['max_queue_depth'], len(self._pending))
+            self._condition.notify()
+
+        return future
+
+    def score(self, feature_row, bundle, timeout=None):
+        """Blocking helper: queues one row and waits for its result."""
+        return self.submit(feature_row, bundle).result(timeout=timeout)
+
+    def _take_batch(self):
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+
+            # Hold the window open from the first queued row, unless the batch fills up early
+            deadline = self._pending[0][3] + self.window
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            started = time.perf_counter()
+
+            # Rows queued around a model swap may reference different bundles
+            groups = {}
+            for item in batch:
+                groups.setdefault(id(item[1]), []).append(item)
+
+            for group in groups.values():
+                self._score_group(group)
+
+            self._record_batch(batch, started)
+
+    def _score_group(self, group):
+        try:
+            feature_matrix = np.vstack([row for row, _, _, _ in group])
+            risk_levels, probabilities = self.score_fn(feature_matrix, group[0][1])
+
+            for i, (_, _, future, _) in enumerate(group):
+                row_probabilities = probabilities[i] if probabilities is not None else None
+                future.set_result((risk_levels[i], row_probabilities))
+
+        except Exception as e:
+            with self._condition:
+                self._metrics['errors'] += 1
+            for _, _, future, _ in group:
+                if not future.done():
+                    future.set_exception(e)
+
+    def _record_batch(self, batch, started):
+        bucket = len(BATCH_SIZE_BUCKETS)
+        for i, upper in enumerate(BATCH_SIZE_BUCKETS):
+            if len(batch) <= upper:
+                bucket = i
+                break
+
+        with self._condition:
+            self._metrics['batches'] += 1
+            self._metrics['rows'] += len(batch)
+            self._metrics['batch_size_histogram'][bucket] += 1
+            self._metrics['total_wait_seconds'] += sum(started - queued_at for _, _, _, queued_at in batch)
+
+    def get_metrics(self):
+        """Returns a snapshot of queue depth and batch-size metrics."""
+        with self._condition:
+            metrics = dict(self._metrics)
+            metrics['batch_size_histogram'] = list(self._metrics['batch_size_histogram'])
+            queue_depth = len(self._pending)
+
+        rows = metrics['rows']
+        batches = metrics['batches']
+        labels = [f'<={upper}' for upper in BATCH_SIZE_BUCKETS] + [f'>{BATCH_SIZE_BUCKETS[-1]}']
+
+        return {
+            'window_ms': self.window * 1000.0,
+            'max_batch_size': self.max_batch_size,
+            'queue_depth': queue_depth,
+            'max_queue_depth': metrics['max_queue_depth'],
+            'requests': metrics['requests'],
+            'rows_scored': rows,
+            'batches': batches,
+            'errors': metrics['errors'],
+            'avg_batch_size': round(rows / batches, 3) if batches else 0.0,
+            'avg_queue_wait_ms': round(metrics['total_wait_seconds'] * 1000.0 / rows, 3) if rows else 0.0,
+            'batch_size_histogram': dict(zip(labels, metrics['batch_size_histogram']))
+        }
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import struct
+import time
+import numpy as np
+from .compile_runners_model import compile_runners_model, CompiledModel
+
+# Compact layout (model artifacts and KNN indexes):
+#   8-byte magic | little-endian uint64 header length | JSON header (space padded) | payload
+# The payload holds raw NumPy arrays, each starting on an ALIGNMENT boundary,
+# so the whole file can be memory-mapped and the arrays used in place without unpickling anything.
+ARTIFACT_MAGIC = b'RIPSMDL\x00'
+ARTIFACT_FORMAT_VERSION = 1
+ARTIFACT_SUFFIX = '.rmodel'
+ALIGNMENT = 64
+
+_PREAMBLE = struct.Struct('<8sQ')
+
+
+def compact_path_for(model_path):
+    """Returns the compact artifact path that sits next to a pickled model."""
+    return os.path.splitext(model_path)[0] + ARTIFACT_SUFFIX
+
+
+def _aligned(n):
+    return -(-n // ALIGNMENT) * ALIGNMENT
+
+
+def _json_value(value):
+    # Performance metrics may hold NumPy scalars/arrays
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def export_compact_artifact(model_path, output_path=None):
+    """
+    Converts a pickled model dict (model, scaler, feature_names, performance) into the compact format.
+    Raises ValueError if the estimator cannot be compiled. Returns the header that was written.
+    """
+    import joblib
+    from .load_runners_model import compute_checksum
+
+    output_path = output_path or compact_path_for(model_path)
+
+    loaded_object = joblib.load(model_path)
+    if isinstance(loaded_object, dict):
+        model = loaded_object.get('model')
+        scaler = loaded_object.get('scaler')
+        feature_names = loaded_object.get('feature_names')
+        performance = loaded_object.get('performance')
+    else:
+        model, scaler, feature_names, performance = loaded_object, None, None, None
+
+    compiled = compile_runners_model(model, scaler)
+    if compiled is None:
+        raise ValueError(f"{type(model).__name__} cannot be exported to the compact format")
+
+    spec, arrays = compiled.to_arrays()
+
+    # Size and mtime let loaders see that the pickle is unchanged without hashing it
+    stat = os.stat(model_path)
+    header = {
+        'kind': 'model',
+        'source': {
+            'filename': os.path.basename(model_path),
+            'sha256': compute_checksum(model_path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns
+        },
+        'feature_names': list(feature_names) if feature_names is not None else None,
+        'performance': performance,
+        'model': spec
+    }
+    return write_array_container(output_path, header, arrays)
+
+
+def write_array_container(path, header, arrays):
+    """
+    Writes named arrays plus a JSON-serializable header in the compact layout (atomically).
+    Adds format_version, created_at, the array table and the payload checksum to the header and returns it.
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+    array_entries = {}
+    offset = 0
+    for name, array in arrays.items():
+        if array.dtype.hasobject:
+            raise ValueError(f"Array '{name}' has dtype object and cannot be stored")
+        array_entries[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset, 'nbytes': array.nbytes}
+        offset = _aligned(offset + array.nbytes)
+
+    payload = bytearray(offset)
+    for name, array in arrays.items():
+        entry = array_entries[name]
+        payload[entry['offset']:entry['offset'] + entry['nbytes']] = array.tobytes()
+
+    header = {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'created_at': time.time(),
+        **header,
+        'arrays': array_entries,
+        'payload_sha256': hashlib.sha256(payload).hexdigest()
+    }
+
+    header_bytes = json.dumps(header, default=_json_value).encode('utf-8')
+    # Pad the header so the payload starts on an aligned offset
+    header_bytes += b' ' * (_aligned(_PREAMBLE.size + len(header_bytes)) - _PREAMBLE.size - len(header_bytes))
+
+    # Write then rename so a loading worker never sees a half-written file
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(ARTIFACT_MAGIC, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+    return header
+
+
+def read_artifact_header(path):
+    """Returns (header, payload offset) of a file in the compact layout. Raises ValueError if it is not one."""
+    with open(path, 'rb') as f:
+        preamble = f.read(_PREAMBLE.size)
+        if len(preamble) != _PREAMBLE.size:
+            raise ValueError("File is too short to be a compact artifact")
+
+        magic, header_length = _PREAMBLE.unpack(preamble)
+        if magic != ARTIFACT_MAGIC:
+            raise ValueError("File is not a compact artifact")
+
+        header = json.loads(f.read(header_length).decode('utf-8'))
+
+    if header.get('format_version') != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported compact artifact format version: {header.get('format_version')}")
+
+    return header, _PREAMBLE.size + header_length
+
+
+def read_array_container(path, mmap_mode='r'):
+    """
+    Reads a file in the compact layout and verifies its payload checksum.
+    Returns (header, arrays); with mmap_mode the arrays are read-only views of the file.
+    """
+    header, payload_offset = read_artifact_header(path)
+
+    if mmap_mode and os.path.getsize(path) > payload_offset:
+        payload = np.memmap(path, dtype=np.uint8, mode='r', offset=payload_offset)
+    else:
+        with open(path, 'rb') as f:
+            f.seek(payload_offset)
+            payload = np.frombuffer(f.read(), dtype=np.uint8)
+
+    if hashlib.sha256(payload).hexdigest() != header['payload_sha256']:
+        raise ValueError("Checksum mismatch: the file is corrupted or was modified")
+
+    arrays = {}
+    for name, entry in header['arrays'].items():
+        arrays[name] = np.ndarray(
+            tuple(entry['shape']),
+            dtype=np.dtype(entry['dtype']),
+            buffer=payload,
+            offset=entry['offset']
+        )
+
+    return header, arrays
+
+
+def read_compact_artifact(path, mmap_mode='r'):
+    """Reads a compact model artifact. Returns (header, compiled model)."""
+    header, arrays = read_array_container(path, mmap_mode=mmap_mode)
+    if header.get('kind', 'model') != 'model':
+        raise ValueError(f"{os.path.basename(path)} is not a model artifact")
+
+    return header, CompiledModel.from_arrays(header['model'], arrays)
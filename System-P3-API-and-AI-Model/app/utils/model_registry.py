@@ -0,0 +1,240 @@
+import os
+import re
+import signal
+import threading
+import time
+from ..config import Config
+from .load_runners_model import load_runners_model
+from .model_artifact import ARTIFACT_SUFFIX, compact_path_for
+from .metrics import metrics
+from .predict_runners_model import warm_up_bundle
+
+MODEL_BASE_NAME = 'runners_injury_prediction_model'
+
+# Name of the pointer file holding the active version label, shared by all workers on the host
+ACTIVE_POINTER_NAME = 'ACTIVE_MODEL'
+
+VERSION_LABEL_PATTERN = re.compile(r'^[A-Za-z0-9_.-]+$')
+
+
+class ModelRegistry:
+    """
+    Versioned model artifacts stored under ai_classification_models/.
+
+    `runners_injury_prediction_model.pkl` is the 'default' version and
+    `runners_injury_prediction_model-<label>.pkl` holds any other version.
+    Either may come with (or be replaced by) a compact `.rmodel` export of the same name.
+    The active label is kept in the ACTIVE_MODEL pointer file so every
+    gunicorn worker on the host converges on the same version.
+    """
+
+    def __init__(self, models_dir):
+        self.models_dir = models_dir
+        self.status = 'Not Loaded'
+        self.error = 'Model loading has not been attempted yet.'
+
+        self._bundle = None
+        self._swap_lock = threading.Lock()
+        self._reload_lock = threading.RLock()
+        self._watcher = None
+        self._watcher_pid = None
+        self._watched_mtimes = None
+        self._listeners = []
+
+    # --- Artifacts ---
+
+    @property
+    def pointer_path(self):
+        return os.path.join(self.models_dir, ACTIVE_POINTER_NAME)
+
+    def artifact_path(self, label):
+        if label == 'default':
+            return os.path.join(self.models_dir, f'{MODEL_BASE_NAME}.pkl')
+        return os.path.join(self.models_dir, f'{MODEL_BASE_NAME}-{label}.pkl')
+
+    def has_artifact(self, label):
+        path = self.artifact_path(label)
+        return os.path.exists(path) or os.path.exists(compact_path_for(path))
+
+    def list_versions(self):
+        """Returns the version labels available on disk."""
+        labels = []
+        for filename in sorted(os.listdir(self.models_dir)):
+            stem, suffix = os.path.splitext(filename)
+            if suffix not in ('.pkl', ARTIFACT_SUFFIX):
+                continue
+
+            if stem == MODEL_BASE_NAME:
+                label = 'default'
+            elif stem.startswith(f'{MODEL_BASE_NAME}-'):
+                label = stem[len(MODEL_BASE_NAME) + 1:]
+            else:
+                continue
+
+            if label not in labels:
+                labels.append(label)
+        return labels
+
+    def active_label(self):
+        """Reads the active version label from the pointer file ('default' if there is none)."""
+        try:
+            with open(self.pointer_path) as f:
+                label = f.read().strip()
+        except FileNotFoundError:
+            return 'default'
+        return label or 'default'
+
+    def _write_active_label(self, label):
+        # Write then rename so other workers never read a half-written pointer
+        tmp_path = f'{self.pointer_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(label)
+        os.replace(tmp_path, self.pointer_path)
+
+    # --- Loading and swapping ---
+
+    def current(self):
+        """Returns the active ModelBundle, or None if no model is loaded."""
+        return self._bundle
+
+    def ensure_loaded(self):
+        """Returns the active bundle, loading it first if nothing is loaded yet."""
+        bundle = self._bundle
+        if bundle is not None:
+            return bundle
+
+        with self._reload_lock:
+            # Another thread may have finished loading while we waited
+            if self._bundle is not None:
+                return self._bundle
+            return self.reload()
+
+    def start_background_load(self):
+        """Loads and warms up the active version off the calling thread (no-op once loaded)."""
+        if self._bundle is not None:
+            return None
+
+        thread = threading.Thread(target=self.ensure_loaded, name='model-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def add_listener(self, callback):
+        """Registers callback(old_bundle, new_bundle), called after every swap."""
+        self._listeners.append(callback)
+
+    def reload(self, label=None):
+        """
+        Loads a version (the pointer file's label by default) and swaps it in.
+        Returns the active bundle; on failure the previous bundle stays active.
+        """
+        with self._reload_lock:
+            label = label or self.active_label()
+            # Record what we are reacting to, so a broken artifact is not retried on every watcher tick
+            self._watched_mtimes = self._current_mtimes()
+
+            if not VERSION_LABEL_PATTERN.match(label):
+                self._record_error(f"Invalid model version label: {label}")
+                return self._bundle
+
+            if self._bundle is None:
+                self.status = 'Loading'
+
+            try:
+                bundle = load_runners_model(self.artifact_path(label), label=label)
+                # Only warmed-up bundles are swapped in, so readiness implies a primed model
+                warm_up_bundle(bundle, Config.MODEL_WARMUP_ROWS)
+            except Exception as e:
+                self._record_error(str(e))
+                return self._bundle
+
+            with self._swap_lock:
+                old_bundle = self._bundle
+                self._bundle = bundle
+                self.status = 'Loaded'
+                self.error = ''
+
+            for callback in self._listeners:
+                try:
+                    callback(old_bundle, bundle)
+                except Exception as e:
+                    print(f"x Model swap listener failed: {str(e)}")
+
+            return bundle
+
+    def reload_async(self, label=None):
+        """Loads a version on a background thread; requests keep using the current bundle meanwhile."""
+        thread = threading.Thread(target=self.reload, args=(label,), name='model-reload', daemon=True)
+        thread.start()
+        return thread
+
+    def activate(self, label):
+        """Points every worker at `label` and starts loading it in this process."""
+        if not VERSION_LABEL_PATTERN.match(label) or not self.has_artifact(label):
+            raise ValueError(f"Unknown model version: {label}")
+
+        self._write_active_label(label)
+        return self.reload_async(label)
+
+    def _record_error(self, message):
+        # Keep serving the previous bundle if there is one
+        if self._bundle is None:
+            self.status = 'Error'
+        self.error = message
+        print(f"x {message}")
+
+    def collect_metrics(self):
+        """/metrics families: the model version in use by this process and when it was loaded."""
+        bundle = self._bundle
+        return [
+            ('rips_model_info', 'gauge', 'Model version in use (value is always 1).',
+             [({'version': bundle.version, 'label': bundle.label}, 1)] if bundle is not None else []),
+            ('rips_model_loaded', 'gauge', 'Whether a model is loaded (1) or not (0).', [({}, int(bundle is not None))]),
+            ('rips_model_loaded_timestamp_seconds', 'gauge', 'Unix time the model in use was loaded.',
+             [({}, bundle.loaded_at if bundle is not None else None)])
+        ]
+
+    # --- Reload triggers ---
+
+    def _current_mtimes(self):
+        mtimes = []
+        artifact_path = self.artifact_path(self.active_label())
+        for path in (self.pointer_path, artifact_path, compact_path_for(artifact_path)):
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def _watch(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                # Nothing to refresh until the first load (lazy mode loads on first use)
+                if self._bundle is not None and self._current_mtimes() != self._watched_mtimes:
+                    self.reload()
+            except Exception as e:
+                print(f"x Model watcher error: {str(e)}")
+
+    def start_watcher(self, interval):
+        """Polls the pointer file and active artifact mtimes and reloads on change (one thread per process)."""
+        if interval <= 0:
+            return
+
+        if self._watcher is not None and self._watcher.is_alive() and self._watcher_pid == os.getpid():
+            return
+
+        self._watcher_pid = os.getpid()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name='model-watcher', daemon=True)
+        self._watcher.start()
+
+    def install_signal_handler(self):
+        """Reloads the active version in the background on SIGHUP. Only possible from the main thread."""
+        if not hasattr(signal, 'SIGHUP') or threading.current_thread() is not threading.main_thread():
+            return False
+
+        signal.signal(signal.SIGHUP, lambda signum, frame: self.reload_async())
+        return True
+
+
+model_registry = ModelRegistry(os.path.dirname(Config.MODEL_PATH))
+metrics.add_collector(model_registry.collect_metrics)
@@ -0,0 +1,80 @@
+import json
+from .feature_schema import field_error
+
+# Bytes read from the request body per call
+READ_BLOCK_SIZE = 65536
+
+
+def iter_lines(stream, max_line_bytes, block_size=READ_BLOCK_SIZE):
+    """
+    Yields the lines of a binary stream without their newline, reading it in blocks
+    (readline on a raw WSGI input stream reads one byte per call).
+    Lines longer than max_line_bytes are discarded as they are read and yielded as None.
+    """
+    pending = b''
+    oversized = False
+
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+
+        pending += block
+        start = 0
+        while True:
+            end = pending.find(b'\n', start)
+            if end < 0:
+                break
+            if oversized or end - start > max_line_bytes:
+                yield None
+            else:
+                yield pending[start:end]
+            oversized = False
+            start = end + 1
+
+        pending = pending[start:]
+        # Do not keep more than one line's worth of an oversized line
+        if len(pending) > max_line_bytes:
+            pending = b''
+            oversized = True
+
+    if oversized or len(pending) > max_line_bytes:
+        yield None
+    elif pending:
+        yield pending
+
+
+def iter_ndjson_chunks(stream, chunk_rows, max_line_bytes):
+    """
+    Reads newline-delimited JSON from a binary stream and yields (first_row_index, records, line_errors)
+    every chunk_rows records, so only one chunk is ever held in memory.
+
+    Blank lines are skipped. A line that is not valid JSON, or longer than max_line_bytes, still takes
+    its row index; its record is None and line_errors maps its position in the chunk to the error list.
+    """
+    first_row_index = 0
+    records = []
+    line_errors = {}
+
+    for line in iter_lines(stream, max_line_bytes):
+        if line is None:
+            line_errors[len(records)] = [
+                field_error(None, 'line_too_long', f'Line exceeds the maximum of {max_line_bytes} bytes.')
+            ]
+            records.append(None)
+        elif line.strip():
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                line_errors[len(records)] = [field_error(None, 'invalid_json', 'Line is not valid JSON.')]
+                records.append(None)
+        else:
+            continue
+
+        if len(records) >= chunk_rows:
+            yield first_row_index, records, line_errors
+            first_row_index += len(records)
+            records, line_errors = [], {}
+
+    if records:
+        yield first_row_index, records, line_errors
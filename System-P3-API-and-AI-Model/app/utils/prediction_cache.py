@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of model outputs keyed on (model version, quantized feature vector).
+
+    Only the model output (risk level and probabilities) is cached; alerts are still
+    generated from the exact request values, since their thresholds are not quantized.
+    """
+
+    def __init__(self, feature_precision, max_entries=10000, ttl_seconds=300.0):
+        self.feature_precision = dict(feature_precision)
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl_seconds)
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._scales = {}
+        self._metrics = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def _scale_for(self, feature_names):
+        key = tuple(feature_names)
+        scale = self._scales.get(key)
+        if scale is None:
+            # Features without a configured precision are kept to 6 decimals
+            scale = np.array([10.0 ** self.feature_precision.get(f, 6) for f in feature_names])
+            self._scales[key] = scale
+        return scale
+
+    def make_key(self, model_version, feature_row, feature_names):
+        """Quantizes a feature row to sensor precision and combines it with the model version."""
+        quantized = np.rint(np.asarray(feature_row, dtype=float) * self._scale_for(feature_names)).astype(np.int64)
+        return model_version, quantized.tobytes()
+
+    def get(self, key):
+        """Returns the cached value, or None on a miss or an expired entry."""
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self._metrics['misses'] += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self._metrics['expirations'] += 1
+                self._metrics['misses'] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._metrics['hits'] += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._metrics['evictions'] += 1
+
+    def clear(self):
+        """Drops every entry, e.g. after a model swap."""
+        with self._lock:
+            self._entries.clear()
+            self._metrics['invalidations'] += 1
+
+    def get_metrics(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+            size = len(self._entries)
+
+        lookups = metrics['hits'] + metrics['misses']
+        return {
+            'size': size,
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl,
+            'hit_rate': round(metrics['hits'] / lookups, 4) if lookups else 0.0,
+            **metrics
+        }
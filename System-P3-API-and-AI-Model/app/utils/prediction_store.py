@@ -0,0 +1,114 @@
+from datetime import date, datetime, timezone
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+from ..config import db
+from ..models.prediction import Prediction
+from ..models.sensor_data import SensorData
+from .session_scoring import sample_order
+
+
+def load_stored_predictions(session_id, model_version):
+    """
+    Reads the session's non-deleted samples with any prediction already stored for model_version,
+    in one query on the (session_id, model_version) index.
+    Returns (sensor_data_ids, recorded_at, stored) in sample order, where stored[i] is
+    (risk_level, probabilities) or None if the sample has not been scored by this version.
+    """
+    samples = SensorData.__table__
+    predictions = Prediction.__table__
+
+    query = (
+        db.select(samples.c.id, samples.c.recorded_at, predictions.c.risk_level, predictions.c.probabilities)
+        .select_from(samples.outerjoin(
+            predictions,
+            (predictions.c.sensor_data_id == samples.c.id) & (predictions.c.model_version == model_version)
+        ))
+        .where(samples.c.session_id == session_id, samples.c.deleted_on.is_(None))
+        .order_by(samples.c.id)
+    )
+    rows = db.session.execute(query).all()
+
+    sensor_data_ids = np.array([row.id for row in rows], dtype=np.int64)
+    recorded_at = [row.recorded_at for row in rows]
+    stored = [(row.risk_level, row.probabilities) if row.risk_level is not None else None for row in rows]
+
+    order = sample_order(recorded_at)
+    if order is not None:
+        sensor_data_ids = sensor_data_ids[order]
+        recorded_at = [recorded_at[i] for i in order]
+        stored = [stored[i] for i in order]
+
+    return sensor_data_ids, recorded_at, stored
+
+
+def store_predictions(session_id, sensor_data_ids, risk_levels, probabilities, model_version, created_by, batch_size=500):
+    """
+    Inserts one prediction row per scored sample with multi-row INSERTs of batch_size rows, in one transaction.
+    Returns the number of rows stored (0 if another request stored the same samples first).
+    """
+    predicted_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    today = date.today()
+
+    rows = [
+        {
+            'sensor_data_id': int(sensor_data_id),
+            'session_id': session_id,
+            'model_version': model_version,
+            'risk_level': int(risk_levels[k]),
+            'probabilities': [float(p) for p in probabilities[k]] if probabilities is not None else None,
+            'predicted_at': predicted_at,
+            'created_on': today,
+            'created_by': created_by
+        }
+        for k, sensor_data_id in enumerate(sensor_data_ids)
+    ]
+
+    try:
+        for start in range(0, len(rows), max(1, batch_size)):
+            db.session.execute(db.insert(Prediction.__table__), rows[start:start + batch_size])
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent view of the same session won the race; its rows hold the same model output
+        db.session.rollback()
+        return 0
+
+    return len(rows)
+
+
+def load_prediction_history(session_id, model_version=None):
+    """
+    Stored predictions of a session's non-deleted samples (optionally for one model version), in one query.
+    Returns rows of (sensor_data_id, recorded_at, model_version, risk_level, probabilities, predicted_at)
+    in sample order, oldest prediction first for each sample.
+    """
+    samples = SensorData.__table__
+    predictions = Prediction.__table__
+
+    query = (
+        db.select(
+            predictions.c.sensor_data_id,
+            samples.c.recorded_at,
+            predictions.c.model_version,
+            predictions.c.risk_level,
+            predictions.c.probabilities,
+            predictions.c.predicted_at
+        )
+        .select_from(predictions.join(samples, predictions.c.sensor_data_id == samples.c.id))
+        .where(predictions.c.session_id == session_id, samples.c.deleted_on.is_(None))
+        .order_by(predictions.c.sensor_data_id, predictions.c.predicted_at, predictions.c.id)
+    )
+    if model_version:
+        query = query.where(predictions.c.model_version == model_version)
+
+    rows = db.session.execute(query).all()
+
+    # Samples ordered by device timestamp when every one has it, like the session scoring
+    if rows and all(row.recorded_at is not None for row in rows):
+        rows.sort(key=lambda row: row.recorded_at)
+
+    return rows
+
+
+def delete_stored_predictions(sensor_data_id):
+    """Drops every stored prediction of a sample (its features changed). The caller commits."""
+    db.session.execute(db.delete(Prediction.__table__).where(Prediction.__table__.c.sensor_data_id == sensor_data_id))
@@ -0,0 +1,206 @@
+import itertools
+import os
+import time
+from datetime import datetime, timezone
+import joblib
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, precision_recall_fscore_support
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import StandardScaler
+from ..config import db
+from ..models.sensor_data import SensorData
+from .predict_runners_model import DEFAULT_FEATURE_NAMES, RISK_LABELS
+
+# Shuffling of the folds and seed of the random forests, so a retrain on the same rows is reproducible
+RANDOM_STATE = 42
+
+# Candidate estimators and their hyperparameter grids
+SEARCH_SPACES = {
+    'knn': (
+        KNeighborsClassifier,
+        {'n_neighbors': [3, 5, 7, 11, 15, 21], 'weights': ['uniform', 'distance']}
+    ),
+    'random_forest': (
+        RandomForestClassifier,
+        {'n_estimators': [100, 300], 'max_depth': [None, 8, 16], 'min_samples_leaf': [1, 5],
+         'random_state': [RANDOM_STATE], 'n_jobs': [1]}
+    )
+}
+
+# Candidates kept in the artifact's performance summary, best first
+SUMMARY_CANDIDATES = 10
+
+
+def load_training_data(feature_names=None, chunk_rows=10000):
+    """
+    Reads every labeled, non-deleted sensor reading into (X, y).
+
+    The rows are counted first so X and y are allocated once; the readings are then streamed in
+    partitions of chunk_rows and copied into place, so memory holds the matrix plus one partition.
+    Readings labeled while the stream runs (ids above the counted maximum) are left for the next run.
+    """
+    feature_names = list(feature_names or DEFAULT_FEATURE_NAMES)
+    columns = [getattr(SensorData, name) for name in feature_names]
+    labeled = (SensorData.deleted_on.is_(None), SensorData.risk_label.isnot(None))
+
+    with db.engine.connect() as connection:
+        n_rows, max_id = connection.execute(
+            db.select(db.func.count(), db.func.max(SensorData.id)).where(*labeled)
+        ).one()
+
+        X = np.empty((n_rows, len(feature_names)), dtype=np.float64)
+        y = np.empty(n_rows, dtype=np.int64)
+        if not n_rows:
+            return X, y
+
+        query = db.select(*columns, SensorData.risk_label).where(*labeled, SensorData.id <= max_id).order_by(SensorData.id)
+        filled = 0
+        for partition in connection.execution_options(yield_per=chunk_rows).execute(query).partitions():
+            block = np.array(partition, dtype=np.float64)
+            # Rows unlabeled since the count leave the tail unused
+            take = min(len(block), n_rows - filled)
+            X[filled:filled + take] = block[:take, :-1]
+            y[filled:filled + take] = block[:take, -1]
+            filled += take
+
+    return X[:filled], y[:filled]
+
+
+def _scale(X, mean, scale):
+    return (X - mean) / scale
+
+
+def _fit_and_score(estimator_class, params, X, y, train, test, mean, scale):
+    started = time.perf_counter()
+    model = estimator_class(**params).fit(_scale(X[train], mean, scale), y[train])
+    predicted = model.predict(_scale(X[test], mean, scale))
+
+    precision, recall, f1_score, _ = precision_recall_fscore_support(y[test], predicted, average='weighted', zero_division=0)
+    return {
+        'accuracy': accuracy_score(y[test], predicted),
+        'precision': precision,
+        'recall': recall,
+        'f1_score': f1_score,
+        'seconds': time.perf_counter() - started
+    }
+
+
+def search_hyperparameters(X, y, models=None, folds=5, jobs=1, echo=None):
+    """
+    Cross-validates every candidate of the SEARCH_SPACES of `models` and returns them best first.
+
+    The stratified folds, and the StandardScaler statistics of each fold's training part, are computed
+    once and shared by every candidate of every model, so all candidates are compared on the same
+    splits and no fit re-derives them. The (candidate, fold) fits run across `jobs` processes; joblib
+    memory-maps X and y into the workers instead of pickling them for every fit.
+    """
+    models = list(models or SEARCH_SPACES)
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=RANDOM_STATE).split(X, y))
+    fold_scalers = [StandardScaler().fit(X[train]) for train, _ in splits]
+
+    candidates = [
+        (name, SEARCH_SPACES[name][0], params)
+        for name in models
+        for params in ParameterGrid(SEARCH_SPACES[name][1])
+    ]
+    if echo:
+        echo(f"Cross-validating {len(candidates)} candidates on {folds} folds ({len(candidates) * folds} fits, {jobs} jobs)")
+
+    fits = Parallel(n_jobs=jobs)(
+        delayed(_fit_and_score)(estimator_class, params, X, y, train, test, scaler.mean_, scaler.scale_)
+        for (_, estimator_class, params), ((train, test), scaler) in itertools.product(candidates, zip(splits, fold_scalers))
+    )
+
+    results = []
+    for i, (name, estimator_class, params) in enumerate(candidates):
+        scores = fits[i * folds:(i + 1) * folds]
+        result = {
+            'model': name,
+            'estimator': estimator_class.__name__,
+            'params': {key: value for key, value in params.items() if key not in ('random_state', 'n_jobs')},
+            'fit_params': params,
+            'fit_seconds': round(sum(score['seconds'] for score in scores), 3)
+        }
+        for metric in ('accuracy', 'precision', 'recall', 'f1_score'):
+            values = [score[metric] for score in scores]
+            result[metric] = float(np.mean(values))
+            result[f'{metric}_std'] = float(np.std(values))
+        results.append(result)
+
+    # Ties go to the cheaper candidate
+    results.sort(key=lambda result: (-result['f1_score'], result['fit_seconds']))
+    return results
+
+
+def retrain_runners_model(output_path, models=None, folds=5, jobs=1, chunk_rows=10000, min_rows=100, echo=None):
+    """
+    Retrains the injury model on the labeled sensor readings and writes it to output_path.
+
+    The artifact is the dict load_runners_model reads: model, scaler, feature_names and performance
+    (cross-validated weighted metrics of the winning candidate, plus how it was selected).
+    Returns the performance dict. Raises ValueError when there is not enough labeled data.
+    """
+    if os.path.exists(output_path):
+        raise ValueError(f'{output_path} already exists')
+
+    feature_names = list(DEFAULT_FEATURE_NAMES)
+    started = time.perf_counter()
+    X, y = load_training_data(feature_names, chunk_rows)
+    if echo:
+        echo(f"Loaded {len(y)} labeled readings in {time.perf_counter() - started:.1f}s")
+
+    if len(y) < min_rows:
+        raise ValueError(f'{len(y)} labeled readings, at least {min_rows} are needed')
+
+    labels, counts = np.unique(y, return_counts=True)
+    class_counts = {RISK_LABELS.get(int(label), str(label)): int(count) for label, count in zip(labels, counts)}
+    if len(labels) < 2:
+        raise ValueError(f'Only one risk label in the labeled readings: {class_counts}')
+    if counts.min() < folds:
+        raise ValueError(f'Every risk label needs at least {folds} readings for {folds}-fold cross-validation: {class_counts}')
+
+    search_started = time.perf_counter()
+    results = search_hyperparameters(X, y, models, folds, jobs, echo)
+    search_seconds = time.perf_counter() - search_started
+    best = results[0]
+
+    # Refit the winner on every labeled reading
+    scaler = StandardScaler().fit(X)
+    estimator_class = SEARCH_SPACES[best['model']][0]
+    model = estimator_class(**best['fit_params']).fit(scaler.transform(X), y)
+
+    performance = {
+        'accuracy': round(best['accuracy'], 3),
+        'precision': round(best['precision'], 3),
+        'recall': round(best['recall'], 3),
+        'f1_score': round(best['f1_score'], 3),
+        'f1_score_std': round(best['f1_score_std'], 3),
+        'evaluation': f'{folds}-fold stratified cross-validation, weighted averages',
+        'estimator': best['estimator'],
+        'params': best['params'],
+        'training_rows': int(len(y)),
+        'class_counts': class_counts,
+        'search_seconds': round(search_seconds, 1),
+        'candidates': [
+            {'estimator': result['estimator'], 'params': result['params'], 'f1_score': round(result['f1_score'], 4),
+             'accuracy': round(result['accuracy'], 4), 'fit_seconds': result['fit_seconds']}
+            for result in results[:SUMMARY_CANDIDATES]
+        ],
+        'trained_at': datetime.now(timezone.utc).isoformat(timespec='seconds')
+    }
+
+    artifact = {'model': model, 'scaler': scaler, 'feature_names': feature_names, 'performance': performance}
+
+    # Write next to the target and rename, so a watcher never loads a half-written file
+    temp_path = f'{output_path}.tmp-{os.getpid()}'
+    try:
+        joblib.dump(artifact, temp_path)
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    return performance
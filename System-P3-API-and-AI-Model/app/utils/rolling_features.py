@@ -0,0 +1,339 @@
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+import numpy as np
+from ..config import Config, db
+from ..models.sensor_data import SensorData
+from ..models.session import Session
+
+# Window sums are recomputed from the buffer after this many updates so floating-point drift cannot build up
+RESUM_INTERVAL = 10000
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def window_name(kind, size):
+    return f'{size:g}s' if kind == 'seconds' else f'{size}_samples'
+
+
+class _Window:
+    """Running sums over the newest `count` samples of the session buffer."""
+
+    def __init__(self, kind, size, n_features):
+        self.kind = kind
+        self.size = size
+        self.reset(n_features)
+
+    def reset(self, n_features):
+        self.count = 0
+        self.sums = np.zeros(n_features)
+        self.squares = np.zeros(n_features)
+        self.time_values = np.zeros(n_features)
+        self.time_sum = 0.0
+        self.time_squares = 0.0
+        self.steps = 0.0
+
+    def add(self, t, values, steps, sign=1.0):
+        self.count += int(sign)
+        self.sums += sign * values
+        self.squares += sign * values * values
+        self.time_values += sign * t * values
+        self.time_sum += sign * t
+        self.time_squares += sign * t * t
+        self.steps += sign * steps
+
+    def is_full(self, newest_t, oldest_t):
+        if self.kind == 'seconds':
+            return newest_t - oldest_t > self.size
+        return self.count > self.size
+
+    def snapshot(self, features, buffer, shift):
+        n = self.count
+        result = {'samples': n, 'span_seconds': 0.0, 'step_count_delta': int(round(self.steps))}
+        if n:
+            result['span_seconds'] = round(buffer[-1][0] - buffer[-n][0], 3)
+
+        mean = self.sums / n if n else None
+        variance = None
+        slope = None
+        if n > 1:
+            variance = np.maximum((self.squares - self.sums * mean) / (n - 1), 0.0)
+            time_spread = n * self.time_squares - self.time_sum * self.time_sum
+            if time_spread > 0:
+                slope = (n * self.time_values - self.time_sum * self.sums) / time_spread
+
+        for j, field in enumerate(features):
+            result[field] = {
+                # Values were stored relative to the session's first reading
+                'mean': round(float(mean[j] + shift[j]), 4) if mean is not None else None,
+                'variance': round(float(variance[j]), 4) if variance is not None else None,
+                'slope_per_second': round(float(slope[j]), 6) if slope is not None else None
+            }
+        return result
+
+
+class SessionRollingState:
+    """
+    Rolling statistics of one session's readings, updated in O(1) per reading.
+
+    Each window keeps running sums (count, sum, sum of squares and the time products for a least-squares
+    slope) over the newest samples of one shared buffer, so adding a reading adds it to every window and
+    subtracts the readings that fall out. Times are seconds since the session's first reading and values
+    are relative to its first reading, which keeps the sums well conditioned.
+    """
+
+    def __init__(self, features, windows, ewma_alpha=0.2, sample_interval_seconds=1.0, max_buffer=10000):
+        self.features = list(features)
+        self.ewma_alpha = float(ewma_alpha)
+        self.sample_interval_seconds = float(sample_interval_seconds)
+        self.max_buffer = max(1, int(max_buffer))
+
+        self.windows = OrderedDict(
+            (window_name(kind, size), _Window(kind, size, len(self.features))) for kind, size in windows
+        )
+        # (t, shifted values, step delta) of the samples still inside the largest window
+        self.buffer = deque()
+        self.shift = None
+        self.origin = None
+        self.last_t = None
+        self.last_sensor_data_id = 0
+        # Session.readings_revision the state was built at
+        self.readings_revision = 0
+        self.last_step_count = None
+        self.steps_total = 0
+        self.ewma = None
+        self.samples = 0
+        self._updates_since_resum = 0
+
+    def _seconds(self, recorded_at):
+        """Seconds since the session's first reading; readings without recorded_at are one sample interval apart."""
+        if recorded_at is not None:
+            t = (recorded_at - _EPOCH).total_seconds()
+            if self.origin is None:
+                # Line the first device timestamp up with any readings seen before it
+                self.origin = t - (self.last_t + self.sample_interval_seconds if self.last_t is not None else 0.0)
+            # Readings are applied in ingest order; a late device timestamp cannot move time backwards
+            return max(t - self.origin, self.last_t if self.last_t is not None else 0.0)
+        if self.last_t is None:
+            return 0.0
+        return self.last_t + self.sample_interval_seconds
+
+    def update(self, sensor_data_id, recorded_at, values):
+        """Adds one reading ({field: value}, with step_count). Readings already applied are ignored."""
+        if sensor_data_id is not None:
+            if sensor_data_id <= self.last_sensor_data_id:
+                return False
+            self.last_sensor_data_id = sensor_data_id
+
+        t = self._seconds(recorded_at)
+        self.last_t = t
+        vector = np.array([float(values[field]) for field in self.features])
+
+        if self.shift is None:
+            self.shift = vector.copy()
+        shifted = vector - self.shift
+
+        # step_count is a cumulative device counter; a drop means the counter was reset
+        step_count = values.get('step_count')
+        steps = 0.0
+        if step_count is not None:
+            if self.last_step_count is not None:
+                steps = float(step_count - self.last_step_count if step_count >= self.last_step_count else step_count)
+            self.last_step_count = step_count
+            self.steps_total += int(steps)
+
+        self.ewma = vector if self.ewma is None else self.ewma_alpha * vector + (1.0 - self.ewma_alpha) * self.ewma
+        self.samples += 1
+
+        self.buffer.append((t, shifted, steps))
+        for window in self.windows.values():
+            window.add(t, shifted, steps)
+            while window.count > 1 and (window.is_full(t, self.buffer[-window.count][0]) or window.count > self.max_buffer):
+                oldest_t, oldest_values, oldest_steps = self.buffer[-window.count]
+                window.add(oldest_t, oldest_values, oldest_steps, sign=-1.0)
+
+        # Only the samples still inside some window are kept
+        keep = max(window.count for window in self.windows.values()) if self.windows else 1
+        while len(self.buffer) > keep:
+            self.buffer.popleft()
+
+        self._updates_since_resum += 1
+        if self._updates_since_resum >= RESUM_INTERVAL:
+            self._resum()
+
+        return True
+
+    def _resum(self):
+        for window in self.windows.values():
+            count = window.count
+            window.reset(len(self.features))
+            for i in range(len(self.buffer) - count, len(self.buffer)):
+                window.add(*self.buffer[i])
+        self._updates_since_resum = 0
+
+    def snapshot(self):
+        return {
+            'samples': self.samples,
+            'sensor_data_id': self.last_sensor_data_id or None,
+            'steps_total': self.steps_total,
+            'ewma': {
+                field: round(float(self.ewma[j]), 4) if self.ewma is not None else None
+                for j, field in enumerate(self.features)
+            },
+            'windows': {name: window.snapshot(self.features, self.buffer, self.shift) for name, window in self.windows.items()}
+        }
+
+
+def load_session_readings(session_id, features, max_rows, after_id=0, before_id=None):
+    """
+    Reads the newest max_rows non-deleted readings of a session with after_id < id (< before_id), in ingest
+    order, with one projected query. Used to rebuild a session's state after a restart, an eviction or a
+    change to its readings, and to catch up on readings another worker ingested.
+    """
+    table = SensorData.__table__
+    columns = list(dict.fromkeys(list(features) + ['step_count']))
+    conditions = [table.c.session_id == session_id, table.c.deleted_on.is_(None), table.c.id > after_id]
+    if before_id is not None:
+        conditions.append(table.c.id < before_id)
+
+    query = (
+        db.select(table.c.id, table.c.recorded_at, *[table.c[name] for name in columns])
+        .where(*conditions)
+        .order_by(table.c.id.desc())
+        .limit(max_rows)
+    )
+    rows = db.session.execute(query).all()
+    return [(row[0], row[1], dict(zip(columns, row[2:]))) for row in reversed(rows)]
+
+
+def session_readings_marker(session_id, before_id=None):
+    """
+    Returns (readings revision, id of the newest non-deleted reading or 0) of a session in one indexed query;
+    with before_id, the newest reading below it.
+    """
+    sensor_data = SensorData.__table__
+    session = Session.__table__
+    conditions = [sensor_data.c.session_id == session_id, sensor_data.c.deleted_on.is_(None)]
+    if before_id is not None:
+        conditions.append(sensor_data.c.id < before_id)
+
+    newest = db.select(db.func.max(sensor_data.c.id)).where(*conditions).scalar_subquery()
+    row = db.session.execute(db.select(session.c.readings_revision, newest).where(session.c.id == session_id)).first()
+    if row is None:
+        return 0, 0
+    return row[0] or 0, row[1] or 0
+
+
+def mark_readings_changed(session_id):
+    """
+    Bumps the session's readings revision in the caller's transaction after a stored reading was edited
+    or deleted, so every worker (not only this one) rebuilds the session's state on next use.
+    """
+    table = Session.__table__
+    db.session.execute(
+        table.update().where(table.c.id == session_id).values(readings_revision=table.c.readings_revision + 1)
+    )
+
+
+class RollingFeatureEngine:
+    """Rolling state of the most recently active sessions (LRU bounded), updated on every ingest."""
+
+    def __init__(self, features, windows, ewma_alpha=0.2, sample_interval_seconds=1.0, max_buffer=10000, max_sessions=1024):
+        self.features = list(features)
+        self.windows = list(windows)
+        self.ewma_alpha = ewma_alpha
+        self.sample_interval_seconds = sample_interval_seconds
+        self.max_buffer = max_buffer
+        self.max_sessions = max(1, int(max_sessions))
+
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _new_state(self):
+        return SessionRollingState(
+            self.features, self.windows, self.ewma_alpha, self.sample_interval_seconds, self.max_buffer
+        )
+
+    def _state(self, session_id, before_id=None):
+        """
+        Returns the session state, up to date with the database. Each worker only applies the readings it
+        ingests itself, so readings other workers ingested meanwhile are applied first, in id order; the
+        state is rebuilt from the newest readings if this process has none or a reading was edited or deleted.
+        With before_id (a reading about to be applied), readings from it on are left to the caller.
+        """
+        revision, newest = session_readings_marker(session_id, before_id)
+
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is not None:
+                self._sessions.move_to_end(session_id)
+                if state.readings_revision != revision:
+                    state = None
+                elif state.last_sensor_data_id >= newest:
+                    return state
+                else:
+                    after_id = state.last_sensor_data_id
+
+        if state is not None:
+            missing = load_session_readings(session_id, self.features, self.max_buffer, after_id, before_id)
+            # A gap wider than the buffer is cheaper (and as exact) to rebuild
+            if len(missing) < self.max_buffer:
+                with self._lock:
+                    for sensor_data_id, recorded_at, values in missing:
+                        state.update(sensor_data_id, recorded_at, values)
+                return state
+
+        state = self._new_state()
+        state.readings_revision = revision
+        for sensor_data_id, recorded_at, values in load_session_readings(session_id, self.features, self.max_buffer):
+            state.update(sensor_data_id, recorded_at, values)
+
+        with self._lock:
+            # Another request may have rebuilt it meanwhile, from the same or newer readings
+            current = self._sessions.get(session_id)
+            if (current is not None and current.readings_revision == revision
+                    and current.last_sensor_data_id >= state.last_sensor_data_id):
+                state = current
+            else:
+                self._sessions[session_id] = state
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return state
+
+    def update(self, session_id, sensor_data_id, recorded_at, values):
+        """Applies a newly ingested reading and returns the session snapshot."""
+        state = self._state(session_id, before_id=sensor_data_id)
+        with self._lock:
+            state.update(sensor_data_id, recorded_at, values)
+            return state.snapshot()
+
+    def snapshot(self, session_id):
+        state = self._state(session_id)
+        with self._lock:
+            return state.snapshot()
+
+    def invalidate(self, session_id):
+        """
+        Drops this process's state of a session (a stored reading changed); it is rebuilt on next use.
+        Other workers notice the change through mark_readings_changed.
+        """
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+def _configured_windows():
+    return (
+        [('seconds', float(size)) for size in Config.ROLLING_WINDOW_SECONDS]
+        + [('samples', int(size)) for size in Config.ROLLING_WINDOW_SAMPLES]
+    )
+
+
+rolling_features = RollingFeatureEngine(
+    Config.ROLLING_FEATURES,
+    _configured_windows(),
+    ewma_alpha=Config.ROLLING_EWMA_ALPHA,
+    sample_interval_seconds=Config.SENSOR_SAMPLE_INTERVAL_SECONDS,
+    max_buffer=Config.ROLLING_MAX_BUFFER_SAMPLES,
+    max_sessions=Config.ROLLING_MAX_SESSIONS
+)
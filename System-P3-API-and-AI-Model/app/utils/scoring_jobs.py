@@ -0,0 +1,395 @@
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from ..config import db
+from .bulk_scoring import CsvInput, SensorDataInput, checkpoint_path_for, run_bulk_scoring
+from .model_registry import model_registry
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+RESULT_MIMETYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+# Seconds between sweeps of finished jobs' files by an idle worker
+PRUNE_INTERVAL_SECONDS = 60.0
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobLost(Exception):
+    """The job was taken from this worker (its heartbeat went stale and the job was requeued)."""
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def jobs_dir(app):
+    """Directory holding each job's input and results, shared by the API and the job workers."""
+    return app.config.get('SCORING_JOBS_DIR') or os.path.join(app.instance_path, 'scoring_jobs')
+
+
+def job_paths(base_dir, job_id, output_format):
+    """Returns (directory, input path, results path) of a job."""
+    directory = os.path.join(base_dir, str(job_id))
+    return directory, os.path.join(directory, 'input.csv'), os.path.join(directory, f'results.{output_format}')
+
+
+def submit_scoring_job(app, owner, source, model_label, output_format, session_ids=None,
+                       write_input=None, input_name=None, id_column=None):
+    """
+    Queues a scoring job and returns it. For a 'csv' job, write_input(path) stores the upload; it is
+    written and checked aside first, so the job row (and the lock SQLite takes for it) is only held
+    for the rename into the job's directory. Raises ValueError for an unusable upload.
+    """
+    from ..models.scoring_job import ScoringJob
+
+    base_dir = jobs_dir(app)
+    staged_path = None
+    if write_input is not None:
+        os.makedirs(os.path.join(base_dir, 'uploads'), exist_ok=True)
+        staged_path = os.path.join(base_dir, 'uploads', f'{uuid.uuid4().hex}.csv')
+        try:
+            write_input(staged_path)
+            # Header and id column checked now rather than when a worker gets to the job
+            CsvInput(staged_path, 1, id_column=id_column)
+        except Exception:
+            if os.path.exists(staged_path):
+                os.remove(staged_path)
+            raise
+
+    job = ScoringJob(
+        owner_id=owner.id,
+        status='queued',
+        source=source,
+        session_ids=session_ids,
+        input_name=input_name,
+        id_column=id_column,
+        model_label=model_label,
+        output_format=output_format,
+        submitted_at=_utcnow(),
+        created_on=date.today(),
+        created_by=owner.name
+    )
+
+    directory = None
+    try:
+        db.session.add(job)
+        db.session.flush()
+
+        if staged_path is not None:
+            directory, input_path, _ = job_paths(base_dir, job.id, output_format)
+            os.makedirs(directory, exist_ok=True)
+            os.replace(staged_path, input_path)
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        if staged_path is not None and os.path.exists(staged_path):
+            os.remove(staged_path)
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+    return job
+
+
+def cancel_scoring_job(app, job_id, user_name):
+    """
+    Cancels a queued job at once, or asks the worker running it to stop after its current chunk.
+    Returns the job's status after the request ('cancelled' or 'running'), or None if it had already finished.
+    """
+    from ..models.scoring_job import ScoringJob
+    table = ScoringJob.__table__
+    audit = {'updated_on': date.today(), 'updated_by': user_name}
+
+    # Conditional updates, so a worker claiming the job at the same moment is not overruled
+    with db.engine.begin() as connection:
+        cancelled = connection.execute(
+            table.update().where((table.c.id == job_id) & (table.c.status == 'queued'))
+            .values(status='cancelled', finished_at=_utcnow(), **audit)
+        )
+        if cancelled.rowcount:
+            status = 'cancelled'
+        elif connection.execute(
+            table.update().where((table.c.id == job_id) & (table.c.status == 'running'))
+            .values(cancel_requested=True, **audit)
+        ).rowcount:
+            status = 'running'
+        else:
+            return None
+
+    if status == 'cancelled':
+        shutil.rmtree(os.path.join(jobs_dir(app), str(job_id)), ignore_errors=True)
+    return status
+
+
+def job_to_dict(job):
+    if job.chunks_total:
+        percent = round(100.0 * job.chunks_done / job.chunks_total, 1)
+    else:
+        percent = 100.0 if job.status == 'succeeded' else 0.0
+
+    return {
+        'id': job.id,
+        'status': job.status,
+        'source': job.source,
+        'session_ids': job.session_ids,
+        'input_name': job.input_name,
+        'id_column': job.id_column,
+        'format': job.output_format,
+        'model_label': job.model_label,
+        'model_version': job.model_version,
+        'progress': {
+            'chunks_done': job.chunks_done,
+            'chunks_total': job.chunks_total,
+            'rows': job.rows_done,
+            'failed_rows': job.rows_failed,
+            'percent': percent
+        },
+        'cancel_requested': job.cancel_requested,
+        'attempts': job.attempts,
+        'error': job.error,
+        'submitted_at': _isoformat(job.submitted_at),
+        'started_at': _isoformat(job.started_at),
+        'finished_at': _isoformat(job.finished_at)
+    }
+
+
+class ScoringJobWorker:
+    """
+    Runs queued scoring jobs, one at a time, each through run_bulk_scoring across `processes`.
+
+    Jobs are claimed from the scoring_job table with a conditional update, so any number of worker
+    processes (on any host sharing the database and SCORING_JOBS_DIR) can run side by side. A worker
+    heartbeats the job it holds; a job whose worker went silent for stale_seconds is queued again and
+    continues from its last checkpointed chunk, up to max_attempts claims.
+    """
+
+    def __init__(self, app, processes=1, chunk_rows=10000, poll_seconds=2.0, heartbeat_seconds=10.0,
+                 stale_seconds=120.0, max_attempts=3, retention_hours=72, echo=print):
+        from ..models.scoring_job import ScoringJob
+
+        self.app = app
+        self.table = ScoringJob.__table__
+        # Engines are thread-safe; the heartbeat thread uses it without an app context
+        self.engine = db.engine
+        self.base_dir = jobs_dir(app)
+        self.processes = max(1, int(processes))
+        self.chunk_rows = chunk_rows
+        self.poll_seconds = poll_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_seconds = stale_seconds
+        self.max_attempts = max_attempts
+        self.retention_hours = retention_hours
+        self.echo = echo
+        self.worker = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+        self._job_id = None
+        self._stop = threading.Event()
+        self._next_prune = 0.0
+
+    def _audit(self):
+        return {'updated_on': date.today(), 'updated_by': 'scoring_job_worker'}
+
+    def _held(self, job_id):
+        return (self.table.c.id == job_id) & (self.table.c.worker == self.worker) & (self.table.c.status == 'running')
+
+    def run(self, once=False):
+        """Works through the queue; with once=True, returns when it is empty instead of polling."""
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name='scoring-job-heartbeat', daemon=True)
+        heartbeat.start()
+
+        try:
+            while True:
+                self.recover_stale()
+                job = self.claim()
+                if job is not None:
+                    self.run_job(job)
+                    continue
+
+                self.prune()
+                if once:
+                    return
+                time.sleep(self.poll_seconds)
+        finally:
+            self._stop.set()
+
+    def claim(self):
+        """Takes the oldest queued job; returns its row as a dict, or None when the queue is empty."""
+        table = self.table
+        with self.engine.begin() as connection:
+            while True:
+                job_id = connection.execute(
+                    db.select(table.c.id)
+                    .where((table.c.status == 'queued') & table.c.deleted_on.is_(None))
+                    .order_by(table.c.id).limit(1)
+                ).scalar()
+                if job_id is None:
+                    return None
+
+                now = _utcnow()
+                claimed = connection.execute(
+                    table.update().where((table.c.id == job_id) & (table.c.status == 'queued')).values(
+                        status='running', worker=self.worker, attempts=table.c.attempts + 1, heartbeat_at=now,
+                        started_at=db.func.coalesce(table.c.started_at, now), **self._audit()
+                    )
+                )
+                # Another worker got it first: try the next one
+                if claimed.rowcount == 1:
+                    return dict(connection.execute(db.select(table).where(table.c.id == job_id)).one()._mapping)
+
+    def recover_stale(self):
+        """Requeues (or gives up on) running jobs whose worker stopped heartbeating."""
+        table = self.table
+        now = _utcnow()
+        stale = (table.c.status == 'running') & (table.c.heartbeat_at < now - timedelta(seconds=self.stale_seconds))
+
+        with self.engine.begin() as connection:
+            connection.execute(table.update().where(stale & table.c.cancel_requested).values(
+                status='cancelled', finished_at=now, **self._audit()
+            ))
+            connection.execute(table.update().where(stale & (table.c.attempts >= self.max_attempts)).values(
+                status='failed', finished_at=now,
+                error=f'The worker stopped responding on each of {self.max_attempts} attempts', **self._audit()
+            ))
+            requeued = connection.execute(table.update().where(stale).values(status='queued', worker=None, **self._audit()))
+
+        if requeued.rowcount:
+            self.echo(f"Requeued {requeued.rowcount} job(s) of unresponsive workers")
+
+    def run_job(self, job):
+        job_id = job['id']
+        directory, input_path, output_path = job_paths(self.base_dir, job_id, job['output_format'])
+        label = job['model_label']
+        self._job_id = job_id
+        self.echo(f"job {job_id}: started ({job['source']}, model {label}, attempt {job['attempts']})")
+
+        try:
+            if job['source'] == 'sessions':
+                source = SensorDataInput(
+                    self.engine.url.render_as_string(hide_password=False), self.chunk_rows, session_ids=job['session_ids']
+                )
+            else:
+                source = CsvInput(input_path, self.chunk_rows, id_column=job['id_column'])
+
+            # A previous attempt that checkpointed continues where it stopped; one that did not starts over
+            resume = os.path.exists(checkpoint_path_for(output_path))
+            if not resume and os.path.exists(output_path):
+                os.remove(output_path)
+            os.makedirs(directory, exist_ok=True)
+
+            result = run_bulk_scoring(
+                source, output_path, model_registry.artifact_path(label), label,
+                workers=self.processes, output_format=job['output_format'], resume=resume,
+                echo=lambda message: self.echo(f"job {job_id}: {message}"),
+                on_progress=lambda checkpoint: self._progress(job_id, checkpoint)
+            )
+        except JobCancelled:
+            self._finish(job_id, 'cancelled')
+            shutil.rmtree(directory, ignore_errors=True)
+            self.echo(f"job {job_id}: cancelled")
+        except JobLost:
+            self.echo(f"x job {job_id}: taken over by another worker, stopped")
+        except KeyboardInterrupt:
+            # Back to the queue; the next worker continues from the checkpoint
+            self._release(job_id)
+            self.echo(f"job {job_id}: interrupted, requeued")
+            raise
+        except Exception as e:
+            self._finish(job_id, 'failed', error=str(e))
+            shutil.rmtree(directory, ignore_errors=True)
+            self.echo(f"x job {job_id}: failed: {str(e)}")
+        else:
+            self._finish(
+                job_id, 'succeeded', model_version=result['model_version'], chunks_total=result['chunks_total'],
+                chunks_done=result['chunks_done'], rows_done=result['rows'], rows_failed=result['failed']
+            )
+            os.remove(checkpoint_path_for(output_path))
+            self.echo(f"job {job_id}: {result['rows']} rows scored ({result['failed']} failed) in {result['seconds']:.1f}s")
+        finally:
+            self._job_id = None
+
+    def _progress(self, job_id, checkpoint):
+        # Also the cancellation point: the run stops between chunks
+        with self.engine.begin() as connection:
+            updated = connection.execute(self.table.update().where(self._held(job_id)).values(
+                chunks_total=checkpoint['chunks_total'], chunks_done=checkpoint['chunks_done'],
+                rows_done=checkpoint['rows'], rows_failed=checkpoint['failed'],
+                model_version=checkpoint['model_version'], heartbeat_at=_utcnow()
+            ))
+            if updated.rowcount == 0:
+                raise JobLost()
+
+            cancel = connection.execute(db.select(self.table.c.cancel_requested).where(self.table.c.id == job_id)).scalar()
+
+        if cancel:
+            raise JobCancelled()
+
+    def _finish(self, job_id, status, **values):
+        with self.engine.begin() as connection:
+            connection.execute(self.table.update().where(self._held(job_id)).values(
+                status=status, finished_at=_utcnow(), heartbeat_at=_utcnow(), **values, **self._audit()
+            ))
+
+    def _release(self, job_id):
+        with self.engine.begin() as connection:
+            connection.execute(self.table.update().where(self._held(job_id)).values(
+                status='queued', worker=None, **self._audit()
+            ))
+
+    def _heartbeat_loop(self):
+        # Keeps the job alive through model loading and long chunks, between progress updates
+        while not self._stop.wait(self.heartbeat_seconds):
+            job_id = self._job_id
+            if job_id is None:
+                continue
+            try:
+                with self.engine.begin() as connection:
+                    connection.execute(self.table.update().where(self._held(job_id)).values(heartbeat_at=_utcnow()))
+            except Exception as e:
+                print(f"x Scoring job heartbeat failed: {str(e)}")
+
+    def prune(self):
+        """
+        Removes the files of failed and cancelled jobs, and soft-deletes finished jobs older than
+        retention_hours together with their results.
+        """
+        now = time.monotonic()
+        if now < self._next_prune:
+            return
+        self._next_prune = now + PRUNE_INTERVAL_SECONDS
+
+        table = self.table
+        if self.retention_hours > 0:
+            cutoff = _utcnow() - timedelta(hours=self.retention_hours)
+            with self.engine.begin() as connection:
+                connection.execute(table.update().where(
+                    table.c.status.in_(FINISHED_STATUSES) & (table.c.finished_at < cutoff) & table.c.deleted_on.is_(None)
+                ).values(deleted_on=date.today(), deleted_by='scoring_job_worker'))
+
+        if not os.path.isdir(self.base_dir):
+            return
+        job_ids = [int(name) for name in os.listdir(self.base_dir) if name.isdigit()]
+        if not job_ids:
+            return
+
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                db.select(table.c.id, table.c.status, table.c.deleted_on).where(table.c.id.in_(job_ids))
+            ).all()
+
+        # A directory without a row yet belongs to a submission in progress and is left alone
+        for job_id, status, deleted_on in rows:
+            if status in ('failed', 'cancelled') or deleted_on is not None:
+                shutil.rmtree(os.path.join(self.base_dir, str(job_id)), ignore_errors=True)
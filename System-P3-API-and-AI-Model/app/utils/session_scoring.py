@@ -0,0 +1,113 @@
+import numpy as np
+from ..config import db
+from ..models.sensor_data import SensorData
+from .predict_runners_model import RISK_LABELS
+
+INJURED_RISK_LEVEL = 2
+
+
+def check_session_features(feature_names):
+    """Raises ValueError if a model feature is not a SensorData column (stored sessions cannot be scored)."""
+    missing_columns = [name for name in feature_names if name not in SensorData.__table__.columns]
+    if missing_columns:
+        raise ValueError(f"Model features not stored in sensor data: {', '.join(missing_columns)}")
+
+
+def load_session_feature_matrix(session_id, feature_names):
+    """
+    Loads the non-deleted sensor rows of a session with one projected Core query (no ORM objects).
+    Returns (sensor_data_ids, recorded_at, feature_matrix) in sample order.
+    Raises ValueError if a feature is not a SensorData column.
+    """
+    check_session_features(feature_names)
+
+    table = SensorData.__table__
+    query = (
+        db.select(table.c.id, table.c.recorded_at, *[table.c[name] for name in feature_names])
+        .where(table.c.session_id == session_id, table.c.deleted_on.is_(None))
+        .order_by(table.c.id)
+    )
+    rows = db.session.execute(query).all()
+
+    if not rows:
+        return np.empty(0, dtype=np.int64), [], np.empty((0, len(feature_names)))
+
+    ids, recorded_at, *columns = zip(*rows)
+    sensor_data_ids = np.array(ids, dtype=np.int64)
+    # NULLs become NaN and are reported by the feature schema
+    feature_matrix = np.array(columns, dtype=float).T.copy()
+    recorded_at = list(recorded_at)
+
+    order = sample_order(recorded_at)
+    if order is not None:
+        sensor_data_ids = sensor_data_ids[order]
+        feature_matrix = feature_matrix[order]
+        recorded_at = [recorded_at[i] for i in order]
+
+    return sensor_data_ids, recorded_at, feature_matrix
+
+
+def sample_order(recorded_at):
+    """
+    Sample order for rows read in insertion order: by device timestamp when every sample has one.
+    Returns the permutation, or None to keep insertion order.
+    """
+    if recorded_at and all(t is not None for t in recorded_at):
+        return np.argsort(np.array([t.timestamp() for t in recorded_at]), kind='stable')
+    return None
+
+
+def sample_durations(recorded_at, sample_interval_seconds):
+    """
+    Seconds each sample stands for: the gap to the next sample when every sample has a timestamp
+    (the last one gets the median gap), otherwise the configured sample interval.
+    Returns (durations, time_basis).
+    """
+    n_samples = len(recorded_at)
+
+    if n_samples > 1 and all(t is not None for t in recorded_at):
+        gaps = np.diff(np.array([t.timestamp() for t in recorded_at]))
+        return np.append(gaps, np.median(gaps)), 'recorded_at'
+
+    return np.full(n_samples, float(sample_interval_seconds)), 'sample_interval'
+
+
+def summarize_session_predictions(risk_levels, sensor_data_ids, recorded_at, sample_interval_seconds):
+    """Session-level summary of scored samples: max risk, time in each class and first injured sample."""
+    durations, time_basis = sample_durations(recorded_at, sample_interval_seconds)
+    n_labels = max(max(RISK_LABELS), int(risk_levels.max()) if risk_levels.size else 0) + 1
+
+    time_in_class = np.bincount(risk_levels, weights=durations, minlength=n_labels)
+    samples_in_class = np.bincount(risk_levels, minlength=n_labels)
+    total_time = float(durations.sum())
+
+    max_risk_level = int(risk_levels.max()) if risk_levels.size else None
+
+    first_injured = None
+    injured = np.flatnonzero(risk_levels == INJURED_RISK_LEVEL)
+    if injured.size:
+        i = int(injured[0])
+        first_injured = {
+            'sensor_data_id': int(sensor_data_ids[i]),
+            'recorded_at': recorded_at[i].isoformat() if recorded_at[i] is not None else None,
+            'seconds_from_start': round(float(durations[:i].sum()), 3)
+        }
+
+    return {
+        'samples': int(risk_levels.size),
+        'max_risk_level': max_risk_level,
+        'max_risk_label': RISK_LABELS.get(max_risk_level, "Unknown") if max_risk_level is not None else None,
+        'time_basis': time_basis,
+        'total_seconds': round(total_time, 3),
+        'time_in_class_seconds': {
+            RISK_LABELS.get(level, str(level)): round(float(time_in_class[level]), 3) for level in range(n_labels)
+        },
+        'fraction_in_class': {
+            RISK_LABELS.get(level, str(level)): round(float(time_in_class[level]) / total_time, 4) if total_time else 0.0
+            for level in range(n_labels)
+        },
+        'samples_in_class': {
+            RISK_LABELS.get(level, str(level)): int(samples_in_class[level]) for level in range(n_labels)
+        },
+        'first_injured': first_injured
+    }
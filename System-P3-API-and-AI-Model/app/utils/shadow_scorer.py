@@ -0,0 +1,253 @@
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+import numpy as np
+from .metrics import untimed
+from .predict_runners_model import score_feature_matrix
+
+# Batch latencies kept per candidate for the percentiles in get_metrics()
+LATENCY_SAMPLES = 1024
+
+# Seconds before a candidate artifact that failed to load is tried again
+CANDIDATE_RETRY_SECONDS = 60.0
+
+
+class _LoadFailure:
+    def __init__(self, error, retry_at):
+        self.error = error
+        self.retry_at = retry_at
+
+
+class _CandidateStats:
+    """Agreement, probability deltas and latency of one candidate against one primary version."""
+
+    def __init__(self, n_classes):
+        self.rows = 0
+        self.agreements = 0
+        # confusion[primary risk level][candidate risk level]
+        self.confusion = {}
+        self.compared_probabilities = 0
+        self.delta_sums = np.zeros(n_classes)
+        self.abs_delta_sum = 0.0
+        self.max_abs_delta = 0.0
+        self.batches = 0
+        self.seconds = 0.0
+        self.latencies_ms = deque(maxlen=LATENCY_SAMPLES)
+
+    def record(self, primary_levels, primary_probabilities, risk_levels, probabilities, seconds):
+        self.rows += risk_levels.size
+        self.agreements += int((risk_levels == primary_levels).sum())
+        for primary, candidate in zip(primary_levels.tolist(), risk_levels.tolist()):
+            row = self.confusion.setdefault(primary, {})
+            row[candidate] = row.get(candidate, 0) + 1
+
+        # Deltas only mean something when both models give probabilities over the same classes
+        if primary_probabilities is not None and probabilities is not None and probabilities.shape == primary_probabilities.shape:
+            deltas = probabilities - primary_probabilities
+            self.compared_probabilities += deltas.shape[0]
+            if self.delta_sums.shape != deltas.shape[1:]:
+                self.delta_sums = np.zeros(deltas.shape[1])
+            self.delta_sums += deltas.sum(axis=0)
+            abs_deltas = np.abs(deltas).max(axis=1)
+            self.abs_delta_sum += float(abs_deltas.sum())
+            self.max_abs_delta = max(self.max_abs_delta, float(abs_deltas.max()))
+
+        self.batches += 1
+        self.seconds += seconds
+        self.latencies_ms.append(seconds * 1000.0)
+
+    def snapshot(self):
+        compared = self.compared_probabilities
+        latencies = np.array(self.latencies_ms) if self.latencies_ms else None
+        return {
+            'rows': self.rows,
+            'agreement_rate': round(self.agreements / self.rows, 4) if self.rows else None,
+            'confusion': {str(p): {str(c): n for c, n in sorted(row.items())} for p, row in sorted(self.confusion.items())},
+            # Largest per-class probability change of a row, averaged over rows and at worst
+            'mean_abs_probability_delta': round(self.abs_delta_sum / compared, 4) if compared else None,
+            'max_abs_probability_delta': round(self.max_abs_delta, 4) if compared else None,
+            # Candidate minus primary, per class
+            'mean_probability_delta': [round(float(d), 4) for d in self.delta_sums / compared] if compared else None,
+            'batches': self.batches,
+            'avg_row_ms': round(self.seconds * 1000.0 / self.rows, 4) if self.rows else None,
+            'batch_ms': {
+                'p50': round(float(np.percentile(latencies, 50)), 3),
+                'p95': round(float(np.percentile(latencies, 95)), 3),
+                'p99': round(float(np.percentile(latencies, 99)), 3)
+            } if latencies is not None else None
+        }
+
+
+class ShadowScorer:
+    """
+    Scores a sample of live /predict inputs with candidate model versions, off the request path.
+
+    Request threads only draw a random number and, for sampled rows, make a non-blocking put on a
+    bounded queue: when the queue is full the row is dropped and counted, so the primary response
+    never waits on the candidates. A background thread drains up to batch_size rows at a time,
+    scores them with every candidate in one call each and compares the results with the primary
+    model's. Candidates are loaded by that thread on first use with load_fn(label).
+    """
+
+    def __init__(self, labels, load_fn, sample_rate=0.1, queue_size=1000, batch_size=64):
+        self.labels = list(labels)
+        self.load_fn = load_fn
+        self.sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+        self.batch_size = max(1, int(batch_size))
+
+        self._queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._worker = None
+        self._worker_pid = None
+        self._lock = threading.Lock()
+
+        # label -> bundle, or _LoadFailure while it cannot be loaded
+        self._candidates = {}
+        # (candidate version, primary version) -> _CandidateStats
+        self._stats = {}
+        self._metrics = {'offered': 0, 'queued': 0, 'dropped': 0, 'errors': 0}
+
+    def _ensure_worker(self):
+        # The worker thread does not survive a fork, so start one per process on first use
+        if self._worker is not None and self._worker.is_alive() and self._worker_pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive() and self._worker_pid == os.getpid():
+                return
+            self._worker_pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name='shadow-scorer', daemon=True)
+            self._worker.start()
+
+    def offer(self, feature_row, risk_level, probabilities, primary_version):
+        """Queues a sampled scored row for the candidates. Never blocks; returns whether the row was queued."""
+        if not self.labels or random.random() >= self.sample_rate:
+            return False
+
+        self._ensure_worker()
+        item = (
+            np.array(feature_row, dtype=float),
+            int(risk_level),
+            np.array(probabilities, dtype=float) if probabilities is not None else None,
+            primary_version
+        )
+
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self._metrics['offered'] += 1
+                self._metrics['dropped'] += 1
+            return False
+
+        with self._lock:
+            self._metrics['offered'] += 1
+            self._metrics['queued'] += 1
+        return True
+
+    def _take_batch(self):
+        batch = [self._queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _candidate(self, label):
+        candidate = self._candidates.get(label)
+        if isinstance(candidate, _LoadFailure):
+            if time.monotonic() < candidate.retry_at:
+                return None
+            candidate = None
+
+        if candidate is None:
+            try:
+                candidate = self.load_fn(label)
+                if candidate is None:
+                    raise ValueError('no model was loaded')
+            except Exception as e:
+                print(f"x Shadow model {label} could not be loaded: {str(e)}")
+                self._candidates[label] = _LoadFailure(str(e), time.monotonic() + CANDIDATE_RETRY_SECONDS)
+                return None
+            self._candidates[label] = candidate
+
+        return candidate
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+
+            # Rows queued around a primary model swap are compared with their own primary version
+            groups = {}
+            for item in batch:
+                groups.setdefault(item[3], []).append(item)
+
+            for label in self.labels:
+                try:
+                    bundle = self._candidate(label)
+                    if bundle is None:
+                        continue
+                    for primary_version, group in groups.items():
+                        self._score_group(bundle, primary_version, group)
+                except Exception as e:
+                    # Keep the worker alive whatever a candidate does
+                    print(f"x Shadow worker error: {str(e)}")
+
+    def _score_group(self, bundle, primary_version, group):
+        try:
+            feature_matrix = np.vstack([item[0] for item in group])
+            primary_levels = np.array([item[1] for item in group], dtype=int)
+            primary_probabilities = None
+            if all(item[2] is not None for item in group) and len({item[2].shape for item in group}) == 1:
+                primary_probabilities = np.vstack([item[2] for item in group])
+
+            started = time.perf_counter()
+            risk_levels, probabilities = score_feature_matrix(feature_matrix, bundle, timer=untimed)
+            seconds = time.perf_counter() - started
+
+        except Exception as e:
+            with self._lock:
+                self._metrics['errors'] += 1
+            print(f"x Shadow scoring with {bundle.version} failed: {str(e)}")
+            return
+
+        with self._lock:
+            stats = self._stats.get((bundle.version, primary_version))
+            if stats is None:
+                stats = self._stats[(bundle.version, primary_version)] = _CandidateStats(
+                    primary_probabilities.shape[1] if primary_probabilities is not None else 0
+                )
+            stats.record(primary_levels, primary_probabilities, np.asarray(risk_levels, dtype=int), probabilities, seconds)
+
+    def reset(self):
+        """Clears the comparisons and drops the loaded candidates, so changed artifacts are picked up."""
+        with self._lock:
+            self._stats = {}
+            self._candidates = {}
+            self._metrics = {key: 0 for key in self._metrics}
+
+    def get_metrics(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+            comparisons = [
+                {'candidate_version': candidate, 'primary_version': primary, **stats.snapshot()}
+                for (candidate, primary), stats in sorted(self._stats.items())
+            ]
+            candidates = {
+                label: {'error': c.error} if isinstance(c, _LoadFailure) else {'version': c.version}
+                for label, c in self._candidates.items()
+            }
+
+        return {
+            'labels': self.labels,
+            'sample_rate': self.sample_rate,
+            'queue_size': self._queue.maxsize,
+            'queue_depth': self._queue.qsize(),
+            'batch_size': self.batch_size,
+            **metrics,
+            'candidates': candidates,
+            'comparisons': comparisons
+        }
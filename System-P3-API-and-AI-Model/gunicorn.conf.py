@@ -0,0 +1,42 @@
+# Gunicorn configuration - used by the Dockerfile CMD (gunicorn -c gunicorn.conf.py run:app)
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '7860')}"
+workers = int(os.environ.get('GUNICORN_WORKERS', '1'))
+# Threaded workers: a live feed stream (/session/<id>/live, /coach/<id>/live) holds a thread, not the
+# whole worker, so ingest and predictions keep being served while clients watch. Sync workers cannot
+# serve the live feeds (they answer 503)
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', '8'))
+
+# Import the app in the master so workers are forked with the model already in memory
+preload_app = os.environ.get('GUNICORN_PRELOAD_MODEL', 'true').lower() == 'true'
+
+
+def on_starting(server):
+    """Loads the model once in the master process before any worker is forked."""
+    if not preload_app:
+        return
+
+    from app.utils.model_registry import model_registry
+
+    bundle = model_registry.ensure_loaded()
+    if bundle is None:
+        server.log.warning("Model could not be preloaded: %s", model_registry.error)
+    else:
+        server.log.info("Preloaded model %s in the master process", bundle.version)
+
+    # Move everything allocated so far out of the GC's reach: collections in the workers
+    # would otherwise write to these objects' headers and un-share their pages
+    gc.collect()
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    """Starts the per-process reload triggers; threads and handlers set up in the master do not survive the fork."""
+    from app.config import Config
+    from app.utils.model_registry import model_registry
+
+    model_registry.start_watcher(Config.MODEL_WATCH_INTERVAL_SECONDS)
+    model_registry.install_signal_handler()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark inline scoring against the process-pool inference executor.
+
+Each concurrency level runs N threads that repeatedly score single rows (the /predict
+shape) for a fixed duration, then reports throughput in rows/sec.
+
+Usage:
+    python test_scripts/benchmark_inference_pool.py --pool-size 4 --concurrency 1 2 4 8 16
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+import numpy as np
+
+# Add the project root to the path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.config import Config
+from app.utils.load_runners_model import load_runners_model
+from app.utils.predict_runners_model import get_required_features, score_feature_matrix
+from app.utils.inference_pool import InferencePool
+
+
+def make_rows(bundle, n_rows, seed=42):
+    rng = np.random.default_rng(seed)
+    ranges = [Config.FEATURE_RANGES.get(f, (0.0, 1.0)) for f in get_required_features(bundle)]
+    low = np.array([r[0] for r in ranges])
+    high = np.array([r[1] for r in ranges])
+    return low + rng.random((n_rows, len(ranges))) * (high - low)
+
+
+def run_threads(score, bundle, rows, concurrency, duration, batch_size):
+    counts = [0] * concurrency
+    stop_at = time.perf_counter() + duration
+
+    def worker(slot):
+        i = slot
+        while time.perf_counter() < stop_at:
+            start = (i * batch_size) % (len(rows) - batch_size)
+            score(rows[start:start + batch_size], bundle)
+            counts[slot] += batch_size
+            i += concurrency
+
+    threads = [threading.Thread(target=worker, args=(slot,)) for slot in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return sum(counts) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pool-size', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--batch-size', type=int, default=1, help='Rows per scoring call (1 = /predict)')
+    parser.add_argument('--duration', type=float, default=3.0, help='Seconds per measurement')
+    args = parser.parse_args()
+
+    bundle = load_runners_model()
+    rows = make_rows(bundle, 10000)
+
+    pool = InferencePool(args.pool_size)
+    pool.start()
+    # First call per worker loads the model; keep it out of the measurement
+    for _ in range(args.pool_size * 2):
+        pool.score(rows[:1], bundle)
+
+    print(f"Model {bundle.version}, pool size {args.pool_size}, batch size {args.batch_size}")
+    print(f"{'threads':>8} {'inline rows/s':>14} {'pool rows/s':>12} {'speedup':>8}")
+
+    try:
+        for concurrency in args.concurrency:
+            inline = run_threads(score_feature_matrix, bundle, rows, concurrency, args.duration, args.batch_size)
+            pooled = run_threads(pool.score, bundle, rows, concurrency, args.duration, args.batch_size)
+            print(f"{concurrency:>8} {inline:>14.0f} {pooled:>12.0f} {pooled / inline:>7.2f}x")
+    finally:
+        pool.shutdown()
+
+    print(f"\nPool metrics: {pool.get_metrics()}")
+
+
+if __name__ == "__main__":
+    main()
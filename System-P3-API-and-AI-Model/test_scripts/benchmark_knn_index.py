@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark the KNN index against brute-force search as the reference set grows, and check
+its neighbours and probabilities against brute-force scikit-learn.
+
+Reference sets are synthesized by resampling the production model's (scaled) reference rows
+with a little noise, so they keep the shape of the real feature distribution.
+
+Usage:
+    python test_scripts/benchmark_knn_index.py --sizes 10000 100000 1000000 10000000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+import numpy as np
+from sklearn.neighbors import KNeighborsClassifier
+
+# Add the project root to the path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.utils.load_runners_model import load_runners_model
+from app.utils.compile_runners_model import compile_runners_model
+from app.utils.knn_index import KNNIndex
+
+
+def make_reference(base, n_rows, rng, noise):
+    picks = rng.integers(0, base.reference.shape[0], n_rows)
+    X = base.reference[picks] + rng.normal(scale=noise, size=(n_rows, base.reference.shape[1]))
+    return X, base.classes_[base.labels[picks]]
+
+
+def time_call(fn, budget_seconds, max_repeats):
+    """Returns per-call latencies in ms, stopping after max_repeats calls or budget_seconds."""
+    latencies = []
+    deadline = time.perf_counter() + budget_seconds
+    while len(latencies) < max_repeats and (not latencies or time.perf_counter() < deadline):
+        started = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def run_size(base, n_rows, args, rng):
+    X, y = make_reference(base, n_rows, rng, args.noise)
+    model = KNeighborsClassifier(
+        n_neighbors=base.n_neighbors, weights=base.weights, metric=base.metric, algorithm='brute'
+    ).fit(X, y)
+
+    knn = compile_runners_model(model).estimator
+
+    started = time.perf_counter()
+    index = KNNIndex.build(knn.reference_columns)
+    build_seconds = time.perf_counter() - started
+
+    # Queries near the data, like real sensor readings
+    queries = X[rng.integers(0, n_rows, max(args.check_rows, args.batch_size))] + rng.normal(scale=0.3, size=(max(args.check_rows, args.batch_size), X.shape[1]))
+
+    result = {'reference_rows': n_rows, 'leaves': index.n_leaves, 'index_build_s': round(build_seconds, 2)}
+
+    for name, search_index in (('brute', None), ('index', index)):
+        knn.index = search_index
+        single = time_call(lambda: knn.predict_proba(queries[:1]), args.budget, 200)
+        batch = time_call(lambda: knn.predict_proba(queries[:args.batch_size]), args.budget, 20)
+        result[f'{name}_p50_ms'] = round(float(np.percentile(single, 50)), 3)
+        result[f'{name}_p99_ms'] = round(float(np.percentile(single, 99)), 3)
+        result[f'{name}_batch_rows_per_s'] = round(args.batch_size / (np.median(batch) / 1000))
+
+    # Neighbours and probabilities against brute-force scikit-learn
+    check = queries[:args.check_rows]
+    knn.index = index
+    _, index_neighbors = knn.kneighbors(check)
+    index_probabilities = knn.predict_proba(check)
+    _, sklearn_neighbors = model.kneighbors(check)
+    sklearn_probabilities = model.predict_proba(check)
+
+    found = [np.intersect1d(a, b).size for a, b in zip(index_neighbors, sklearn_neighbors)]
+    result['recall_at_k'] = round(sum(found) / sklearn_neighbors.size, 6)
+    result['prediction_agreement'] = round(float((index_probabilities.argmax(1) == sklearn_probabilities.argmax(1)).mean()), 6)
+    result['max_probability_diff'] = float(np.abs(index_probabilities - sklearn_probabilities).max())
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--check-rows', type=int, default=200, help='Queries compared against scikit-learn')
+    parser.add_argument('--noise', type=float, default=0.05, help='Std. dev. of the jitter added to resampled rows')
+    parser.add_argument('--budget', type=float, default=3.0, help='Seconds per latency measurement')
+    parser.add_argument('--output', help='Optional path to write the results as JSON')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    bundle = load_runners_model()
+    base = bundle.compiled.estimator if bundle.compiled is not None else None
+    if base is None or type(base).__name__ != 'CompiledKNN':
+        print("❌ The active model is not a compiled KNN model")
+        sys.exit(1)
+
+    rng = np.random.default_rng(42)
+    results = []
+
+    print(f"{'rows':>10} {'leaves':>7} {'build s':>8} {'brute p50 ms':>13} {'index p50 ms':>13} "
+          f"{'brute rows/s':>13} {'index rows/s':>13} {'recall@k':>9} {'agreement':>10}")
+
+    for n_rows in args.sizes:
+        result = run_size(base, n_rows, args, rng)
+        results.append(result)
+        print(f"{n_rows:>10} {result['leaves']:>7} {result['index_build_s']:>8.2f} "
+              f"{result['brute_p50_ms']:>13.3f} {result['index_p50_ms']:>13.3f} "
+              f"{result['brute_batch_rows_per_s']:>13} {result['index_batch_rows_per_s']:>13} "
+              f"{result['recall_at_k']:>9.4f} {result['prediction_agreement']:>10.4f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+In-process benchmark of the prediction pipeline, without a running server or network.
+
+Three targets are measured at each batch size:
+  core      score_feature_matrix() on a prepared matrix (scaler + model only)
+  pipeline  parse + validate + score + alerts + response building, as the endpoints run it
+  client    the Flask test client: /predict for 1 row, /predict/batch up to
+            PREDICT_BATCH_MAX_ROWS, /predict/stream (NDJSON) above that
+
+Rows are synthesized around the labeled scenarios of test_scenarios.py, so the batches keep
+the shape of real sensor readings. Each measurement reports p50/p95/p99 latency, rows/sec
+and the peak memory allocated by one call. Results are written as JSON; pass --compare with
+an earlier file to print the change per measurement.
+
+Large batches dominate the run time: with a brute-force KNN model every 100k-row call takes
+tens of seconds, so batches of 10k rows and more are timed once unless --budget allows more.
+
+Usage:
+    python test_scripts/benchmark_prediction_pipeline.py --sizes 1 10 100 1000 10000 100000
+    python test_scripts/benchmark_prediction_pipeline.py --compare test_scripts/benchmark_results/<run>.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+
+# Add the project root to the path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+# The client target needs a database: keep it out of the project's runners.db
+_database_path = os.path.join(tempfile.mkdtemp(prefix='rips-benchmark-'), 'benchmark.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{_database_path}'
+
+from app.config import Config
+from app.utils.feature_schema import get_feature_schema
+from app.utils.generate_alert import generate_alerts_batch
+from app.utils.predict_runners_model import get_required_features, score_feature_matrix, build_prediction_response
+from test_scripts.test_scenarios import test_scenarios
+
+RESULTS_DIR = os.path.join(project_root, 'test_scripts', 'benchmark_results')
+
+TARGETS = ('core', 'pipeline', 'client')
+
+# Batches of at least this many rows are not warmed up and may be timed only once
+LARGE_BATCH_ROWS = 10000
+
+# Compared between runs, with whether a higher value is better
+COMPARED_FIELDS = (('p50_ms', False), ('p95_ms', False), ('p99_ms', False), ('rows_per_s', True), ('peak_alloc_mb', False))
+
+
+def make_rows(feature_names, n_rows, rng, noise):
+    """
+    Returns n_rows drawn around the labeled scenarios with Gaussian noise of `noise` times
+    each feature's range, clipped to FEATURE_RANGES.
+    """
+    centers = np.array([[scenario['data'][f] for f in feature_names] for scenario in test_scenarios], dtype=float)
+    ranges = np.array([Config.FEATURE_RANGES.get(f, (0.0, 1.0)) for f in feature_names], dtype=float)
+    spread = ranges[:, 1] - ranges[:, 0]
+
+    picks = rng.integers(0, len(test_scenarios), n_rows)
+    feature_matrix = centers[picks] + rng.normal(size=(n_rows, len(feature_names))) * spread * noise
+    feature_matrix = np.clip(feature_matrix, ranges[:, 0], ranges[:, 1])
+
+    # Integer features (step_count, cadence, ...) arrive as integers
+    integer = get_feature_schema(feature_names).integer
+    feature_matrix[:, integer] = np.round(feature_matrix[:, integer])
+
+    return feature_matrix
+
+
+def to_records(feature_names, feature_matrix):
+    integer = get_feature_schema(feature_names).integer
+    return [
+        {f: int(v) if integer[j] else float(v) for j, (f, v) in enumerate(zip(feature_names, row))}
+        for row in feature_matrix.tolist()
+    ]
+
+
+def time_calls(fn, n_calls, budget_seconds, max_repeats, min_repeats=3):
+    """Returns per-call latencies in seconds: fn(call_number), at least min_repeats times, then until the budget or max_repeats."""
+    latencies = []
+    deadline = time.perf_counter() + budget_seconds
+    while len(latencies) < max_repeats and (len(latencies) < min_repeats or time.perf_counter() < deadline):
+        started = time.perf_counter()
+        fn(len(latencies) % n_calls)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def peak_allocation(fn):
+    """Peak bytes allocated (Python and NumPy) during one call, above what was allocated before it."""
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        fn()
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+
+class ClientTarget:
+    """Drives the endpoints through the Flask test client as a registered coach."""
+
+    def __init__(self, use_cache):
+        from app import create_app
+
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['PREDICTION_CACHE_ENABLED'] = use_cache
+        self.client = self.app.test_client()
+
+        self.client.post('/api/v1.0/user/register', json={
+            'email': 'benchmark@rips.local', 'password': 'benchmark', 'type': 'coach', 'name': 'Benchmark'
+        })
+        response = self.client.post('/api/v1.0/user/login', json={'email': 'benchmark@rips.local', 'password': 'benchmark'})
+        if response.status_code != 200:
+            raise RuntimeError(f"Could not log in the benchmark user: {response.get_data(as_text=True)}")
+        self.headers = {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+        self.max_batch_rows = self.app.config.get('PREDICT_BATCH_MAX_ROWS', 1000)
+
+    def endpoint(self, batch_size):
+        if batch_size == 1:
+            return 'predict'
+        return 'predict/batch' if batch_size <= self.max_batch_rows else 'predict/stream'
+
+    def prepare(self, records):
+        """Encodes the request body up front so only the server side is timed."""
+        if len(records) == 1:
+            return json.dumps(records[0])
+        if len(records) <= self.max_batch_rows:
+            return json.dumps(records)
+        return '\n'.join(json.dumps(record) for record in records)
+
+    def call(self, batch_size, body):
+        url = f'/api/v1.0/runners_model/{self.endpoint(batch_size)}'
+        content_type = 'application/x-ndjson' if self.endpoint(batch_size) == 'predict/stream' else 'application/json'
+        response = self.client.post(url, data=body, headers=self.headers, content_type=content_type)
+        # Reading the body runs a streamed response to completion
+        response.get_data()
+        if response.status_code != 200:
+            raise RuntimeError(f"{url} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+
+
+def run_pipeline(records, bundle, feature_names):
+    """What /predict/batch does with a parsed body, minus HTTP and JSON."""
+    feature_matrix, row_errors, row_warnings = get_feature_schema(feature_names).parse_records(records)
+    valid_rows = np.array([i for i in range(len(records)) if i not in row_errors], dtype=int)
+
+    valid_matrix = feature_matrix[valid_rows]
+    risk_levels, probabilities = score_feature_matrix(valid_matrix, bundle)
+    alert_results = generate_alerts_batch(risk_levels, probabilities, valid_matrix, feature_names)
+
+    return [
+        build_prediction_response(
+            risk_levels[k], probabilities[k] if probabilities is not None else None, *alert_results[k], bundle.version
+        )
+        for k in range(valid_rows.size)
+    ]
+
+
+def measure(target, batch_size, calls, args):
+    """calls: one zero-argument function per distinct input batch (rotated so caches see new rows)."""
+    if batch_size < LARGE_BATCH_ROWS:
+        # Warm-up: first-call imports, allocations and lazily built schemas stay out of the numbers
+        calls[0]()
+        latencies = time_calls(lambda i: calls[i](), len(calls), args.budget, args.max_repeats)
+    else:
+        # One call of a large batch can take seconds: time it once unless the budget allows more
+        latencies = time_calls(lambda i: calls[i](), len(calls), args.budget, args.max_repeats, min_repeats=1)
+    latencies = np.array(latencies) * 1000
+
+    return {
+        'target': target,
+        'batch_size': batch_size,
+        'repeats': int(latencies.size),
+        'mean_ms': round(float(latencies.mean()), 4),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 4),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 4),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 4),
+        'max_ms': round(float(latencies.max()), 4),
+        'rows_per_s': round(batch_size * latencies.size / (latencies.sum() / 1000), 1),
+        'peak_alloc_mb': round(peak_allocation(calls[0]) / 2 ** 20, 3)
+    }
+
+
+def check_scenarios(bundle, feature_names):
+    """Scores every labeled scenario once; the benchmark is only meaningful if the model still agrees with them."""
+    feature_matrix = np.array([[scenario['data'][f] for f in feature_names] for scenario in test_scenarios], dtype=float)
+    risk_levels, _ = score_feature_matrix(feature_matrix, bundle)
+    expected = np.array([scenario['expected_risk'] for scenario in test_scenarios])
+    return {
+        'scenarios': len(test_scenarios),
+        'agreement': round(float((risk_levels == expected).mean()), 4),
+        'mismatched': [
+            {'label': scenario['label'], 'expected': int(scenario['expected_risk']), 'predicted': int(risk_level)}
+            for scenario, risk_level in zip(test_scenarios, risk_levels) if risk_level != scenario['expected_risk']
+        ]
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_metadata(bundle, args):
+    import sklearn
+
+    compiled = bundle.compiled
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'model_version': bundle.version,
+        'model_type': type(bundle.model).__name__ if bundle.model is not None else None,
+        'compiled_estimator': type(compiled.estimator).__name__ if compiled is not None else None,
+        'config': {
+            'PREDICTION_CACHE_ENABLED': args.with_cache,
+            'PREDICT_MICRO_BATCHING': Config.PREDICT_MICRO_BATCHING,
+            'INFERENCE_POOL_SIZE': Config.INFERENCE_POOL_SIZE,
+            'KNN_INDEX_ENABLED': Config.KNN_INDEX_ENABLED,
+            'METRICS_ENABLED': Config.METRICS_ENABLED
+        },
+        'args': {'sizes': args.sizes, 'targets': args.targets, 'budget': args.budget, 'noise': args.noise, 'seed': args.seed}
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r['target'], r['batch_size']): r for r in json.load(f)['results']}
+
+    print(f"\nChange against {baseline_path} (+ is better):")
+    print(f"{'target':>9} {'rows':>7} " + ' '.join(f'{field:>14}' for field, _ in COMPARED_FIELDS))
+    for result in results:
+        previous = baseline.get((result['target'], result['batch_size']))
+        if previous is None:
+            continue
+        changes = []
+        for field, higher_is_better in COMPARED_FIELDS:
+            if not previous.get(field):
+                changes.append(f"{'n/a':>14}")
+                continue
+            change = (result[field] - previous[field]) / previous[field] * 100
+            changes.append(f'{change if higher_is_better else -change:>+13.1f}%')
+        print(f"{result['target']:>9} {result['batch_size']:>7} " + ' '.join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 1000, 10000, 100000])
+    parser.add_argument('--targets', nargs='+', choices=TARGETS, default=list(TARGETS))
+    parser.add_argument('--budget', type=float, default=2.0, help='Seconds per measurement (after the minimum repeats)')
+    parser.add_argument('--max-repeats', type=int, default=1000, help='Maximum calls per measurement')
+    parser.add_argument('--noise', type=float, default=0.05, help='Std. dev. of the synthetic noise, as a fraction of each feature range')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--with-cache', action='store_true', help='Leave the prediction cache on for the client target')
+    parser.add_argument('--output', help='JSON results path (default: test_scripts/benchmark_results/pipeline-<timestamp>.json)')
+    parser.add_argument('--compare', help='Earlier results file to compare this run against')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+
+    # Targets score through the same process-wide registry the endpoints use
+    from app.utils.model_registry import model_registry
+    bundle = model_registry.ensure_loaded()
+    if bundle is None:
+        print(f"❌ Model could not be loaded: {model_registry.error}")
+        sys.exit(1)
+
+    feature_names = get_required_features(bundle)
+    client = ClientTarget(args.with_cache) if 'client' in args.targets else None
+
+    scenarios = check_scenarios(bundle, feature_names)
+    print(f"Model {bundle.version}; labeled scenarios agreement {scenarios['agreement']:.2%}")
+    print(f"{'target':>9} {'rows':>7} {'repeats':>8} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'rows/s':>12} {'peak MB':>9}")
+
+    results = []
+    for batch_size in args.sizes:
+        # A few distinct batches per size, so repeated calls do not replay one input
+        n_batches = 1 if batch_size >= LARGE_BATCH_ROWS else 8
+        batches = [make_rows(feature_names, batch_size, rng, args.noise) for _ in range(n_batches)]
+
+        for target in args.targets:
+            if target == 'core':
+                calls = [lambda m=m: score_feature_matrix(m, bundle) for m in batches]
+            elif target == 'pipeline':
+                batch_records = [to_records(feature_names, m) for m in batches]
+                calls = [lambda r=r: run_pipeline(r, bundle, feature_names) for r in batch_records]
+            else:
+                bodies = [client.prepare(to_records(feature_names, m)) for m in batches]
+                calls = [lambda b=b: client.call(batch_size, b) for b in bodies]
+
+            result = measure(target, batch_size, calls, args)
+            if target == 'client':
+                result['endpoint'] = client.endpoint(batch_size)
+            results.append(result)
+
+            print(f"{target:>9} {batch_size:>7} {result['repeats']:>8} {result['p50_ms']:>10.3f} {result['p95_ms']:>10.3f} "
+                  f"{result['p99_ms']:>10.3f} {result['rows_per_s']:>12.0f} {result['peak_alloc_mb']:>9.2f}")
+
+    metadata = run_metadata(bundle, args)
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    metadata['max_rss_mb'] = round(max_rss / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 1)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"pipeline-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+
+    with open(output, 'w') as f:
+        json.dump({'meta': metadata, 'scenarios': scenarios, 'results': results}, f, indent=2)
+    print(f"\nProcess max RSS {metadata['max_rss_mb']} MB. Results written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
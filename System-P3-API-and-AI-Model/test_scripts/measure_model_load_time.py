@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Measure cold model load time for the pickled artifact and the compact .rmodel export.
+
+Every measurement runs in a fresh interpreter so import and unpickling costs are included,
+and reports both the load_runners_model() call and the time until the first prediction.
+The compact artifact is exported to a temporary directory, so the models folder is not touched.
+
+Usage:
+    python test_scripts/measure_model_load_time.py --repeats 5
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Add the project root to the path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.config import Config
+from app.utils.model_artifact import compact_path_for, export_compact_artifact
+
+# Runs in the child interpreter; prints the timings as JSON
+CHILD_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {project_root!r})
+from app.utils.load_runners_model import load_runners_model
+from app.utils.predict_runners_model import warm_up_bundle
+imported = time.perf_counter()
+bundle = load_runners_model({model_path!r})
+loaded = time.perf_counter()
+warm_up_bundle(bundle, 1)
+predicted = time.perf_counter()
+print(json.dumps({{
+    'path': bundle.path,
+    'import_ms': (imported - started) * 1000,
+    'load_ms': (loaded - imported) * 1000,
+    'first_prediction_ms': (predicted - started) * 1000
+}}))
+"""
+
+
+def measure(model_path, artifact_format, repeats):
+    env = dict(os.environ, MODEL_ARTIFACT_FORMAT=artifact_format)
+    script = CHILD_SCRIPT.format(project_root=project_root, model_path=model_path)
+
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, '-c', script], env=env, capture_output=True, text=True, check=True
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    return {
+        'format': artifact_format,
+        'loaded_file': os.path.basename(runs[0]['path']),
+        'file_size_kb': round(os.path.getsize(runs[0]['path']) / 1024),
+        **{key: round(statistics.median(run[key] for run in runs), 1)
+           for key in ('import_ms', 'load_ms', 'first_prediction_ms')}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model-path', default=Config.MODEL_PATH)
+    parser.add_argument('--repeats', type=int, default=5, help='Fresh interpreters per format (median reported)')
+    parser.add_argument('--output', help='Optional path to write the results as JSON')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        model_path = os.path.join(work_dir, os.path.basename(args.model_path))
+        shutil.copy(args.model_path, model_path)
+        export_compact_artifact(model_path)
+        print(f"Exported {os.path.basename(compact_path_for(model_path))}")
+
+        results = [measure(model_path, artifact_format, args.repeats) for artifact_format in ('pickle', 'auto')]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{'format':>7} {'file':>42} {'size KB':>8} {'import ms':>10} {'load ms':>8} {'first prediction ms':>20}")
+    for result in results:
+        print(f"{result['format']:>7} {result['loaded_file']:>42} {result['file_size_kb']:>8} "
+              f"{result['import_ms']:>10.1f} {result['load_ms']:>8.1f} {result['first_prediction_ms']:>20.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Measure per-worker memory (RSS/PSS) of the gunicorn deployment with and without
+preloading the model in the master process. Linux only (reads /proc/<pid>/smaps_rollup).
+
+Usage:
+    python test_scripts/measure_worker_memory.py --workers 1 4 16
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def read_memory_kb(pid):
+    """Returns {'rss': kB, 'pss': kB} for a process."""
+    memory = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('Rss', 'Pss'):
+                memory[key.lower()] = int(value.split()[0])
+    return memory
+
+
+def child_pids(parent_pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces, so split after its closing parenthesis
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == parent_pid:
+            children.append(int(entry))
+    return children
+
+
+def wait_until_ready(port, master_pid, n_workers, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/health/ready', timeout=2):
+                pass
+            if len(child_pids(master_pid)) >= n_workers:
+                return True
+        except Exception:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def measure(n_workers, preload, port, settle_seconds):
+    db_path = tempfile.mktemp(suffix='.db')
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        GUNICORN_WORKERS=str(n_workers),
+        GUNICORN_PRELOAD_MODEL='true' if preload else 'false',
+        DATABASE_URL=f'sqlite:///{db_path}'
+    )
+
+    process = subprocess.Popen(
+        ['gunicorn', '-c', 'gunicorn.conf.py', 'run:app'],
+        cwd=project_root,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+    try:
+        if not wait_until_ready(port, process.pid, n_workers):
+            raise RuntimeError(f'gunicorn did not start {n_workers} workers in time')
+
+        # Let lazy imports and the first requests settle before sampling
+        time.sleep(settle_seconds)
+
+        workers = [read_memory_kb(pid) for pid in child_pids(process.pid)]
+        master = read_memory_kb(process.pid)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+        if os.path.exists(db_path):
+            os.remove(db_path)
+
+    return {
+        'workers': n_workers,
+        'preload': preload,
+        'master_rss_kb': master['rss'],
+        'master_pss_kb': master['pss'],
+        'avg_worker_rss_kb': round(sum(w['rss'] for w in workers) / len(workers)),
+        'avg_worker_pss_kb': round(sum(w['pss'] for w in workers) / len(workers)),
+        'total_pss_kb': master['pss'] + sum(w['pss'] for w in workers)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--port', type=int, default=7861)
+    parser.add_argument('--settle-seconds', type=float, default=2.0)
+    parser.add_argument('--output', help='Optional path to write the results as JSON')
+    args = parser.parse_args()
+
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        print("❌ /proc/<pid>/smaps_rollup is not available (Linux 4.14+ required)")
+        sys.exit(1)
+
+    results = []
+    print(f"{'workers':>7} {'preload':>7} {'worker RSS MB':>14} {'worker PSS MB':>14} {'total PSS MB':>13}")
+
+    for n_workers in args.workers:
+        for preload in (False, True):
+            result = measure(n_workers, preload, args.port, args.settle_seconds)
+            results.append(result)
+            print(f"{n_workers:>7} {str(preload):>7} "
+                  f"{result['avg_worker_rss_kb'] / 1024:>14.1f} "
+                  f"{result['avg_worker_pss_kb'] / 1024:>14.1f} "
+                  f"{result['total_pss_kb'] / 1024:>13.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
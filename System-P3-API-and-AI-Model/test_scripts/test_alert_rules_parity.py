@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+The default alert rule table must reproduce the hardcoded alert logic it replaced, for single rows
+and for batches, over a grid of risk levels and feature values on both sides of every threshold.
+"""
+
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import numpy as np
+
+# Add the project root to the path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.config import Config
+from app.utils.generate_alert import AlertRuleEngine, compile_rules
+
+FEATURE_NAMES = ['heart_rate', 'body_temperature', 'joint_angles', 'gait_speed', 'cadence', 'step_count',
+                 'jump_height', 'ground_reaction_force', 'range_of_motion', 'ambient_temperature']
+BASE_ROW = [62, 36.2, 178.5, 3.8, 185, 8500, 0.8, 2100, 145, 18.0]
+
+# Out-of-range risk levels took the 'Healthy' branch of the old code
+RISK_LEVELS = [-1, 0, 1, 2, 3]
+GRID = {
+    'heart_rate': [0, 159.99, 160, 160.01, 200, np.nan],
+    'body_temperature': [36.5, 37.99, 38, 38.01, np.nan],
+    'joint_angles': [0, 59.99, 60, 60.01, 120, 174.99, 175, 175.01, 200, np.nan]
+}
+
+
+def legacy_generate_alert(prediction, probabilities, feature_values):
+    """generate_alert as it was before the rule table (missing values passed as NaN, never None)."""
+    alerts = []
+    recommendations = []
+
+    if prediction == 2:  # Injured
+        alerts.append("HIGH RISK: Potential injury detected!")
+        if feature_values.get('heart_rate', 0) > 160:
+            recommendations.append("Elevated heart rate detected - consider reducing intensity")
+        if feature_values.get('body_temperature', 0) > 38:
+            recommendations.append("High body temperature - hydrate and cool down")
+
+        ja = feature_values.get('joint_angles')
+        if ja is not None and (ja < 60 or ja > 175):
+            recommendations.append("Abnormal joint angles detected - check form")
+
+    elif prediction == 1:  # Low Risk
+        alerts.append("CAUTION: Elevated injury risk indicators")
+        recommendations.append("Monitor your form and consider moderate intensity")
+
+    else:  # Healthy
+        alerts.append("OPTIMAL: All parameters within safe ranges")
+        recommendations.append("Maintain current performance level")
+
+    return alerts, recommendations
+
+
+def build_grid():
+    """Returns (risk_levels, probabilities, feature_matrix) of every grid combination."""
+    risk_levels, rows = [], []
+    for risk_level, *values in itertools.product(RISK_LEVELS, *GRID.values()):
+        row = list(BASE_ROW)
+        for name, value in zip(GRID, values):
+            row[FEATURE_NAMES.index(name)] = value
+        risk_levels.append(risk_level)
+        rows.append(row)
+
+    # Confidences on both sides of the configured thresholds (unused by the default rules)
+    confidences = [0.3, 0.45, 0.5, 0.78, 1.0]
+    probabilities = np.zeros((len(rows), 3))
+    for i, risk_level in enumerate(risk_levels):
+        confidence = confidences[i % len(confidences)]
+        probabilities[i] = (1 - confidence) / 2
+        if 0 <= risk_level < 3:
+            probabilities[i, risk_level] = confidence
+
+    return np.array(risk_levels), probabilities, np.array(rows, dtype=float)
+
+
+def expected_results(risk_levels, probabilities, feature_matrix, feature_names):
+    return [
+        legacy_generate_alert(int(risk_level), list(probabilities[i]), dict(zip(feature_names, feature_matrix[i].tolist())))
+        for i, risk_level in enumerate(risk_levels)
+    ]
+
+
+def test_batch_parity():
+    engine = AlertRuleEngine(Config.ALERT_RULES, Config.ALERT_THRESHOLDS)
+    risk_levels, probabilities, feature_matrix = build_grid()
+
+    expected = expected_results(risk_levels, probabilities, feature_matrix, FEATURE_NAMES)
+    actual = engine.evaluate(risk_levels, probabilities, feature_matrix, FEATURE_NAMES)
+
+    assert len(actual) == len(expected)
+    for i, (got, want) in enumerate(zip(actual, expected)):
+        assert (list(got[0]), list(got[1])) == want, f'row {i}: {feature_matrix[i].tolist()} at risk {risk_levels[i]}'
+    print(f"✅ Batch rule engine matches the old alerts on {len(expected)} grid rows")
+
+
+def test_single_row_parity():
+    engine = AlertRuleEngine(Config.ALERT_RULES, Config.ALERT_THRESHOLDS)
+    risk_levels, probabilities, feature_matrix = build_grid()
+    expected = expected_results(risk_levels, probabilities, feature_matrix, FEATURE_NAMES)
+
+    for i, want in enumerate(expected):
+        got = engine.evaluate(risk_levels[i:i + 1], probabilities[i:i + 1], feature_matrix[i:i + 1], FEATURE_NAMES)[0]
+        assert got == want, f'row {i}: {feature_matrix[i].tolist()} at risk {risk_levels[i]}'
+    print(f"✅ Single-row rule engine matches the old alerts on {len(expected)} grid rows")
+
+
+def test_missing_features_parity():
+    engine = AlertRuleEngine(Config.ALERT_RULES, Config.ALERT_THRESHOLDS)
+
+    # A model without the thresholded features: the old code read them as absent
+    feature_names = [name for name in FEATURE_NAMES if name not in GRID]
+    feature_matrix = np.array([[BASE_ROW[FEATURE_NAMES.index(name)] for name in feature_names]] * len(RISK_LEVELS))
+    risk_levels = np.array(RISK_LEVELS)
+
+    expected = expected_results(risk_levels, np.zeros((len(RISK_LEVELS), 3)), feature_matrix, feature_names)
+    batch = engine.evaluate(risk_levels, None, feature_matrix, feature_names)
+    assert [(list(a), list(r)) for a, r in batch] == expected
+
+    for i, want in enumerate(expected):
+        assert engine.evaluate(risk_levels[i:i + 1], None, feature_matrix[i:i + 1], feature_names)[0] == want
+    print("✅ Rule engine matches the old alerts when thresholded features are missing")
+
+
+def test_membership_rules_need_value_lists():
+    # Rejected when compiled, rather than failing on every scored row
+    for condition in (['in', 2], ['in'], ['not_in', 2], ['not_in'], ['in', []], ['not_in', {'a': 1}]):
+        try:
+            compile_rules([{'when': {'risk_level': condition}, 'alert': 'x'}], Config.ALERT_THRESHOLDS)
+            assert False, f'{condition} was accepted'
+        except ValueError as e:
+            assert 'non-empty list' in str(e), str(e)
+
+    engine = AlertRuleEngine([
+        {'when': {'risk_level': ['in', 1, 2]}, 'alert': 'elevated'},
+        {'when': {'risk_level': ['in', [2]]}, 'alert': 'injured'},
+        {'when': {'risk_level': ['not_in', 0, 1]}, 'recommendation': 'rest'}
+    ], Config.ALERT_THRESHOLDS)
+    risk_levels = np.array(RISK_LEVELS)
+    feature_matrix = np.array([BASE_ROW] * len(RISK_LEVELS), dtype=float)
+    expected = [
+        ((['elevated'] if r in (1, 2) else []) + (['injured'] if r == 2 else []), ['rest'] if r not in (0, 1) else [])
+        for r in RISK_LEVELS
+    ]
+
+    batch = engine.evaluate(risk_levels, None, feature_matrix, FEATURE_NAMES)
+    assert [(list(a), list(r)) for a, r in batch] == expected
+    for i, want in enumerate(expected):
+        assert engine.evaluate(risk_levels[i:i + 1], None, feature_matrix[i:i + 1], FEATURE_NAMES)[0] == want
+    print("✅ 'in'/'not_in' rules need a non-empty value list and work on batches and single rows")
+
+
+def test_invalid_rules_file_keeps_current_rules():
+    work_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(work_dir, 'alert_rules.json')
+        engine = AlertRuleEngine(Config.ALERT_RULES, Config.ALERT_THRESHOLDS, path=path, check_interval=0)
+        risk_levels, probabilities, feature_matrix = build_grid()
+        before = engine.evaluate(risk_levels, probabilities, feature_matrix, FEATURE_NAMES)
+
+        with open(path, 'w') as f:
+            json.dump([{'when': {'risk_level': ['in', 2]}, 'alert': 'x'}], f)
+
+        # Scoring still works, with the rules from before the broken file
+        after = engine.evaluate(risk_levels, probabilities, feature_matrix, FEATURE_NAMES)
+        assert after == before
+        assert engine.source == 'config' and 'non-empty list' in engine.error
+        for i in range(0, len(risk_levels), 97):
+            assert engine.evaluate(risk_levels[i:i + 1], probabilities[i:i + 1], feature_matrix[i:i + 1],
+                                   FEATURE_NAMES)[0] == before[i]
+        print("✅ A rules file with an invalid 'in' condition is not loaded")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_batch_parity()
+        test_single_row_parity()
+        test_missing_features_parity()
+        test_membership_rules_need_value_lists()
+        test_invalid_rules_file_keeps_current_rules()
+    except AssertionError:
+        sys.exit(1)
+    sys.exit(0)
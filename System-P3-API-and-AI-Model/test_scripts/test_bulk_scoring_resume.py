@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+An interrupted bulk scoring run continued with resume=True must write exactly the output of a run
+that was never interrupted, including when the interruption left part of a chunk after the checkpoint.
+A run whose workers cannot load the model must fail with that error rather than hang.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+# Add the project root to the path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.utils.bulk_scoring import CsvInput, checkpoint_path_for, run_bulk_scoring
+
+MODEL_PATH = os.path.join(project_root, 'app', 'ai_classification_models', 'runners_injury_prediction_model.pkl')
+
+CSV_HEADER = ('id,heart_rate,body_temperature,joint_angles,gait_speed,cadence,step_count,jump_height,'
+              'ground_reaction_force,range_of_motion,ambient_temperature\n')
+CHUNK_ROWS = 7
+INTERRUPT_AFTER_CHUNKS = 3
+
+
+class Interrupted(Exception):
+    pass
+
+
+def write_input(path, rows=50):
+    """Readings from healthy to injured, plus a blank line and an unparseable row."""
+    with open(path, 'w') as f:
+        f.write(CSV_HEADER)
+        for k in range(rows):
+            t = k / (rows - 1)
+            f.write(f'r{k},{62 + 33 * t:.1f},{36.2 + 2 * t:.1f},{178.5 - 133.5 * t:.1f},{3.8 - 3 * t:.2f},'
+                    f'{185 - 65 * t:.0f},{8500 - 8300 * t:.0f},{0.8 - 0.7 * t:.2f},{2100 - 1800 * t:.0f},'
+                    f'{145 - 115 * t:.0f},18.0\n')
+            if k == 10:
+                f.write('\n')
+            if k == 20:
+                f.write('r-bad,fast,,,,,,,,,\n')
+
+
+def score(input_path, output_path, output_format, resume=False, on_progress=None):
+    source = CsvInput(input_path, CHUNK_ROWS, id_column='id')
+    return run_bulk_scoring(source, output_path, MODEL_PATH, 'default', output_format=output_format,
+                            resume=resume, echo=lambda message: None, on_progress=on_progress)
+
+
+def check_resume(output_format):
+    work_dir = tempfile.mkdtemp()
+    try:
+        input_path = os.path.join(work_dir, 'readings.csv')
+        write_input(input_path)
+
+        complete_path = os.path.join(work_dir, f'complete.{output_format}')
+        complete = score(input_path, complete_path, output_format)
+
+        def interrupt(checkpoint):
+            if checkpoint['chunks_done'] == INTERRUPT_AFTER_CHUNKS:
+                raise Interrupted()
+
+        resumed_path = os.path.join(work_dir, f'resumed.{output_format}')
+        try:
+            score(input_path, resumed_path, output_format, on_progress=interrupt)
+            assert False, 'the run was not interrupted'
+        except Interrupted:
+            pass
+
+        # A crash in the middle of writing the next chunk leaves a partial line behind the checkpoint
+        with open(resumed_path, 'ab') as f:
+            f.write(b'{"index": 999, "risk_le')
+
+        resumed = score(input_path, resumed_path, output_format, resume=True)
+
+        with open(complete_path, 'rb') as f:
+            expected = f.read()
+        with open(resumed_path, 'rb') as f:
+            actual = f.read()
+
+        assert resumed['completed'] and resumed['chunks_done'] == complete['chunks_total'] > INTERRUPT_AFTER_CHUNKS
+        assert (resumed['rows'], resumed['failed']) == (complete['rows'], complete['failed'])
+        assert complete['failed'] == 1
+        assert actual == expected, f'resumed {output_format} output differs from the uninterrupted run'
+        assert os.path.exists(checkpoint_path_for(resumed_path))
+        print(f"✅ Resumed {output_format} output is byte-identical ({complete['rows']} rows, "
+              f"{complete['chunks_total']} chunks, interrupted after {INTERRUPT_AFTER_CHUNKS})")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_resume_csv_output():
+    check_resume('csv')
+
+
+def test_resume_ndjson_output():
+    check_resume('ndjson')
+
+
+def test_worker_load_failure_ends_run():
+    work_dir = tempfile.mkdtemp()
+    try:
+        input_path = os.path.join(work_dir, 'readings.csv')
+        write_input(input_path)
+        model_path = os.path.join(work_dir, os.path.basename(MODEL_PATH))
+        shutil.copy2(MODEL_PATH, model_path)
+
+        def change_model(checkpoint):
+            # After the parent loaded the model, before the workers do: they load another version
+            if checkpoint['chunks_done'] == 0:
+                with open(model_path, 'ab') as f:
+                    f.write(b'changed')
+
+        outcome = {}
+
+        def run():
+            source = CsvInput(input_path, CHUNK_ROWS, id_column='id')
+            try:
+                run_bulk_scoring(source, os.path.join(work_dir, 'results.ndjson'), model_path, 'default', workers=2,
+                                 echo=lambda message: None, on_progress=change_model)
+            except Exception as e:
+                outcome['error'] = e
+
+        runner = threading.Thread(target=run, daemon=True)
+        runner.start()
+        runner.join(120)
+
+        assert not runner.is_alive(), 'the run hung on workers that cannot load the model'
+        assert isinstance(outcome.get('error'), RuntimeError), outcome
+        assert 'Model changed during the run' in str(outcome['error'])
+        print(f"✅ A worker that cannot load the model ends the run: {outcome['error']}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_resume_csv_output()
+        test_resume_ndjson_output()
+        test_worker_load_failure_ends_run()
+    except AssertionError:
+        sys.exit(1)
+    sys.exit(0)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Parity test for the compiled NumPy evaluator against the pickled scikit-learn model.
+Probabilities must be bit-identical, not just close.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+# Add the project root to the path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.utils.compile_runners_model import compile_runners_model
+from app.utils.model_artifact import compact_path_for, export_compact_artifact, read_compact_artifact
+
+MODEL_PATH = os.path.join(project_root, 'app', 'ai_classification_models', 'runners_injury_prediction_model.pkl')
+
+
+def compare(name, model, scaler, feature_matrix, compiled=None):
+    compiled = compiled or compile_runners_model(model, scaler)
+    if compiled is None:
+        print(f"❌ {name}: estimator {type(model).__name__} is not supported by the compiler")
+        return False
+
+    expected = model.predict_proba(scaler.transform(feature_matrix) if scaler is not None else feature_matrix)
+    actual = compiled.predict_proba(feature_matrix)
+
+    mismatched_rows = int((expected != actual).any(axis=1).sum())
+    max_diff = float(np.abs(expected - actual).max())
+
+    if mismatched_rows:
+        print(f"❌ {name}: {mismatched_rows}/{len(feature_matrix)} rows differ (max abs diff {max_diff:.3e})")
+        return False
+
+    print(f"✅ {name}: {len(feature_matrix)} rows bit-identical")
+    return True
+
+
+def test_pickled_model_parity():
+    artifact = joblib.load(MODEL_PATH)
+    model, scaler = artifact['model'], artifact['scaler']
+    rng = np.random.default_rng(42)
+
+    # Rows spread around the training distribution
+    random_rows = scaler.mean_ + rng.normal(size=(5000, len(scaler.mean_))) * scaler.scale_ * 1.5
+    assert compare('Pickled model (random rows)', model, scaler, random_rows)
+
+    # Training points exercise the zero-distance branch of distance weighting
+    if hasattr(model, '_fit_X'):
+        training_rows = scaler.inverse_transform(model._fit_X[:500])
+        assert compare('Pickled model (training rows)', model, scaler, training_rows)
+
+
+def test_random_forest_parity():
+    rng = np.random.default_rng(7)
+    X = rng.normal(size=(1000, 10))
+    y = (X[:, 0] + X[:, 1] > 0).astype(int) + (X[:, 2] > 1).astype(int)
+
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=50, max_depth=10, random_state=42)
+    model.fit(scaler.transform(X), y)
+
+    assert compare('RandomForestClassifier', model, scaler, rng.normal(size=(2000, 10)))
+
+
+def test_compact_artifact_parity():
+    artifact = joblib.load(MODEL_PATH)
+    model, scaler = artifact['model'], artifact['scaler']
+    rng = np.random.default_rng(42)
+    random_rows = scaler.mean_ + rng.normal(size=(5000, len(scaler.mean_))) * scaler.scale_ * 1.5
+
+    # Export a copy so the models folder is left untouched
+    work_dir = tempfile.mkdtemp()
+    try:
+        model_path = os.path.join(work_dir, os.path.basename(MODEL_PATH))
+        shutil.copy(MODEL_PATH, model_path)
+        export_compact_artifact(model_path)
+        _, compiled = read_compact_artifact(compact_path_for(model_path), mmap_mode='r')
+
+        assert compare('Compact artifact (memory-mapped)', model, scaler, random_rows, compiled=compiled)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_pickled_model_parity()
+        test_random_forest_parity()
+        test_compact_artifact_parity()
+    except AssertionError:
+        sys.exit(1)
+    sys.exit(0)
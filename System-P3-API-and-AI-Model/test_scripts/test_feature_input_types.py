@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Feature values that are lists, objects or nested lists must be rejected as not numeric, field by
+field, by /predict and /predict/batch, never scored as their first element or failed with a 500.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+# Add the project root to the path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app import create_app
+from app.config import Config
+
+API_URL = '/api/v1.0/runners_model'
+VALID_RECORD = {
+    'heart_rate': 62, 'body_temperature': 36.2, 'joint_angles': 178.5, 'gait_speed': 3.8, 'cadence': 185,
+    'step_count': 8500, 'jump_height': 0.8, 'ground_reaction_force': 2100, 'range_of_motion': 145,
+    'ambient_temperature': 18.0
+}
+BAD_VALUES = [[150], [150, 160], {'value': 150}, [[150]], []]
+
+
+def make_client():
+    """A test client of an app on a temporary database, logged in as a coach."""
+    work_dir = tempfile.mkdtemp()
+
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(work_dir, 'features.db')
+        MODEL_LOADING_MODE = 'lazy'
+        MODEL_WATCH_INTERVAL_SECONDS = 0
+        PREDICTION_CACHE_ENABLED = False
+
+    app = create_app(TestConfig)
+    client = app.test_client()
+    client.post('/api/v1.0/user/register', json={'email': 'coach@example.com', 'password': 'p', 'type': 'coach', 'name': 'Coach'})
+    token = client.post('/api/v1.0/user/login', json={'email': 'coach@example.com', 'password': 'p'}).get_json()['token']
+    return client, {'Authorization': f'Bearer {token}'}, work_dir
+
+
+def assert_not_numeric(details, field):
+    assert [(d['field'], d['code']) for d in details] == [(field, 'not_numeric')], details
+
+
+def test_predict_rejects_non_scalar_values():
+    client, headers, work_dir = make_client()
+    try:
+        for value in BAD_VALUES:
+            response = client.post(f'{API_URL}/predict', json={**VALID_RECORD, 'heart_rate': value}, headers=headers)
+            assert response.status_code == 400, f'{value!r}: {response.status_code} {response.get_json()}'
+            assert_not_numeric(response.get_json()['details'], 'heart_rate')
+
+        assert client.post(f'{API_URL}/predict', json=VALID_RECORD, headers=headers).status_code == 200
+        print(f"✅ /predict rejects {len(BAD_VALUES)} kinds of non-scalar values with a field error")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_batch_reports_non_scalar_values_per_row():
+    client, headers, work_dir = make_client()
+    try:
+        for value in BAD_VALUES:
+            # Every record with the same shape of value (which NumPy would convert as a 2-D column),
+            # then mixed with valid records
+            for records in ([{**VALID_RECORD, 'heart_rate': value}] * 3,
+                            [VALID_RECORD, {**VALID_RECORD, 'heart_rate': value}, VALID_RECORD]):
+                response = client.post(f'{API_URL}/predict/batch', json={'records': records}, headers=headers)
+                assert response.status_code == 200, f'{value!r}: {response.status_code} {response.get_json()}'
+
+                results = response.get_json()['results']
+                for record, result in zip(records, results):
+                    if record is VALID_RECORD:
+                        assert 'risk_level' in result
+                    else:
+                        assert_not_numeric(result['details'], 'heart_rate')
+
+        response = client.post(f'{API_URL}/predict/batch', headers=headers, json={'columns': {
+            **{name: [value] * 2 for name, value in VALID_RECORD.items()}, 'heart_rate': [[150], [160]]
+        }})
+        assert response.status_code == 200
+        for result in response.get_json()['results']:
+            assert_not_numeric(result['details'], 'heart_rate')
+        print("✅ /predict/batch reports non-scalar values as per-row field errors")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_predict_rejects_non_scalar_values()
+        test_batch_reports_non_scalar_values_per_row()
+    except AssertionError:
+        sys.exit(1)
+    sys.exit(0)
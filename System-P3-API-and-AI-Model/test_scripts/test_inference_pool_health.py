@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Health checks of the inference pool must not stall scoring: while a hung worker runs out its
+ping timeout, requests keep being served by the other workers, and the hung one is replaced.
+A worker must never score with a model version other than the request's bundle.
+"""
+
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+
+# Add the project root to the path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.utils.inference_pool import InferencePool
+from app.utils.load_runners_model import load_runners_model
+from app.utils.predict_runners_model import score_feature_matrix
+
+MODEL_PATH = os.path.join(project_root, 'app', 'ai_classification_models', 'runners_injury_prediction_model.pkl')
+PING_TIMEOUT = 2.0
+
+
+def test_hung_worker_does_not_block_scoring():
+    bundle = load_runners_model(MODEL_PATH)
+    rows = bundle.scaler.mean_[np.newaxis, :].repeat(4, axis=0)
+    expected_levels, _ = score_feature_matrix(rows, bundle)
+
+    # No background health loop: the test runs the check itself
+    pool = InferencePool(2, timeout=30.0, health_interval=0, ping_timeout=PING_TIMEOUT)
+    try:
+        # Warm both workers up (the idle queue hands them out in turn)
+        for _ in range(2):
+            pool.score(rows, bundle)
+
+        hung = pool._idle.queue[0]
+        os.kill(hung.process.pid, signal.SIGSTOP)
+
+        checker = threading.Thread(target=pool.check_health)
+        started = time.monotonic()
+        checker.start()
+        time.sleep(0.1)
+
+        # The hung worker is being pinged; the healthy one still serves requests
+        risk_levels, _ = pool.score(rows, bundle)
+        scored_after = time.monotonic() - started
+        assert np.array_equal(risk_levels, expected_levels)
+        assert scored_after < PING_TIMEOUT, f'scoring waited {scored_after:.2f}s for the health check'
+
+        checker.join()
+        checked_after = time.monotonic() - started
+        assert checked_after < 30.0, 'the scoring timeout was used for the ping'
+
+        metrics = pool.get_metrics()
+        assert metrics['restarts'] == 1
+        assert metrics['idle_workers'] == 2 and metrics['alive_workers'] == 2
+        assert hung not in pool._workers
+
+        # The replacement scores too
+        for _ in range(2):
+            risk_levels, _ = pool.score(rows, bundle)
+            assert np.array_equal(risk_levels, expected_levels)
+
+        print(f"✅ Scored in {scored_after:.2f}s during a {checked_after:.1f}s health check; hung worker replaced")
+    finally:
+        pool.shutdown()
+
+
+def test_changed_artifact_is_not_scored_under_old_version():
+    work_dir = tempfile.mkdtemp()
+    model_path = os.path.join(work_dir, os.path.basename(MODEL_PATH))
+    shutil.copy2(MODEL_PATH, model_path)
+
+    bundle = load_runners_model(model_path)
+    rows = bundle.scaler.mean_[np.newaxis, :].repeat(4, axis=0)
+    expected_levels, expected_probabilities = score_feature_matrix(rows, bundle)
+
+    # The file changes after the parent loaded it, before the worker does
+    with open(model_path, 'ab') as f:
+        f.write(b'changed')
+
+    pool = InferencePool(1, timeout=30.0, health_interval=0)
+    try:
+        for calls in (1, 2):
+            risk_levels, probabilities = pool.score(rows, bundle)
+            assert np.array_equal(risk_levels, expected_levels)
+            assert np.array_equal(probabilities, expected_probabilities)
+            assert pool.get_metrics()['version_fallbacks'] == calls
+
+        # Once the new version is the one requested, the worker scores it
+        new_bundle = load_runners_model(model_path)
+        assert new_bundle.version != bundle.version
+        pool.score(rows, new_bundle)
+        metrics = pool.get_metrics()
+        assert metrics['version_fallbacks'] == 2 and metrics['errors'] == 0 and metrics['calls'] == 3
+        print(f"✅ Rows for {bundle.version} are scored inline while the worker has {new_bundle.version}")
+    finally:
+        pool.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_hung_worker_does_not_block_scoring()
+        test_changed_artifact_is_not_scored_under_old_version()
+    except AssertionError:
+        sys.exit(1)
+    sys.exit(0)
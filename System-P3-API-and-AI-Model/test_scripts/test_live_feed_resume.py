@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Last-Event-ID resume tests for the live feed: within one process, after a restart (a new feed),
+and after an idle topic was evicted. A client must either get every event it missed or a reset.
+"""
+
+import os
+import sys
+from flask import Flask
+
+# Add the project root to the path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.utils.live_feed import LiveFeed, sse_response, sse_stream
+
+
+def read_messages(stream, count):
+    """The next `count` non-heartbeat SSE messages of a stream, as {'id', 'event', 'data'} dicts."""
+    messages = []
+    while len(messages) < count:
+        chunk = next(stream)
+        for block in chunk.split('\n\n'):
+            fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line and not line.startswith(':'))
+            if 'event' in fields:
+                messages.append(fields)
+    return messages[:count]
+
+
+def open_stream(feed, topic, last_event_id):
+    stream = sse_stream(feed, topic, last_event_id, heartbeat_seconds=0.05, max_seconds=5)
+    assert next(stream).startswith('retry:')
+    return stream
+
+
+def test_resume_in_same_process():
+    feed = LiveFeed(replay_events=16)
+    ids = [feed.publish(['session:1'], 'sensor_data', {'n': n}) for n in range(5)]
+
+    stream = open_stream(feed, 'session:1', feed.format_event_id(ids[1]))
+    messages = read_messages(stream, 3)
+    stream.close()
+
+    assert [m['event'] for m in messages] == ['sensor_data'] * 3
+    assert [m['id'] for m in messages] == [feed.format_event_id(i) for i in ids[2:]]
+    print("✅ Resume within the process replays exactly the missed events")
+
+
+def test_resume_after_restart():
+    before = LiveFeed(replay_events=16)
+    for n in range(10):
+        before.publish(['session:1'], 'sensor_data', {'n': n})
+    last_seen = before.format_event_id(before.last_event_id)
+
+    # The restarted process counts from 1 again, below the client's last id
+    after = LiveFeed(replay_events=16)
+    after.publish(['session:1'], 'sensor_data', {'n': 'after restart'})
+
+    stream = open_stream(after, 'session:1', last_seen)
+    reset = read_messages(stream, 1)[0]
+    assert reset['event'] == 'reset'
+    assert reset['id'] == after.format_event_id(after.last_event_id)
+
+    # New events flow again right away, not once the counter passes the old id
+    new_id = after.publish(['session:1'], 'prediction', {'n': 'new'})
+    event = read_messages(stream, 1)[0]
+    stream.close()
+
+    assert event['event'] == 'prediction' and event['id'] == after.format_event_id(new_id)
+    print("✅ Resume after a restart sends a reset, then the new events")
+
+
+def test_resume_with_unknown_id():
+    feed = LiveFeed()
+    feed.publish(['session:1'], 'sensor_data', {})
+
+    # Bare counters (ids before epochs were added) and garbage are unknown as well
+    for last_event_id in ('1', 'not-an-id', f'{feed.epoch}-99'):
+        stream = open_stream(feed, 'session:1', last_event_id)
+        assert read_messages(stream, 1)[0]['event'] == 'reset', last_event_id
+        stream.close()
+    print("✅ Unknown Last-Event-IDs get a reset")
+
+
+def test_resume_after_topic_eviction():
+    feed = LiveFeed(replay_events=16, max_topics=1)
+    first = feed.publish(['session:1'], 'sensor_data', {'n': 1})
+
+    # Publishing to another topic evicts the idle session:1 topic and its buffer
+    feed.publish(['session:2'], 'sensor_data', {})
+    recreated = feed.publish(['session:1'], 'sensor_data', {'n': 2})
+
+    stream = open_stream(feed, 'session:1', feed.format_event_id(first))
+    messages = read_messages(stream, 2)
+    stream.close()
+
+    assert messages[0]['event'] == 'reset'
+    assert messages[1]['id'] == feed.format_event_id(recreated)
+    print("✅ Resume on an evicted topic sends a reset")
+
+
+def test_reset_is_not_repeated():
+    feed = LiveFeed(replay_events=2)
+    first = feed.publish(['session:1'], 'sensor_data', {})
+    for _ in range(4):
+        feed.publish(['session:1'], 'sensor_data', {})
+
+    stream = open_stream(feed, 'session:1', feed.format_event_id(first))
+    messages = read_messages(stream, 3)
+    # Only heartbeats follow while nothing is published
+    for _ in range(3):
+        assert next(stream) == ': heartbeat\n\n'
+    stream.close()
+
+    assert [m['event'] for m in messages] == ['reset', 'sensor_data', 'sensor_data']
+    print("✅ A reset is sent once per gap")
+
+
+def test_sync_gunicorn_worker_is_refused():
+    feed = LiveFeed()
+    app = Flask(__name__)
+    app.add_url_rule('/live', 'live', lambda: sse_response(feed, 'session:1'))
+    client = app.test_client()
+
+    response = client.get('/live', environ_overrides={'SERVER_SOFTWARE': 'gunicorn/23.0.0', 'wsgi.multithread': False})
+    assert response.status_code == 503
+
+    response = client.get('/live', environ_overrides={'SERVER_SOFTWARE': 'gunicorn/23.0.0', 'wsgi.multithread': True},
+                          buffered=False)
+    assert response.status_code == 200 and response.mimetype == 'text/event-stream'
+    response.close()
+    print("✅ Live feeds are refused on sync gunicorn workers only")
+
+
+if __name__ == "__main__":
+    try:
+        test_resume_in_same_process()
+        test_resume_after_restart()
+        test_resume_with_unknown_id()
+        test_resume_after_topic_eviction()
+        test_reset_is_not_repeated()
+        test_sync_gunicorn_worker_is_refused()
+    except AssertionError:
+        sys.exit(1)
+    sys.exit(0)
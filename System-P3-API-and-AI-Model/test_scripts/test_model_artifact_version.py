@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+A pickled model and its compact export must load as the same model version, and the check for
+a stale export must not hash the pickle when it is unchanged.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+# Add the project root to the path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.utils import load_runners_model as loader
+from app.utils.model_artifact import compact_path_for, export_compact_artifact
+
+MODEL_PATH = os.path.join(project_root, 'app', 'ai_classification_models', 'runners_injury_prediction_model.pkl')
+
+
+def exported_copy():
+    """A copy of the shipped pickle with its compact export, in a temporary directory."""
+    work_dir = tempfile.mkdtemp()
+    model_path = os.path.join(work_dir, os.path.basename(MODEL_PATH))
+    shutil.copy2(MODEL_PATH, model_path)
+    return work_dir, model_path
+
+
+def test_export_keeps_version():
+    work_dir, model_path = exported_copy()
+    try:
+        from_pickle = loader.load_runners_model(model_path, label='default')
+        export_compact_artifact(model_path)
+        from_export = loader.load_runners_model(model_path, label='default')
+
+        assert from_export.path == compact_path_for(model_path), 'the compact artifact was not used'
+        assert from_export.version == from_pickle.version
+        assert from_export.checksum == from_pickle.checksum
+        print(f"✅ Pickle and export load as {from_pickle.version}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_unchanged_pickle_is_not_hashed():
+    work_dir, model_path = exported_copy()
+    hashed = []
+    compute_checksum = loader.compute_checksum
+    try:
+        export_compact_artifact(model_path)
+
+        loader.compute_checksum = lambda path: hashed.append(path) or compute_checksum(path)
+        assert loader.find_compact_artifact(model_path) == compact_path_for(model_path)
+        assert hashed == [], 'the unchanged pickle was hashed'
+
+        # Touched but identical: hashed once, and still accepted
+        os.utime(model_path)
+        assert loader.find_compact_artifact(model_path) == compact_path_for(model_path)
+        assert hashed == [model_path]
+        print("✅ Stale-export check hashes the pickle only when its size or mtime changed")
+    finally:
+        loader.compute_checksum = compute_checksum
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_changed_pickle_ignores_export():
+    work_dir, model_path = exported_copy()
+    try:
+        export_compact_artifact(model_path)
+        with open(model_path, 'ab') as f:
+            f.write(b'\0')
+
+        assert loader.find_compact_artifact(model_path) is None
+        print("✅ An export of a different pickle is ignored")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_export_keeps_version()
+        test_unchanged_pickle_is_not_hashed()
+        test_changed_pickle_ignores_export()
+    except AssertionError:
+        sys.exit(1)
+    sys.exit(0)
@@ -7,16 +7,18 @@ sys.path.insert(0, project_root)
 
 try:
     print("Attempting to import load_runners_model...")
-    from ..app.utils.load_runners_model import load_runners_model, model, scaler
+    from app.utils.load_runners_model import load_runners_model
 
     print("Calling load_runners_model()...")
-    load_runners_model()
+    bundle = load_runners_model()
+    model, scaler = bundle.model, bundle.scaler
 
     if model is None:
         print("ERROR: Model is None after loading")
         sys.exit(1)
     else:
         print(f"SUCCESS: Model loaded successfully")
+        print(f"Model version: {bundle.version}")
         print(f"Model type: {type(model)}")
 
         if scaler:
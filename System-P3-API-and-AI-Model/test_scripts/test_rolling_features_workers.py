@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Rolling session statistics kept by several workers (one RollingFeatureEngine each) must match the
+statistics rebuilt from the database, whichever worker ingested, edited or deleted each reading.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+# Add the project root to the path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app import create_app
+from app.config import Config, db
+from app.models.athlete import Athlete
+from app.models.coach import Coach
+from app.models.sensor_data import SensorData
+from app.models.session import Session
+from app.utils.rolling_features import RollingFeatureEngine, mark_readings_changed
+
+FEATURES = ['heart_rate', 'cadence']
+WINDOWS = [('seconds', 30.0), ('samples', 5)]
+START = datetime(2026, 1, 1, 8, 0, 0)
+
+
+def make_app():
+    """An app on a temporary database with one coach, athlete and session."""
+    work_dir = tempfile.mkdtemp()
+
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(work_dir, 'rolling.db')
+        MODEL_LOADING_MODE = 'lazy'
+        MODEL_WATCH_INTERVAL_SECONDS = 0
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        audit = {'created_on': date.today(), 'created_by': 'test'}
+        coach = Coach(name='Coach', email='coach@example.com', password='x', **audit)
+        athlete = Athlete(name='Athlete', email='athlete@example.com', password='x', coach=coach, **audit)
+        db.session.add(Session(athlete=athlete, coach=coach, **audit))
+        db.session.commit()
+    return app, work_dir
+
+
+def make_engine():
+    return RollingFeatureEngine(FEATURES, WINDOWS, max_buffer=100)
+
+
+def ingest(n):
+    """Stores reading n of session 1 and returns (id, recorded_at, values) as the ingest route passes them."""
+    values = {'heart_rate': 120.0 + 3 * n + (n % 4), 'cadence': 170.0 + (n % 3), 'step_count': 100 * n}
+    reading = SensorData(
+        session_id=1, body_temperature=37.0, ambient_temperature=18.0, joint_angles=170.0, gait_speed=3.5,
+        jump_height=0.5, ground_reaction_force=2000.0, range_of_motion=140.0,
+        recorded_at=START + timedelta(seconds=2 * n), created_on=date.today(), created_by='test', **values
+    )
+    db.session.add(reading)
+    db.session.commit()
+    return reading.id, reading.recorded_at, values
+
+
+def rebuilt():
+    """The snapshot a worker that never saw the session builds from the database."""
+    return make_engine().snapshot(1)
+
+
+def test_readings_ingested_by_other_workers():
+    app, work_dir = make_app()
+    try:
+        with app.app_context():
+            first, second = make_engine(), make_engine()
+
+            first.update(1, *ingest(1))
+            first.update(1, *ingest(2))
+
+            # Reading 3 goes through the second worker, reading 4 through the first again:
+            # the first must apply 3 before 4, not skip it
+            second.update(1, *ingest(3))
+            snapshot = first.update(1, *ingest(4))
+            assert snapshot['samples'] == 4
+            assert snapshot == rebuilt()
+
+            # Readings 5 and 6 through the first worker; the second reads the session afterwards
+            first.update(1, *ingest(5))
+            first.update(1, *ingest(6))
+            assert second.snapshot(1) == first.snapshot(1) == rebuilt()
+
+            # Stored, but applied out of order: 8 reaches its worker before 7 does
+            seventh, eighth = ingest(7), ingest(8)
+            second.update(1, *eighth)
+            first.update(1, *seventh)
+            assert first.snapshot(1) == second.snapshot(1) == rebuilt()
+            assert rebuilt()['sensor_data_id'] == eighth[0]
+        print("✅ Workers apply readings ingested elsewhere in id order")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_edits_and_deletes_on_other_workers():
+    app, work_dir = make_app()
+    try:
+        with app.app_context():
+            first, second = make_engine(), make_engine()
+            for n in range(1, 7):
+                first.update(1, *ingest(n))
+            assert second.snapshot(1) == first.snapshot(1)
+
+            # Edited through the first worker, as the update route does
+            reading = db.session.get(SensorData, 3)
+            reading.heart_rate = 200.0
+            mark_readings_changed(1)
+            db.session.commit()
+            first.invalidate(1)
+
+            snapshot = second.snapshot(1)
+            assert snapshot['windows']['5_samples']['heart_rate']['mean'] > 140
+            assert snapshot == first.snapshot(1) == rebuilt()
+
+            # Deleted through the second worker
+            reading = db.session.get(SensorData, 6)
+            reading.deleted_on = date.today()
+            mark_readings_changed(1)
+            db.session.commit()
+            second.invalidate(1)
+
+            snapshot = first.snapshot(1)
+            assert snapshot['samples'] == 5 and snapshot['sensor_data_id'] == 5
+            assert snapshot == second.snapshot(1) == rebuilt()
+        print("✅ Edits and deletes through one worker reach the others")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_readings_ingested_by_other_workers()
+        test_edits_and_deletes_on_other_workers()
+    except AssertionError:
+        sys.exit(1)
+    sys.exit(0)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Scoring job queue tests: claims by competing workers, recovery of jobs whose worker went silent,
+and cancellation of queued and running jobs.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+# Add the project root to the path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app import create_app
+from app.config import Config, db
+from app.models.coach import Coach
+from app.models.scoring_job import ScoringJob
+from app.utils.scoring_jobs import ScoringJobWorker, cancel_scoring_job, job_paths, jobs_dir, submit_scoring_job
+
+CSV_HEADER = ('heart_rate,body_temperature,joint_angles,gait_speed,cadence,step_count,jump_height,'
+              'ground_reaction_force,range_of_motion,ambient_temperature\n')
+CSV_ROW = '62,36.2,178.5,3.8,185,8500,0.8,2100,145,18.0\n'
+
+
+def make_app():
+    """An app on a temporary database and jobs directory, with no model loading or watching threads."""
+    work_dir = tempfile.mkdtemp()
+
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(work_dir, 'jobs.db')
+        SCORING_JOBS_DIR = os.path.join(work_dir, 'scoring_jobs')
+        MODEL_LOADING_MODE = 'lazy'
+        MODEL_WATCH_INTERVAL_SECONDS = 0
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        coach = Coach(name='Coach', email='coach@example.com', password='x', created_on=date.today(), created_by='test')
+        db.session.add(coach)
+        db.session.commit()
+    return app, work_dir
+
+
+def submit_csv_job(app, rows=20):
+    with app.app_context():
+        owner = db.session.get(Coach, 1)
+
+        def write_input(path):
+            with open(path, 'w') as f:
+                f.write(CSV_HEADER + CSV_ROW * rows)
+
+        return submit_scoring_job(app, owner, 'csv', 'default', 'ndjson', write_input=write_input,
+                                  input_name='readings.csv').id
+
+
+def make_worker(app, **kwargs):
+    with app.app_context():
+        return ScoringJobWorker(app, chunk_rows=5, echo=lambda message: None, **kwargs)
+
+
+def get_job(app, job_id):
+    with app.app_context():
+        job = db.session.get(ScoringJob, job_id)
+        db.session.expunge(job)
+        return job
+
+
+def make_stale(app, job_id):
+    """Moves a running job's heartbeat into the past, as if its worker had died."""
+    table = ScoringJob.__table__
+    with app.app_context(), db.engine.begin() as connection:
+        connection.execute(table.update().where(table.c.id == job_id).values(
+            heartbeat_at=datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=1)
+        ))
+
+
+def test_job_is_claimed_once():
+    app, work_dir = make_app()
+    try:
+        job_id = submit_csv_job(app)
+        workers = [make_worker(app) for _ in range(4)]
+
+        # All workers go for the only queued job at the same moment
+        barrier = threading.Barrier(len(workers))
+        claims = [None] * len(workers)
+
+        def claim(k):
+            barrier.wait()
+            claims[k] = workers[k].claim()
+
+        threads = [threading.Thread(target=claim, args=(k,)) for k in range(len(workers))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        winners = [k for k, job in enumerate(claims) if job is not None]
+        assert len(winners) == 1, f'{len(winners)} workers claimed the job'
+        assert claims[winners[0]]['id'] == job_id
+
+        job = get_job(app, job_id)
+        assert job.status == 'running' and job.attempts == 1
+        assert job.worker == workers[winners[0]].worker
+
+        # Later claims by the others find nothing either
+        assert all(workers[k].claim() is None for k in range(len(workers)) if k != winners[0])
+        assert get_job(app, job_id).worker == workers[winners[0]].worker
+        print("✅ A queued job is claimed by exactly one worker")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_stale_job_is_requeued_then_failed():
+    app, work_dir = make_app()
+    try:
+        job_id = submit_csv_job(app)
+        first, second = make_worker(app, max_attempts=2), make_worker(app, max_attempts=2)
+
+        assert first.claim()['id'] == job_id
+        # Heartbeating jobs are left alone
+        second.recover_stale()
+        assert get_job(app, job_id).status == 'running'
+
+        make_stale(app, job_id)
+        second.recover_stale()
+        job = get_job(app, job_id)
+        assert job.status == 'queued' and job.worker is None
+
+        claimed = second.claim()
+        assert claimed['id'] == job_id and claimed['attempts'] == 2
+
+        # Silent again, on the last attempt
+        make_stale(app, job_id)
+        first.recover_stale()
+        job = get_job(app, job_id)
+        assert job.status == 'failed' and job.finished_at is not None
+        assert 'stopped responding' in job.error
+        assert first.claim() is None
+        print("✅ A stale job is requeued, then failed after max_attempts")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_cancel_queued_job():
+    app, work_dir = make_app()
+    try:
+        job_id = submit_csv_job(app)
+        directory, input_path, _ = job_paths(jobs_dir(app), job_id, 'ndjson')
+        assert os.path.exists(input_path)
+
+        with app.app_context():
+            assert cancel_scoring_job(app, job_id, 'Coach') == 'cancelled'
+            # Already finished: nothing to cancel
+            assert cancel_scoring_job(app, job_id, 'Coach') is None
+
+        assert get_job(app, job_id).status == 'cancelled'
+        assert not os.path.exists(directory)
+        assert make_worker(app).claim() is None
+        print("✅ A queued job is cancelled at once and never claimed")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_cancel_running_job():
+    app, work_dir = make_app()
+    try:
+        job_id = submit_csv_job(app)
+        directory, _, _ = job_paths(jobs_dir(app), job_id, 'ndjson')
+        worker = make_worker(app)
+        job = worker.claim()
+
+        with app.app_context():
+            assert cancel_scoring_job(app, job_id, 'Coach') == 'running'
+        assert get_job(app, job_id).cancel_requested
+
+        # The worker stops at its first progress update
+        worker.run_job(job)
+        job = get_job(app, job_id)
+        assert job.status == 'cancelled' and job.finished_at is not None
+        assert job.chunks_done == 0
+        assert not os.path.exists(directory)
+        print("✅ A running job stops at the next chunk when cancelled")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_job_is_claimed_once()
+        test_stale_job_is_requeued_then_failed()
+        test_cancel_queued_job()
+        test_cancel_running_job()
+    except AssertionError:
+        sys.exit(1)
+    sys.exit(0)
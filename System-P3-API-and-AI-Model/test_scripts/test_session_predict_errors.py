@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+/session/<id>/predict must answer validation problems (a model needing features the readings do not
+store, a session without one valid reading) with a 409 and the validation message, and keep the 500
+for real failures.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from datetime import date
+
+# Add the project root to the path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app import create_app
+from app.config import Config, db
+from app.models.sensor_data import SensorData
+from app.routes import session_bp
+
+VALID_READING = {
+    'heart_rate': 62, 'body_temperature': 36.2, 'joint_angles': 170.0, 'gait_speed': 3.2, 'cadence': 185,
+    'step_count': 8500, 'jump_height': 0.8, 'ground_reaction_force': 2100, 'range_of_motion': 145,
+    'ambient_temperature': 18.0
+}
+
+
+def make_client():
+    """A logged-in coach's test client, and an app with one session of the coach's athlete."""
+    work_dir = tempfile.mkdtemp()
+
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(work_dir, 'sessions.db')
+        MODEL_LOADING_MODE = 'lazy'
+        MODEL_WATCH_INTERVAL_SECONDS = 0
+
+    app = create_app(TestConfig)
+    client = app.test_client()
+    client.post('/api/v1.0/user/register', json={'email': 'coach@example.com', 'password': 'p', 'type': 'coach', 'name': 'Coach'})
+    client.post('/api/v1.0/user/register', json={'email': 'athlete@example.com', 'password': 'p', 'type': 'athlete',
+                                                 'name': 'Athlete', 'coach_id': 1})
+    token = client.post('/api/v1.0/user/login', json={'email': 'coach@example.com', 'password': 'p'}).get_json()['token']
+    headers = {'Authorization': f'Bearer {token}'}
+    assert client.post('/api/v1.0/session/', json={'athlete_id': 2, 'coach_id': 1}, headers=headers).status_code == 201
+    return app, client, headers, work_dir
+
+
+def store_reading(app, **values):
+    """Stores a reading directly, as readings written before ingest validation existed."""
+    with app.app_context():
+        db.session.add(SensorData(session_id=1, created_on=date.today(), created_by='test', **{**VALID_READING, **values}))
+        db.session.commit()
+
+
+def predict(client, headers):
+    response = client.get('/api/v1.0/session/1/predict', headers=headers)
+    return response.status_code, response.get_json()
+
+
+def test_session_without_valid_readings():
+    app, client, headers, work_dir = make_client()
+    try:
+        store_reading(app, heart_rate=-5)
+        store_reading(app, cadence=-1)
+
+        status, body = predict(client, headers)
+        assert status == 409, (status, body)
+        assert body['failed'] == 2
+        assert [e['details'][0]['code'] for e in body['errors']] == ['negative', 'negative']
+
+        # One valid reading is enough to score the session
+        store_reading(app)
+        status, body = predict(client, headers)
+        assert status == 200 and body['succeeded'] == 1 and body['failed'] == 2
+        print("✅ A session without valid readings gets a 409 with the reading errors")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_model_features_not_stored():
+    app, client, headers, work_dir = make_client()
+    get_required_features = session_bp.get_required_features
+    try:
+        store_reading(app)
+        session_bp.get_required_features = lambda bundle: get_required_features(bundle) + ['vo2_max']
+
+        status, body = predict(client, headers)
+        assert status == 409, (status, body)
+        assert body['error'] == 'Model features not stored in sensor data: vo2_max'
+        print("✅ A model needing features the readings do not store gets a 409")
+    finally:
+        session_bp.get_required_features = get_required_features
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_scoring_failure_is_a_server_error():
+    app, client, headers, work_dir = make_client()
+    get_scorer = session_bp.get_scorer
+    try:
+        store_reading(app)
+
+        def failing_scorer(feature_matrix, bundle):
+            raise ValueError('X has 10 features, but the model is expecting 12 features as input')
+
+        session_bp.get_scorer = lambda: failing_scorer
+        status, body = predict(client, headers)
+        assert status == 500, (status, body)
+        assert body['error'].startswith('Prediction logic error:')
+        print("✅ A failure while scoring stays a 500")
+    finally:
+        session_bp.get_scorer = get_scorer
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        test_session_without_valid_readings()
+        test_model_features_not_stored()
+        test_scoring_failure_is_a_server_error()
+    except AssertionError:
+        sys.exit(1)
+    sys.exit(0)